@@ -0,0 +1,130 @@
+
+"""
+Synthetic Flutter/Dart snippets for benchmarking.
+
+Snippets are generated from a seeded RNG, so a (profile, n, seed) triple always
+yields the same corpus. Knobs:
+  size            approximate snippet size in characters
+  nesting         depth of nested control flow inside methods
+  widget_depth    depth of the widget tree returned by build()
+  string_density  probability that a statement carries a string literal
+  comment_density probability that a statement is preceded by a comment
+"""
+import random
+from typing import Dict, List
+
+__all__ = ["PROFILES", "generate_snippet", "generate_corpus"]
+
+PROFILES: Dict[str, dict] = {
+    "small":   dict(size=1_500,  nesting=2, widget_depth=3,  string_density=0.2, comment_density=0.1),
+    "typical": dict(size=6_000,  nesting=3, widget_depth=6,  string_density=0.3, comment_density=0.2),
+    "nested":  dict(size=6_000,  nesting=9, widget_depth=4,  string_density=0.1, comment_density=0.1),
+    "widgets": dict(size=12_000, nesting=2, widget_depth=24, string_density=0.2, comment_density=0.05),
+    "strings": dict(size=6_000,  nesting=2, widget_depth=4,  string_density=0.9, comment_density=0.6),
+    "large":   dict(size=60_000, nesting=4, widget_depth=10, string_density=0.3, comment_density=0.2),
+}
+
+_WIDGETS = ["Container", "Padding", "Center", "SizedBox", "Expanded", "Card", "Align", "GestureDetector"]
+_MULTI = ["Column", "Row", "Stack", "ListView", "Wrap"]
+_CONDS = ["count > 0", "items.isEmpty", "a == b && c != d", "x < limit || force", "mounted"]
+_EFFECTS = [
+    "setState(() { count++; });",
+    "await http.get(Uri.parse(url));",
+    "items.add(value);",
+    "cache[key] = value;",
+    "this.total = total + 1;",
+    "context.read<CounterBloc>(context).add(Increment());",
+    "final prefs = await SharedPreferences.getInstance();",
+    "db.query('users');",
+    "timer = Timer.periodic(period, (t) => tick());",
+    "final codec = await instantiateImageCodec(bytes);",
+    "file.readAsStringSync();",
+]
+
+def _string(rng: random.Random) -> str:
+    kind = rng.randrange(5)
+    if kind == 0:
+        return "'plain text with { braces ( and // slashes'"
+    if kind == 1:
+        return '"value: ${item.name} and $count items"'
+    if kind == 2:
+        return "r'raw \\d+ (pattern) {x}'"
+    if kind == 3:
+        return "'''multi\nline { string } /* not a comment */\n'''"
+    return '"nested ${map["k"] ?? \'d\'} done"'
+
+def _comment(rng: random.Random, pad: str) -> str:
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"{pad}// TODO: handle edge case {rng.randrange(100)} (see if/else below)\n"
+    if kind == 1:
+        return f"{pad}/// Documentation for the next statement {{ not code }}\n"
+    return f"{pad}/* block comment\n{pad}   spanning lines /* nested */ if (x) {{ }} */\n"
+
+def _statement(rng: random.Random, p: dict, pad: str) -> str:
+    out = _comment(rng, pad) if rng.random() < p["comment_density"] else ""
+    if rng.random() < p["string_density"]:
+        return out + f"{pad}final s{rng.randrange(1000)} = {_string(rng)};\n"
+    if rng.random() < 0.3:
+        return out + f"{pad}{rng.choice(_EFFECTS)}\n"
+    return out + f"{pad}value = cond ? compute(a, b) : fallback ?? 0;\n"
+
+def _block(rng: random.Random, p: dict, depth: int, indent: int) -> str:
+    pad = "  " * indent
+    out = [_statement(rng, p, pad) for _ in range(rng.randint(1, 3))]
+    if depth > 0:
+        kind = rng.randrange(4)
+        inner = _block(rng, p, depth - 1, indent + 1)
+        if kind == 0:
+            other = _statement(rng, p, pad + "  ")
+            out.append(f"{pad}if ({rng.choice(_CONDS)}) {{\n{inner}{pad}}} else {{\n{other}{pad}}}\n")
+        elif kind == 1:
+            out.append(f"{pad}for (var i = 0; i < n; i++) {{\n{inner}{pad}}}\n")
+        elif kind == 2:
+            out.append(f"{pad}while ({rng.choice(_CONDS)}) {{\n{inner}{pad}}}\n")
+        else:
+            out.append(f"{pad}switch (mode) {{\n{pad}  case 1:\n{inner}{pad}    break;\n"
+                       f"{pad}  default:\n{pad}    break;\n{pad}}}\n")
+    return "".join(out)
+
+def _widget(rng: random.Random, p: dict, depth: int, indent: int) -> str:
+    pad = "  " * indent
+    if depth <= 0:
+        text = _string(rng) if rng.random() < p["string_density"] else "'label'"
+        return f"Text({text})"
+    if rng.random() < 0.3:
+        # one deep child plus leaves, so the tree grows linearly with depth
+        kids = [_widget(rng, p, depth - 1, indent + 2)] + [_widget(rng, p, 0, indent + 2)
+                                                            for _ in range(rng.randint(1, 2))]
+        kids = ",\n".join(f"{pad}    {k}" for k in kids)
+        return f"{rng.choice(_MULTI)}(\n{pad}  children: [\n{kids},\n{pad}  ],\n{pad})"
+    return f"{rng.choice(_WIDGETS)}(\n{pad}  child: {_widget(rng, p, depth - 1, indent + 1)},\n{pad})"
+
+def generate_snippet(rng: random.Random, size: int, nesting: int, widget_depth: int,
+                     string_density: float, comment_density: float) -> str:
+    p = dict(string_density=string_density, comment_density=comment_density)
+    name = f"Sample{rng.randrange(10_000)}"
+    parts = [
+        "import 'package:flutter/material.dart';\n\n",
+        f"class {name} extends StatefulWidget {{\n  final String title;\n  final int limit;\n"
+        f"  const {name}({{Key? key, required this.title, this.limit = 10}}) : super(key: key);\n\n"
+        f"  @override\n  State<{name}> createState() => _{name}State();\n}}\n\n",
+        f"class _{name}State extends State<{name}> {{\n  int count = 0;\n  final items = <String>[];\n\n",
+    ]
+    build = (f"  @override\n  Widget build(BuildContext context) {{\n"
+             f"    return {_widget(rng, p, widget_depth, 2)};\n  }}\n}}\n")
+    length = sum(map(len, parts)) + len(build)
+    m = 0
+    while length < size:
+        head = (f"Future<void> load{m}(String url, {{bool force = false}}) async" if m % 2
+                else f"int handler{m}(int a, String b, [int n = 0])")
+        method = f"  {head} {{\n{_block(rng, p, nesting, 2)}  }}\n\n"
+        parts.append(method)
+        length += len(method)
+        m += 1
+    parts.append(build)
+    return "".join(parts)
+
+def generate_corpus(n: int, seed: int = 0, **params) -> List[str]:
+    rng = random.Random(seed)
+    return [generate_snippet(rng, **params) for _ in range(n)]
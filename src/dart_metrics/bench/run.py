@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark every metric on synthetic corpora and track regressions.
+
+    python -m bench.run --save baseline.json       # record a baseline
+    python -m bench.run --compare baseline.json    # fail (exit 1) on regressions
+
+Per corpus it reports: the shared preprocessing (lexing, comment stripping,
+line split), each metric in isolation on a preprocessed snippet, all metrics
+on one shared context (the batch row path), peak Python memory of that path,
+and end-to-end `cli.batch_excel` on an .xlsx of the corpus (wall time, max RSS).
+Timings are the best of --repeat runs. Compare baselines from the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from metrics.all_metrics import METRICS, SnippetContext
+from metrics.batch import compute_for_code
+from bench.corpus import PROFILES, generate_corpus
+from cli.tabular import open_writer
+
+FORMAT = 1
+PKG_DIR = Path(__file__).resolve().parents[1]
+MB = 1024 * 1024
+# timings shorter than this are too noisy to flag as regressions
+MIN_COMPARE_SECONDS = 0.005
+
+# SnippetContext attributes shared by all metrics; timed once as "prepare"
+_PREP = ("tokens", "code_nc", "lines", "loc", "comment_lines")
+
+def _prepare(code: str) -> dict:
+    ctx = SnippetContext(code)
+    return {name: getattr(ctx, name) for name in _PREP}
+
+def _prepared_context(code: str, prep: dict) -> SnippetContext:
+    # a fresh context with the shared parts pre-filled (cached_property
+    # stores its value in the instance dict)
+    ctx = SnippetContext(code)
+    ctx.__dict__.update(prep)
+    return ctx
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _rates(seconds: float, n: int, nbytes: int) -> dict:
+    return {
+        "seconds": round(seconds, 6),
+        "snippets_per_s": round(n / seconds, 1) if seconds else None,
+        "mb_per_s": round(nbytes / MB / seconds, 3) if seconds else None,
+    }
+
+def _run_batch_excel(codes, workdir: Path):
+    """Run cli.batch_excel on the corpus; return (seconds, max RSS in MB or None)."""
+    src = workdir / "corpus.xlsx"
+    with open_writer(src, ["sample_id", "code_snippet"]) as w:
+        w.write_rows([[i, c] for i, c in enumerate(codes)])
+    argv = [sys.executable, "-m", "cli.batch_excel", "--input", str(src),
+            "--output", str(workdir / "corpus.metrics.xlsx"), "--all"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(argv, cwd=PKG_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    max_rss = None
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        max_rss = usage.ru_maxrss / (MB if sys.platform == "darwin" else 1024)
+    else:
+        proc.wait()
+    seconds = time.perf_counter() - t0
+    err = proc.stderr.read().decode(errors="replace")
+    proc.stderr.close()
+    if proc.returncode != 0:
+        raise SystemExit(f"batch_excel failed ({proc.returncode}):\n{err}")
+    return seconds, (round(max_rss, 1) if max_rss is not None else None)
+
+def bench_corpus(name: str, n: int, seed: int, repeat: int, e2e: bool) -> dict:
+    params = PROFILES[name]
+    codes = generate_corpus(n, seed, **params)
+    nbytes = sum(len(c.encode("utf-8")) for c in codes)
+    keys = list(METRICS)
+    timings = {}
+
+    timings["prepare"] = _rates(_best(lambda: [_prepare(c) for c in codes], repeat), n, nbytes)
+    preps = [_prepare(c) for c in codes]
+    for key in keys:
+        func = METRICS[key][1]
+        run = lambda: [func(_prepared_context(c, p)) for c, p in zip(codes, preps)]
+        timings[key] = _rates(_best(run, repeat), n, nbytes)
+    timings["all"] = _rates(_best(lambda: [compute_for_code(c, keys) for c in codes], repeat), n, nbytes)
+
+    tracemalloc.start()
+    for c in codes:
+        compute_for_code(c, keys)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    out = {"params": params, "n": n, "seed": seed, "bytes": nbytes, "timings": timings,
+           "peak_mb": round(peak / MB, 2)}
+    if e2e:
+        with tempfile.TemporaryDirectory() as tmp:
+            seconds, max_rss = _run_batch_excel(codes, Path(tmp))
+        timings["batch_excel"] = _rates(seconds, n, nbytes)
+        out["batch_excel_max_rss_mb"] = max_rss
+    return out
+
+def _label(name: str) -> str:
+    return METRICS[name][0] if name in METRICS else name
+
+def print_report(result: dict) -> None:
+    for corpus, res in result["corpora"].items():
+        print(f"\n== {corpus}: {res['n']} snippets, {res['bytes'] / MB:.2f} MB, "
+              f"peak {res['peak_mb']} MB (all metrics, Python heap)")
+        if res.get("batch_excel_max_rss_mb") is not None:
+            print(f"   batch_excel max RSS {res['batch_excel_max_rss_mb']} MB")
+        print(f"   {'timing':<12}{'seconds':>10}{'snippets/s':>13}{'MB/s':>9}")
+        for name, t in res["timings"].items():
+            print(f"   {_label(name):<12}{t['seconds']:>10.4f}{t['snippets_per_s']:>13.1f}{t['mb_per_s']:>9.3f}")
+
+def compare(result: dict, baseline: dict, threshold: float) -> int:
+    """Print timing ratios against the baseline; return the number of regressions."""
+    regressions = 0
+    for corpus, res in result["corpora"].items():
+        old = baseline.get("corpora", {}).get(corpus)
+        if old is None:
+            print(f"\n-- {corpus}: not in baseline")
+            continue
+        if (old["params"], old["n"], old["seed"]) != (res["params"], res["n"], res["seed"]):
+            print(f"\n-- {corpus}: baseline used a different corpus (params/n/seed); skipped")
+            continue
+        print(f"\n-- {corpus} vs baseline (regression if ratio > {threshold:g})")
+        for name, t in res["timings"].items():
+            o = old["timings"].get(name)
+            if not o or not o["seconds"]:
+                continue
+            ratio = t["seconds"] / o["seconds"]
+            flag = ""
+            if max(t["seconds"], o["seconds"]) < MIN_COMPARE_SECONDS:
+                flag = "  (too short to compare)"
+            elif ratio > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"   {_label(name):<12}{o['seconds']:>10.4f} -> {t['seconds']:<10.4f} x{ratio:.2f}{flag}")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the metrics on synthetic Dart/Flutter corpora")
+    ap.add_argument("--corpus", action="append", choices=sorted(PROFILES),
+                    help="Corpus profile; repeatable (default: all)")
+    ap.add_argument("--n", type=int, default=100, help="Snippets per corpus (default: 100)")
+    ap.add_argument("--seed", type=int, default=0, help="RNG seed (default: 0)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per timing; the best is kept (default: 3)")
+    ap.add_argument("--no-e2e", action="store_true", help="Skip the end-to-end batch_excel run")
+    ap.add_argument("--save", help="Write the results as a JSON baseline")
+    ap.add_argument("--compare", help="JSON baseline to compare against")
+    ap.add_argument("--threshold", type=float, default=1.25,
+                    help="Slowdown ratio that counts as a regression (default: 1.25)")
+    args = ap.parse_args()
+
+    result = {
+        "format": FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpora": {},
+    }
+    for name in args.corpus or list(PROFILES):
+        print(f"benchmarking {name} ...", file=sys.stderr)
+        result["corpora"][name] = bench_corpus(name, args.n, args.seed, args.repeat, not args.no_e2e)
+
+    print_report(result)
+    if args.save:
+        Path(args.save).write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("format") != FORMAT:
+            raise SystemExit(f"Unsupported baseline format in {args.compare}")
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"\n{regressions} timing(s) regressed beyond x{args.threshold:g}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
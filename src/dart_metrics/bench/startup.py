@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Measure CLI start-up time and check it against a budget.
+
+    python -m bench.startup              # exit 1 if a command is over budget
+
+Each command runs --repeat times in a fresh interpreter; the best wall time,
+minus the best time of a bare `python -c pass`, is the command's start-up
+overhead. Budgets are overheads, so they hold across machines of similar
+speed. For a command over budget, its slowest top-level imports (from
+`python -X importtime`) are listed.
+"""
+import argparse
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PKG_DIR = Path(__file__).resolve().parents[1]
+
+SNIPPET = "class A extends StatelessWidget {\n  Widget build(BuildContext c) => Text('a');\n}\n"
+
+# (name, argv after `python`, budget in ms over a bare interpreter)
+COMMANDS = [
+    ("get_metric LoC", ["-m", "cli.get_metric", "--metric", "LoC", "--file", "{snippet}"], 100),
+    ("get_metrics --all", ["-m", "cli.get_metrics", "--all", "--file", "{snippet}"], 150),
+    ("client --help", ["-m", "cli.client", "--help"], 150),
+    ("batch_excel --help", ["-m", "cli.batch_excel", "--help"], 150),
+    ("batch --help", ["-m", "cli.batch", "--help"], 150),
+    ("scan --help", ["-m", "cli.scan", "--help"], 150),
+    ("ingest --help", ["-m", "cli.ingest", "--help"], 150),
+    ("merge --help", ["-m", "cli.merge", "--help"], 150),
+]
+
+_IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)")
+
+def _best(argv, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable] + argv, cwd=PKG_DIR, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - t0
+        if proc.returncode != 0:
+            raise SystemExit(f"{' '.join(argv)} failed ({proc.returncode}):\n{proc.stderr.decode(errors='replace')}")
+        best = min(best, elapsed)
+    return best
+
+def top_imports(argv, n: int = 5):
+    """[(module, cumulative ms)] of the slowest top-level imports of a command."""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + argv, cwd=PKG_DIR,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    found = []
+    for line in proc.stderr.decode(errors="replace").splitlines():
+        m = _IMPORT_LINE.match(line)
+        if m and not m.group(2).startswith(" "):  # nested imports are indented
+            found.append((m.group(2), int(m.group(1)) / 1000))
+    return sorted(found, key=lambda x: -x[1])[:n]
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure CLI start-up overhead against per-command budgets")
+    ap.add_argument("--repeat", type=int, default=5, help="Runs per command; the best is kept (default: 5)")
+    ap.add_argument("--scale", type=float, default=1.0,
+                    help="Multiply every budget, e.g. 2 on a slow CI machine (default: 1)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snippet = Path(tmp) / "snippet.dart"
+        snippet.write_text(SNIPPET, encoding="utf-8")
+        base = _best(["-c", "pass"], args.repeat)
+        print(f"bare interpreter: {base * 1000:.1f} ms")
+        print(f"{'command':<22}{'overhead ms':>12}{'budget ms':>11}")
+        over = 0
+        for name, argv, budget in COMMANDS:
+            argv = [a.format(snippet=snippet) for a in argv]
+            ms = (_best(argv, args.repeat) - base) * 1000
+            limit = budget * args.scale
+            flag = ""
+            if ms > limit:
+                over += 1
+                flag = "  OVER BUDGET"
+            print(f"{name:<22}{ms:>12.1f}{limit:>11g}{flag}")
+            if flag:
+                for module, cum in top_imports(argv):
+                    print(f"    {cum:>8.1f} ms  import {module}")
+    if over:
+        print(f"\n{over} command(s) over their start-up budget", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
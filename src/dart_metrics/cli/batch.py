@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+from collections import deque
+from pathlib import Path
+
+from metrics.all_metrics import METRICS, ALIASES
+from metrics.cache import ResultCache, metric_version
+from metrics.batch import group_errors, iter_rows
+from metrics.guard import SnippetGuard
+from metrics.profile import MetricProfiler
+from cli.tabular import FORMATS, detect_format, iter_columns, metric_types, open_writer
+
+def normalize_key(k: str) -> str:
+    kk = k.strip().lower()
+    if kk in METRICS:
+        return kk
+    return ALIASES.get(kk, kk)
+
+def positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {n}")
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Stream Dart/Flutter snippet metrics from CSV/JSONL/Parquet/Excel to CSV/JSONL/Parquet/Excel."
+    )
+    ap.add_argument("--input", "-i", required=True, help=f"Input file ({', '.join(sorted(FORMATS))})")
+    ap.add_argument("--output", "-o", help="Output file; format from suffix (default: <input>.metrics.<same suffix>)")
+    ap.add_argument("--sheet", default=0, help="Excel worksheet index or name (default: 0)")
+    ap.add_argument("--id-col", default="sample_id", help="ID column name (default: sample_id)")
+    ap.add_argument("--code-col", default="code_snippet", help="Code column name (default: code_snippet)")
+    ap.add_argument("--metrics", help="Comma-separated labels or keys (e.g., LoC,NoM,NoP,...)")
+    ap.add_argument("--metric", action="append", help="Repeatable; each a label or key (order preserved)")
+    ap.add_argument("--all", action="store_true", help="Use all 20 metrics (default if no list provided)")
+    ap.add_argument("--include-code", action="store_true", help="Include code_snippet column in the output")
+    ap.add_argument("--chunk-size", type=positive_int, default=10_000,
+                    help="Rows read and written per chunk; bounds peak memory (default: 10000)")
+    ap.add_argument("--workers", type=int, default=1, help="Worker processes (default: 1, no pool)")
+    ap.add_argument("--work-size", type=positive_int, default=256, help="Rows per work unit with --workers (default: 256)")
+    ap.add_argument("--cache", help="SQLite result cache; unchanged snippets are not recomputed on re-runs")
+    ap.add_argument("--cache-size", type=float, default=1024, help="Cache size cap in MB, LRU-evicted (default: 1024)")
+    ap.add_argument("--timeout", type=float, metavar="SECONDS",
+                    help="Per-snippet time budget; metrics run in a killable child process and "
+                         "over-budget ones are written as -1")
+    ap.add_argument("--max-chars", type=int, metavar="N", help="Snippets longer than N characters are written as -1")
+    ap.add_argument("--profile", nargs="?", const="-", metavar="DEST",
+                    help="Profile per-metric timings; table to stderr, or write DEST (.json for JSON)")
+    ap.add_argument("--summary", metavar="DEST",
+                    help="Write per-metric summary statistics (mean, std, quantiles, histograms, correlations) "
+                         "as JSON, computed while rows stream; '-' prints them")
+    ap.add_argument("--summary-only", action="store_true", help="With --summary, do not write the per-row output")
+    ap.add_argument("--group-col", help="Also summarise per value of this input column (e.g. a category)")
+    ap.add_argument("--shard", metavar="K/N",
+                    help="Process only shard K of N (0-based; rows split by a stable hash of sample_id) and write "
+                         "<output>.manifest.json for cli.merge")
+    ap.add_argument("--columnar", action="store_true",
+                    help="Compute the regex-count metrics a chunk of rows at a time (same values; "
+                         "ignored with --cache/--profile/--timeout/--max-chars)")
+    args = ap.parse_args()
+
+    order_keys = []
+    if args.metrics:
+        order_keys.extend([normalize_key(m) for m in args.metrics.split(",") if m.strip()])
+    if args.metric:
+        order_keys.extend([normalize_key(m) for m in args.metric])
+    if args.all or not order_keys:
+        order_keys = list(METRICS)
+
+    bad = [k for k in order_keys if k not in METRICS]
+    if bad:
+        raise SystemExit(f"Unknown metric key(s): {bad}")
+
+    shard = None
+    if args.shard:
+        from cli.shards import ROW_COL, SHARD_FORMATS, parse_shard, shard_of, write_manifest
+        shard, shards = parse_shard(args.shard)
+        if args.summary_only:
+            raise SystemExit("--shard needs the per-row output; drop --summary-only")
+
+    in_path = Path(args.input)
+    if args.output:
+        out_path = Path(args.output)
+    elif shard is not None:
+        # Excel output is split over sheets, so Excel inputs shard to CSV
+        suffix = in_path.suffix if detect_format(in_path) in SHARD_FORMATS else ".csv"
+        out_path = Path(f"{in_path.with_suffix('')}.metrics.shard-{shard}-of-{shards}{suffix}")
+    else:
+        suffix = ".xlsx" if in_path.suffix.lower() == ".xls" else in_path.suffix
+        out_path = Path(str(in_path.with_suffix("")) + ".metrics" + suffix)
+    if shard is not None and (str(out_path) == "-" or detect_format(out_path) not in SHARD_FORMATS):
+        raise SystemExit(f"Shard outputs must be files in one of: {', '.join(SHARD_FORMATS)}")
+
+    sheet = args.sheet
+    if isinstance(sheet, str) and sheet.isdigit():
+        sheet = int(sheet)
+    if (args.summary_only or args.group_col) and not args.summary:
+        raise SystemExit("--summary-only and --group-col need --summary")
+
+    labels = [METRICS[k][0] for k in order_keys]
+    columns = ["sample_id"] + labels + (["code_snippet"] if args.include_code else [])
+    if shard is not None:
+        columns.insert(0, ROW_COL)
+
+    # codes (and groups) of rows still in flight, so --include-code and --group-col need no second read
+    in_flight = deque()
+    groups = deque()
+    positions = deque()  # input row numbers, with --shard
+    input_rows = 0
+    cols = [args.id_col, args.code_col] + ([args.group_col] if args.group_col else [])
+    def pairs():
+        nonlocal input_rows
+        for pos, row in enumerate(iter_columns(in_path, cols, args.chunk_size, sheet)):
+            input_rows = pos + 1
+            if shard is not None:
+                if shard_of(row[0], shards) != shard:
+                    continue
+                positions.append(pos)
+            if args.include_code:
+                in_flight.append(row[1])
+            if args.group_col:
+                groups.append(row[2])
+            yield row[0], row[1]
+
+    cache = ResultCache(args.cache, max_mb=args.cache_size) if args.cache else None
+    profiler = MetricProfiler() if args.profile else None
+    guard = SnippetGuard(args.timeout, args.max_chars) if args.timeout or args.max_chars else None
+    stats = None
+    if args.summary:
+        from metrics.stats import RunStats  # numpy; only loaded for summaries
+        stats = RunStats(order_keys, grouped=bool(args.group_col))
+    failed = 0
+    buf = []
+    types = dict(metric_types(order_keys), code_snippet="string")
+    writer = None if args.summary_only else open_writer(out_path, columns, types)
+    try:
+        rows = iter_rows(pairs(), order_keys, workers=args.workers, chunk_size=args.work_size, cache=cache,
+                         profiler=profiler, guard=guard, columnar=args.columnar)
+        for sid, values, errors in rows:
+            if stats is not None:
+                stats.add(values, groups.popleft() if args.group_col else None)
+            if errors:
+                failed += 1
+                for label, msg in group_errors(errors):
+                    print(f"WARN: sample_id={sid}: {label} failed: {msg}", file=sys.stderr)
+            if writer is None:
+                continue
+            row = [sid] + [values[l] for l in labels]
+            if args.include_code:
+                row.append(in_flight.popleft())
+            if shard is not None:
+                row.insert(0, positions.popleft())
+            buf.append(row)
+            if len(buf) >= args.chunk_size:
+                writer.write_rows(buf)
+                buf = []
+        if buf:
+            writer.write_rows(buf)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        print(f"Done. Wrote metrics for {writer.rows_written} rows to: {out_path}", file=sys.stderr)
+    if stats is not None:
+        # a shard's summary keeps its accumulators, so cli.merge --summary can combine them
+        stats.dump(args.summary, state=shard is not None)
+        if args.summary != "-":
+            print(f"Summary of {stats.total.rows} rows written to: {args.summary}", file=sys.stderr)
+    if shard is not None:
+        summary = args.summary if stats is not None and args.summary != "-" else None
+        path = write_manifest(out_path, input_path=in_path, shard=shard, shards=shards,
+                              versions={k: metric_version(k) for k in order_keys}, columns=columns,
+                              rows=writer.rows_written, input_rows=input_rows, failed_rows=failed,
+                              summary=summary)
+        print(f"Shard {shard}/{shards}: {writer.rows_written} of {input_rows} input rows; manifest: {path}", file=sys.stderr)
+    if guard is not None:
+        guard.close()
+    if profiler is not None:
+        profiler.dump(args.profile)
+    if cache is not None:
+        cache.close()
+        print(f"Cache: {cache.hits} hit(s), {cache.misses} miss(es) in {args.cache}", file=sys.stderr)
+    if writer is not None and getattr(writer, "sheets", 1) > 1:
+        print(f"NOTE: output exceeded the Excel row limit and was split over {writer.sheets} sheets", file=sys.stderr)
+    if failed:
+        print(f"WARN: {failed} row(s) had failing metrics (recorded as NaN, or -1 when over budget)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
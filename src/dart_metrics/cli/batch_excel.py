@@ -1,13 +1,14 @@
 
 #!/usr/bin/env python3
 import argparse
-import math
 import sys
 from pathlib import Path
 
-import pandas as pd
-
 from metrics.all_metrics import METRICS, ALIASES
+from metrics.cache import ResultCache
+from metrics.batch import compute_for_code, group_errors, iter_rows  # compute_for_code: kept importable from here
+from metrics.guard import SnippetGuard
+from metrics.profile import MetricProfiler
 
 # Default order for all 20 metrics (by internal keys in METRICS)
 ALL_KEYS = [
@@ -21,23 +22,11 @@ def normalize_key(k: str) -> str:
         return kk
     return ALIASES.get(kk, kk)
 
-def compute_for_code(code: str, keys):
-    if code is None or (isinstance(code, float) and math.isnan(code)):
-        out = {}
-        for key in keys:
-            label, _ = METRICS[key]
-            out[label] = 0
-        return out
-    s = str(code)
-    out = {}
-    for key in keys:
-        label, func = METRICS[key]
-        try:
-            val = func(s)
-        except Exception:
-            val = float("nan")
-        out[label] = val
-    return out
+def positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {n}")
+    return n
 
 def main():
     ap = argparse.ArgumentParser(
@@ -52,6 +41,25 @@ def main():
     ap.add_argument("--metric", action="append", help="Repeatable; each a label or key (order preserved)")
     ap.add_argument("--all", action="store_true", help="Use all 20 metrics (default if no list provided)")
     ap.add_argument("--include-code", action="store_true", help="Include code_snippet column in the output")
+    ap.add_argument("--workers", type=int, default=1, help="Worker processes (default: 1, no pool)")
+    ap.add_argument("--chunk-size", type=positive_int, default=256, help="Rows per work unit with --workers (default: 256)")
+    ap.add_argument("--cache", help="SQLite result cache; unchanged snippets are not recomputed on re-runs")
+    ap.add_argument("--cache-size", type=float, default=1024, help="Cache size cap in MB, LRU-evicted (default: 1024)")
+    ap.add_argument("--timeout", type=float, metavar="SECONDS",
+                    help="Per-snippet time budget; metrics run in a killable child process and "
+                         "over-budget ones are written as -1")
+    ap.add_argument("--max-chars", type=int, metavar="N", help="Snippets longer than N characters are written as -1")
+    ap.add_argument("--profile", nargs="?", const="-", metavar="DEST",
+                    help="Profile per-metric timings; table to stderr, or write DEST (.json for JSON)")
+    ap.add_argument("--summary", metavar="DEST",
+                    help="Write per-metric summary statistics (mean, std, quantiles, histograms, correlations) "
+                         "as JSON, computed while rows are computed; '-' prints them")
+    ap.add_argument("--summary-only", action="store_true",
+                    help="With --summary, skip the per-row Excel output (rows are not kept in memory)")
+    ap.add_argument("--group-col", help="Also summarise per value of this column (e.g. a category)")
+    ap.add_argument("--columnar", action="store_true",
+                    help="Compute the regex-count metrics a chunk of rows at a time (same values; "
+                         "ignored with --cache/--profile/--timeout/--max-chars)")
     args = ap.parse_args()
 
     order_keys = []
@@ -73,6 +81,9 @@ def main():
     else:
         out_path = Path(args.output)
 
+    if (args.summary_only or args.group_col) and not args.summary:
+        raise SystemExit("--summary-only and --group-col need --summary")
+
     sheet = args.sheet
     try:
         if isinstance(sheet, str) and sheet.isdigit():
@@ -80,34 +91,65 @@ def main():
     except Exception:
         pass
 
+    # imported here, not at the top, so --help and argument errors stay fast
+    import pandas as pd
+    from metrics.results import ResultColumns
+
     df = pd.read_excel(in_path, sheet_name=sheet)
 
     if args.id_col not in df.columns:
         raise SystemExit(f"ID column '{args.id_col}' not found in Excel columns: {list(df.columns)}")
     if args.code_col not in df.columns:
         raise SystemExit(f"Code column '{args.code_col}' not found in Excel columns: {list(df.columns)}")
+    if args.group_col and args.group_col not in df.columns:
+        raise SystemExit(f"Group column '{args.group_col}' not found in Excel columns: {list(df.columns)}")
 
-    records = []
     id_vals = df[args.id_col].tolist()
     code_vals = df[args.code_col].tolist()
 
-    labels = [METRICS[k][0] for k in order_keys]
-
-    for sid, code in zip(id_vals, code_vals):
-        row = {"sample_id": sid}
-        row.update(compute_for_code(code, order_keys))
+    # values go straight into typed columns (int32/float32), not one dict per row
+    results = None if args.summary_only else ResultColumns(order_keys, capacity=len(df))
+    stats = None
+    if args.summary:
+        from metrics.stats import RunStats
+        stats = RunStats(order_keys, grouped=bool(args.group_col))
+    group_vals = iter(df[args.group_col].tolist()) if args.group_col else None
+    failed = 0
+    cache = ResultCache(args.cache, max_mb=args.cache_size) if args.cache else None
+    profiler = MetricProfiler() if args.profile else None
+    guard = SnippetGuard(args.timeout, args.max_chars) if args.timeout or args.max_chars else None
+    rows = iter_rows(zip(id_vals, code_vals), order_keys, workers=args.workers, chunk_size=args.chunk_size,
+                     cache=cache, profiler=profiler, guard=guard, columnar=args.columnar)
+    for sid, values, errors in rows:
+        if results is not None:
+            results.append(sid, values)
+        if stats is not None:
+            stats.add(values, next(group_vals) if group_vals is not None else None)
+        if errors:
+            failed += 1
+            for label, msg in group_errors(errors):
+                print(f"WARN: sample_id={sid}: {label} failed: {msg}", file=sys.stderr)
+
+    if cache is not None:
+        cache.close()
+        print(f"Cache: {cache.hits} hit(s), {cache.misses} miss(es) in {args.cache}")
+
+    if results is not None:
+        out_df = results.to_pandas(float64=True)
         if args.include_code:
-            row["code_snippet"] = code
-        records.append(row)
-
-    out_df = pd.DataFrame.from_records(records)
-
-    col_order = ["sample_id"] + labels + (["code_snippet"] if args.include_code else [])
-    col_order = [c for c in col_order if c in out_df.columns]
-
-    out_df = out_df[col_order]
-    out_df.to_excel(out_path, index=False)
-    print(f"Done. Wrote metrics for {len(out_df)} rows to: {out_path}")
+            out_df["code_snippet"] = code_vals
+        out_df.to_excel(out_path, index=False)
+        print(f"Done. Wrote metrics for {len(out_df)} rows to: {out_path}")
+    if stats is not None:
+        stats.dump(args.summary)
+        if args.summary != "-":
+            print(f"Summary of {stats.total.rows} rows written to: {args.summary}")
+    if guard is not None:
+        guard.close()
+    if profiler is not None:
+        profiler.dump(args.profile)
+    if failed:
+        print(f"WARN: {failed} row(s) had failing metrics (recorded as NaN, or -1 when over budget)", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
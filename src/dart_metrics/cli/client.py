@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Thin client for cli.serve: sends snippets to a running server and prints the
+metrics like cli.get_metrics. Imports nothing from `metrics`, so it starts fast.
+
+    python -m cli.client --all --file a.dart --file b.dart
+    python -m cli.client --metrics LoC,CC --stdin --socket /tmp/dart-metrics.sock
+"""
+import argparse
+import http.client
+import json
+import socket
+import sys
+from pathlib import Path
+
+DEFAULT_PORT = 8765
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def connect(host: str = "127.0.0.1", port: int = DEFAULT_PORT, socket_path: str = None, timeout=None):
+    """An HTTP connection to the server; reuse it for several requests to skip reconnecting."""
+    if socket_path:
+        return _UnixHTTPConnection(socket_path, timeout)
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+def analyze(conn, snippets, metrics=None) -> dict:
+    """POST one batch to /analyze and return the decoded response; raises RuntimeError on an error reply."""
+    body = {"snippets": list(snippets)}
+    if metrics:
+        body["metrics"] = list(metrics)
+    # bytes, so http.client sends headers and body in one packet
+    conn.request("POST", "/analyze", json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    data = json.loads(resp.read() or b"{}")
+    if resp.status != 200:
+        raise RuntimeError(f"server replied {resp.status}: {data.get('error', data)}")
+    return data
+
+def main():
+    ap = argparse.ArgumentParser(description="Print metrics for Dart/Flutter snippets via a running cli.serve")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--stdin", action="store_true")
+    src.add_argument("--file", action="append", help="Repeatable; all files go in one request")
+    ap.add_argument("--metrics", type=str, help="Comma-separated labels (e.g., LoC,NoF,CR)")
+    ap.add_argument("--metric", action="append", help="Repeatable; each is a label (order preserved)")
+    ap.add_argument("--all", action="store_true", help="Print all supported metrics")
+    ap.add_argument("--host", default="127.0.0.1", help="Server address (default: 127.0.0.1)")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Server port (default: {DEFAULT_PORT})")
+    ap.add_argument("--socket", help="Server Unix socket (instead of host/port)")
+    ap.add_argument("--json", action="store_true", help="Print the raw JSON response")
+    args = ap.parse_args()
+
+    order = []
+    if args.metrics:
+        order.extend([m.strip() for m in args.metrics.split(",") if m.strip()])
+    if args.metric:
+        order.extend(args.metric)
+    if not order and not args.all:
+        raise SystemExit("ERROR: specify --metrics/--metric or use --all")
+
+    if args.stdin:
+        snippets = [{"id": "<stdin>", "code": sys.stdin.read()}]
+    else:
+        snippets = [{"id": f, "code": Path(f).read_text(encoding="utf-8")} for f in args.file]
+
+    conn = connect(args.host, args.port, args.socket)
+    try:
+        data = analyze(conn, snippets, None if args.all else order)
+    except (OSError, http.client.HTTPException) as exc:
+        where = args.socket or f"{args.host}:{args.port}"
+        raise SystemExit(f"ERROR: cannot reach the metrics server at {where} ({exc}); start it with python -m cli.serve")
+    except RuntimeError as exc:
+        raise SystemExit(f"ERROR: {exc}")
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(data, indent=2))
+        return
+    results = data["results"]
+    for res in results:
+        if len(results) > 1:
+            print(f"== {res['id']}")
+        for label, value in res["metrics"].items():
+            print(f"{label} : {value}")
+        for err in res["errors"]:
+            print(f"WARN: {res['id']}: {err['metric']} failed: {err['message']}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -9,18 +9,43 @@ def normalize_key(k: str) -> str:
     if kk in METRICS: return kk
     return ALIASES.get(kk, kk)
 
+def positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {n}")
+    return n
+
 def main():
     ap = argparse.ArgumentParser(description="Print a single metric value for a Dart/Flutter snippet")
     src = ap.add_mutually_exclusive_group(required=True)
     src.add_argument("--stdin", action="store_true")
     src.add_argument("--file", type=str)
     ap.add_argument("--metric", required=True, help="e.g., LoC, NoF, CR, ...")
+    ap.add_argument("--stream", action="store_true",
+                    help="Analyse --file through mmap in bounded chunks instead of loading it whole (less memory, slower; very large files)")
+    ap.add_argument("--chunk-bytes", type=positive_int, default=1 << 20, help="Chunk size for --stream (default: 1 MiB)")
+    ap.add_argument("--profile", nargs="?", const="-", metavar="DEST",
+                    help="Time each metric and its shared intermediates; table to stderr, or write DEST (.json for JSON)")
     args = ap.parse_args()
 
-    code = sys.stdin.read() if args.stdin else Path(args.file).read_text(encoding="utf-8")
+    if args.stream and not args.file:
+        raise SystemExit("ERROR: --stream needs --file")
+    if args.stream and args.profile:
+        raise SystemExit("ERROR: --profile cannot be combined with --stream")
     key = normalize_key(args.metric)
     if key not in METRICS:
         raise SystemExit(f"ERROR: metric '{args.metric}' not implemented")
+    if args.stream:
+        from metrics.stream import analyze_file  # only loaded for streaming
+        for label, value in analyze_file(args.file, [key], args.chunk_bytes).items():
+            print(f"{label} : {value}")
+        return
+    code = sys.stdin.read() if args.stdin else Path(args.file).read_text(encoding="utf-8")
+    if args.profile:
+        from cli.get_metrics import profiled  # only loaded for --profile
+        for label, value in profiled(code, [key], args.file or "<stdin>", args.profile).items():
+            print(f"{label} : {value}")
+        return
     label, func = METRICS[key]
     print(f"{label} : {func(code)}")
 
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import argparse, sys
 from pathlib import Path
-from metrics.all_metrics import METRICS, ALIASES
+from metrics.all_metrics import METRICS, ALIASES, SnippetContext
 
 def normalize_key(k: str) -> str:
     kk = k.strip().lower()
@@ -9,6 +9,25 @@ def normalize_key(k: str) -> str:
         return kk
     return ALIASES.get(kk, kk)
 
+def positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {n}")
+    return n
+
+def profiled(code: str, keys, sid, dest: str) -> dict:
+    """{label: value} for keys, timing each metric and the shared intermediates; the report goes to dest."""
+    from metrics.batch import compute_for_code
+    from metrics.profile import MetricProfiler
+    errors, timings = [], {}
+    values = compute_for_code(code, keys, errors, timings)
+    profiler = MetricProfiler()
+    profiler.record(sid, len(code), timings, errors)
+    profiler.dump(dest)
+    for label, msg in errors:
+        print(f"WARN: {label} failed: {msg}", file=sys.stderr)
+    return values
+
 def main():
     ap = argparse.ArgumentParser(description="Print selected metrics for a Dart/Flutter snippet")
     src = ap.add_mutually_exclusive_group(required=True)
@@ -17,6 +36,13 @@ def main():
     ap.add_argument("--metrics", type=str, help="Comma-separated labels (e.g., LoC,NoF,CR)")
     ap.add_argument("--metric", action="append", help="Repeatable; each is a label (order preserved)")
     ap.add_argument("--all", action="store_true", help="Print all supported metrics")
+    ap.add_argument("--stream", action="store_true",
+                    help="Analyse --file through mmap in bounded chunks instead of loading it whole (less memory, slower; very large files)")
+    ap.add_argument("--chunk-bytes", type=positive_int, default=1 << 20, help="Chunk size for --stream (default: 1 MiB)")
+    ap.add_argument("--by-scope", action="store_true",
+                    help="Also break the metrics down per class and method (metrics with countable hits only)")
+    ap.add_argument("--profile", nargs="?", const="-", metavar="DEST",
+                    help="Time each metric and its shared intermediates; table to stderr, or write DEST (.json for JSON)")
     args = ap.parse_args()
 
     # Build ordered list of requested metrics
@@ -31,14 +57,66 @@ def main():
     if not order:
         raise SystemExit("ERROR: specify --metrics/--metric or use --all")
 
+    if args.stream and args.by_scope:
+        raise SystemExit("ERROR: --by-scope cannot be combined with --stream")
+    if args.profile and (args.stream or args.by_scope):
+        raise SystemExit("ERROR: --profile cannot be combined with --stream or --by-scope")
+    if args.stream:
+        if not args.file:
+            raise SystemExit("ERROR: --stream needs --file")
+        keys = []
+        for m in order:
+            key = normalize_key(m)
+            if key not in METRICS:
+                raise SystemExit(f"ERROR: metric '{m}' not implemented")
+            keys.append(key)
+        from metrics.stream import analyze_file  # only loaded for streaming
+        values = analyze_file(args.file, keys, args.chunk_bytes)
+        for key in keys:
+            label = METRICS[key][0]
+            print(f"{label} : {values[label]}")
+        return
+
     code = sys.stdin.read() if args.stdin else Path(args.file).read_text(encoding="utf-8")
+    ctx = SnippetContext(code)
+
+    if args.by_scope:
+        from metrics.scopes import SCOPED_METRICS, scope_breakdown  # only loaded for breakdowns
+        keys = []
+        for m in order:
+            key = normalize_key(m)
+            if key not in METRICS:
+                raise SystemExit(f"ERROR: metric '{m}' not implemented")
+            if key not in SCOPED_METRICS:
+                if args.all:  # --all means every metric that has a breakdown
+                    continue
+                raise SystemExit(f"ERROR: metric '{m}' cannot be broken down by scope")
+            keys.append(key)
+        for scope, values in scope_breakdown(ctx, keys):
+            print(f"{scope.path} ({scope.kind})")
+            for label, value in values.items():
+                print(f"  {label} : {value}")
+        return
+
+    if args.profile:
+        keys = []
+        for m in order:
+            key = normalize_key(m)
+            if key not in METRICS:
+                raise SystemExit(f"ERROR: metric '{m}' not implemented")
+            keys.append(key)
+        values = profiled(code, keys, args.file or "<stdin>", args.profile)
+        for key in keys:
+            label = METRICS[key][0]
+            print(f"{label} : {values[label]}")
+        return
 
     for m in order:
         key = normalize_key(m)
         if key not in METRICS:
             raise SystemExit(f"ERROR: metric '{m}' not implemented")
         label, func = METRICS[key]
-        print(f"{label} : {func(code)}")
+        print(f"{label} : {func(ctx)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Metrics for mixed inputs at once: .dart files, project directories, stdin and
+tabular files (CSV/JSONL/Parquet/Excel), read concurrently and written in
+completion order (see metrics/pipeline.py).
+
+    python -m cli.ingest lib/ extra.dart data.parquet - -o out.csv < snippet.dart
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from metrics.all_metrics import METRICS, ALIASES
+from metrics.batch import group_errors
+from cli.tabular import FORMATS, iter_pairs, metric_types, open_writer
+
+def normalize_key(k: str) -> str:
+    kk = k.strip().lower()
+    if kk in METRICS:
+        return kk
+    return ALIASES.get(kk, kk)
+
+def positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {n}")
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Compute Dart/Flutter snippet metrics for files, directories, stdin and tabular inputs concurrently"
+    )
+    ap.add_argument("inputs", nargs="+",
+                    help=f"A .dart file, a directory (scanned like cli.scan), '-' for stdin, "
+                         f"or a tabular file ({', '.join(sorted(FORMATS))})")
+    ap.add_argument("--output", "-o", default="-",
+                    help="Output file (.csv/.tsv/.jsonl/.parquet/.xlsx); '-' prints CSV (default)")
+    ap.add_argument("--sheet", default=0, help="Excel worksheet index or name (default: 0)")
+    ap.add_argument("--id-col", default="sample_id", help="ID column of tabular inputs (default: sample_id)")
+    ap.add_argument("--code-col", default="code_snippet", help="Code column of tabular inputs (default: code_snippet)")
+    ap.add_argument("--metrics", help="Comma-separated labels or keys (e.g., LoC,NoM,NoP,...)")
+    ap.add_argument("--metric", action="append", help="Repeatable; each a label or key (order preserved)")
+    ap.add_argument("--all", action="store_true", help="Use all 20 metrics (default if no list provided)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Worker processes (default: 1, one compute thread beside the readers)")
+    ap.add_argument("--readers", type=positive_int, default=8, help="File reads in flight per file source (default: 8)")
+    ap.add_argument("--queue-size", type=positive_int, default=1024,
+                    help="Rows read ahead of the workers; bounds memory (default: 1024)")
+    ap.add_argument("--batch-size", type=positive_int, default=32, help="Rows per work unit (default: 32)")
+    ap.add_argument("--chunk-size", type=positive_int, default=1000, help="Rows written per chunk (default: 1000)")
+    args = ap.parse_args()
+
+    order_keys = []
+    if args.metrics:
+        order_keys.extend([normalize_key(m) for m in args.metrics.split(",") if m.strip()])
+    if args.metric:
+        order_keys.extend([normalize_key(m) for m in args.metric])
+    if args.all or not order_keys:
+        order_keys = list(METRICS)
+
+    bad = [k for k in order_keys if k not in METRICS]
+    if bad:
+        raise SystemExit(f"Unknown metric key(s): {bad}")
+
+    sheet = args.sheet
+    if isinstance(sheet, str) and sheet.isdigit():
+        sheet = int(sheet)
+
+    # asyncio and the pipeline are imported here so --help stays fast
+    import asyncio
+    from metrics.pipeline import from_files, from_iterable, from_stdin, run_pipeline
+    from cli.scan import iter_dart_files
+
+    def sources():
+        out = {}
+        loose = []
+        for inp in args.inputs:
+            path = Path(inp)
+            if inp == "-":
+                out["-"] = from_stdin()
+            elif path.is_dir():
+                files = (p for _, p in iter_dart_files(path))
+                out[inp] = from_files(files, args.readers)
+            elif path.suffix.lower() == ".dart":
+                loose.append(path)
+            elif not path.exists():
+                raise SystemExit(f"No such file or directory: {inp}")
+            else:
+                out[inp] = from_iterable(iter_pairs(path, args.id_col, args.code_col, sheet=sheet))
+        if loose:
+            out["files"] = from_files(loose, args.readers)
+        return out
+
+    labels = [METRICS[k][0] for k in order_keys]
+    failed = 0
+    buf = []
+    with open_writer(args.output, ["source", "sample_id"] + labels, metric_types(order_keys)) as writer:
+        def sink(source, sid, values, errors):
+            nonlocal failed
+            buf.append([source, sid] + [values[l] for l in labels])
+            if errors:
+                failed += 1
+                for label, msg in group_errors(errors):
+                    print(f"WARN: {source}: sample_id={sid}: {label} failed: {msg}", file=sys.stderr)
+            if len(buf) >= args.chunk_size:
+                writer.write_rows(buf)
+                buf.clear()
+
+        async def run():
+            return await run_pipeline(sources(), order_keys, sink, workers=args.workers,
+                                      queue_size=args.queue_size, batch_size=args.batch_size)
+
+        rows = asyncio.run(run())
+        if buf:
+            writer.write_rows(buf)
+
+    print(f"Done. Wrote metrics for {rows} rows to: {args.output}", file=sys.stderr)
+    if failed:
+        print(f"WARN: {failed} row(s) had failing metrics (recorded as NaN)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
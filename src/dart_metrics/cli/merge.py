@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Merge the shard outputs of `cli.batch --shard K/N` back into one file, in
+input order, after checking their manifests (see cli/shards.py).
+
+    python -m cli.merge data.metrics.shard-*-of-4.csv.manifest.json -o data.metrics.csv
+"""
+import argparse
+import heapq
+import sys
+from pathlib import Path
+
+from cli.shards import ROW_COL, file_sha256, iter_shard_rows, manifest_path, read_manifest
+from cli.tabular import detect_format, metric_types, open_writer
+
+_SAME = ("input_sha256", "shards", "metrics", "columns", "input_rows")
+
+def verify(manifests) -> None:
+    """Exit with every problem found: mismatched runs, missing or repeated shards, changed outputs."""
+    problems = []
+    first = manifests[0]
+    for m in manifests[1:]:
+        for field in _SAME:
+            if m[field] != first[field]:
+                problems.append(f"{m['output']}: {field} differs from {first['output']}")
+    n = first["shards"]
+    seen = {}
+    for m in manifests:
+        if m["shard"] in seen:
+            problems.append(f"shard {m['shard']} given twice ({seen[m['shard']]}, {m['output']})")
+        seen[m["shard"]] = m["output"]
+    missing = sorted(set(range(n)) - set(seen))
+    if missing:
+        problems.append(f"missing shard(s) {', '.join(map(str, missing))} of {n}")
+    for m in manifests:
+        out = m["output_path"]
+        if not out.is_file():
+            problems.append(f"{out}: shard output not found")
+        elif file_sha256(out) != m["output_sha256"]:
+            problems.append(f"{out}: checksum differs from its manifest (changed or truncated; re-run shard {m['shard']})")
+        summary = m["summary_path"]
+        if summary is not None and (not summary.is_file() or file_sha256(summary) != m["summary_sha256"]):
+            problems.append(f"{summary}: summary missing or changed since shard {m['shard']} wrote it")
+    total = sum(m["rows"] for m in manifests)
+    if not problems and total != first["input_rows"]:
+        problems.append(f"shards hold {total} rows, the input has {first['input_rows']}")
+    if problems:
+        raise SystemExit("Cannot merge:\n  " + "\n  ".join(problems))
+
+def main():
+    ap = argparse.ArgumentParser(description="Verify and merge the shard outputs of cli.batch --shard, in input order")
+    ap.add_argument("manifests", nargs="+",
+                    help="Shard manifests (<output>.manifest.json), or the shard outputs next to them")
+    ap.add_argument("--output", "-o", required=True,
+                    help="Merged output file; CSV shards merge to .csv/.tsv, JSONL/Parquet shards to any format")
+    ap.add_argument("--chunk-size", type=int, default=10_000, help="Rows written per chunk (default: 10000)")
+    ap.add_argument("--summary", metavar="DEST",
+                    help="Also merge the shards' --summary files into DEST ('-' prints it); every shard needs one")
+    args = ap.parse_args()
+
+    paths = [Path(p) if p.endswith(".manifest.json") else manifest_path(p) for p in args.manifests]
+    manifests = sorted((read_manifest(p) for p in paths), key=lambda m: m["shard"])
+    verify(manifests)
+
+    if args.summary:
+        without = [str(m["shard"]) for m in manifests if m["summary_path"] is None]
+        if without:
+            raise SystemExit(f"--summary: shard(s) {', '.join(without)} were run without --summary to a file")
+
+    fmt = detect_format(manifests[0]["output_path"])
+    out_fmt = "csv" if args.output == "-" else detect_format(args.output)
+    if fmt == "csv" and out_fmt != "csv":
+        # CSV cells come back as text; only CSV keeps them exactly as written
+        raise SystemExit("CSV shards can only be merged into .csv/.tsv")
+    columns = manifests[0]["columns"]
+    if columns[0] != ROW_COL:
+        raise SystemExit(f"Shard outputs must start with the '{ROW_COL}' column")
+
+    streams = [iter_shard_rows(m["output_path"], fmt, columns) for m in manifests]
+    counts = [0] * len(manifests)
+    def counted(i, rows):
+        for row in rows:
+            counts[i] += 1
+            yield row
+    merged = heapq.merge(*(counted(i, s) for i, s in enumerate(streams)), key=lambda r: r[0])
+
+    buf = []
+    last = -1
+    with open_writer(args.output, columns[1:], dict(metric_types(manifests[0]["metrics"]), code_snippet="string")) as writer:
+        for pos, values in merged:
+            if pos <= last:
+                raise SystemExit(f"input_row {pos} is repeated or out of order; the shard outputs are corrupt")
+            last = pos
+            buf.append(values)
+            if len(buf) >= args.chunk_size:
+                writer.write_rows(buf)
+                buf = []
+        writer.write_rows(buf)
+
+    bad = [(m, c) for m, c in zip(manifests, counts) if c != m["rows"]]
+    if bad:
+        raise SystemExit("Row counts differ from the manifests: "
+                         + ", ".join(f"shard {m['shard']} has {c}, manifest says {m['rows']}" for m, c in bad))
+    failed = sum(m["failed_rows"] for m in manifests)
+    print(f"Done. Merged {len(manifests)} shard(s), {writer.rows_written} rows, into: {args.output}", file=sys.stderr)
+    if args.summary:
+        from metrics.stats import RunStats  # numpy; only loaded for summaries
+        stats = None
+        for m in manifests:
+            part = RunStats.load(m["summary_path"])
+            if stats is None:
+                stats = part
+            else:
+                stats.merge(part)
+        stats.dump(args.summary)
+        if args.summary != "-":
+            print(f"Summary of {stats.total.rows} rows written to: {args.summary}", file=sys.stderr)
+    if failed:
+        print(f"WARN: {failed} row(s) had failing metrics (recorded as NaN, or -1 when over budget)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from metrics.all_metrics import METRICS, ALIASES
+from metrics.batch import group_errors, iter_rows, read_source
+from metrics.cache import metric_version
+from metrics.guard import SnippetGuard
+from metrics.profile import MetricProfiler
+from cli.tabular import metric_types, open_writer
+
+DEFAULT_EXCLUDES = ["*.g.dart", "*.freezed.dart"]
+
+def normalize_key(k: str) -> str:
+    kk = k.strip().lower()
+    if kk in METRICS:
+        return kk
+    return ALIASES.get(kk, kk)
+
+def positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {n}")
+    return n
+
+# --- .gitignore ----------------------------------------------------------------
+# (base dir relative to root, compiled pattern, negated, dir-only)
+Rule = Tuple[str, "re.Pattern", bool, bool]
+
+def _glob_to_regex(pat: str) -> str:
+    out = []
+    i, n = 0, len(pat)
+    while i < n:
+        # `**` is only special as a whole path segment; elsewhere (`foo**bar`) it is a plain `*`
+        segment = i == 0 or pat[i - 1] == "/"
+        if segment and pat.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif segment and pat.startswith("**", i) and i + 2 == n:
+            out.append(".*")
+            i += 2
+        elif pat[i] == "*":
+            out.append("[^/]*")
+            while i < n and pat[i] == "*":
+                i += 1
+        elif pat[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pat[i] == "[":
+            j = pat.find("]", i + 2)
+            if j == -1:
+                out.append(re.escape("["))
+                i += 1
+            else:
+                body = pat[i+1:j]
+                if body[0] == "!":
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = j + 1
+        else:
+            out.append(re.escape(pat[i]))
+            i += 1
+    return "".join(out)
+
+def parse_gitignore(path: Path, base: str) -> List[Rule]:
+    rules = []
+    for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        neg = line.startswith("!")
+        if neg:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # a slash anywhere but the end anchors the pattern to this directory
+        anchored = "/" in line
+        body = _glob_to_regex(line.lstrip("/"))
+        rx = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+        rules.append((base, rx, neg, dir_only))
+    return rules
+
+def is_ignored(rel: str, is_dir: bool, rules: Sequence[Rule]) -> bool:
+    """Git semantics: the last matching rule wins; deeper .gitignore files come later."""
+    ignored = False
+    for base, rx, neg, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel.startswith(base + "/"):
+                continue
+            sub = rel[len(base)+1:]
+        else:
+            sub = rel
+        if rx.match(sub):
+            ignored = not neg
+    return ignored
+
+def iter_dart_files(root, excludes: Sequence[str] = DEFAULT_EXCLUDES, use_gitignore: bool = True) -> Iterator[Tuple[str, Path]]:
+    """Yield (posix path relative to root, absolute path) for every .dart file, in sorted order."""
+    root = Path(root)
+    rules_at = {"": parse_gitignore(root / ".gitignore", "") if use_gitignore and (root / ".gitignore").is_file() else []}
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = Path(dirpath).relative_to(root).as_posix()
+        rel_dir = "" if rel_dir == "." else rel_dir
+        rules = rules_at.pop(rel_dir)
+        keep = []
+        for d in sorted(dirnames):
+            rel = f"{rel_dir}/{d}" if rel_dir else d
+            if d == ".git" or is_ignored(rel, True, rules):
+                continue
+            gi = Path(dirpath, d, ".gitignore")
+            rules_at[rel] = rules + parse_gitignore(gi, rel) if use_gitignore and gi.is_file() else rules
+            keep.append(d)
+        dirnames[:] = keep
+        for f in sorted(filenames):
+            if not f.endswith(".dart"):
+                continue
+            rel = f"{rel_dir}/{f}" if rel_dir else f
+            if any(fnmatch(f, g) or fnmatch(rel, g) for g in excludes):
+                continue
+            if is_ignored(rel, False, rules):
+                continue
+            yield rel, Path(dirpath, f)
+
+# --- incremental runs ----------------------------------------------------------
+def file_digest(path) -> str:
+    with open(path, "rb") as fh:
+        return _digest(fh.read())
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def read_tracked(path) -> Tuple[str, Tuple[int, int, str]]:
+    """
+    read_source() for --manifest runs: the code plus (mtime_ns, size, digest)
+    of the bytes actually analysed, stat taken before the read, so a file
+    changed meanwhile is never recorded with values of other content.
+    """
+    with open(path, "rb") as fh:
+        st = os.fstat(fh.fileno())
+        data = fh.read()
+    return data.decode("utf-8-sig", errors="replace"), (st.st_mtime_ns, st.st_size, _digest(data))
+
+def git_changed_files(root: Path, since: str) -> Set[str]:
+    """Paths (relative to root) changed since `since`, staged or not, plus untracked files."""
+    def git(*argv):
+        res = subprocess.run(["git", "-C", str(root), *argv], capture_output=True, text=True)
+        if res.returncode != 0:
+            raise SystemExit(f"git {' '.join(argv)} failed: {res.stderr.strip()}")
+        return [l for l in res.stdout.splitlines() if l]
+    return set(git("diff", "--name-only", "--relative", since, "--")) | set(
+        git("ls-files", "--others", "--exclude-standard")
+    )
+
+class ScanManifest:
+    """
+    Per-file results of the previous scan, keyed by path relative to the root:
+    stat (mtime_ns, size), content digest and metric values. An entry is reused
+    when its stat is unchanged (or only mtime moved and the content digest still
+    matches) and it was computed with the current version of every metric.
+    """
+    FORMAT = 1
+
+    def __init__(self, path, keys: Sequence[str]):
+        self.path = Path(path)
+        self.keys = list(keys)
+        self.versions = {k: metric_version(k) for k in self.keys}
+        self.files: Dict[str, dict] = {}
+        self._next: Dict[str, dict] = {}
+        if self.path.is_file():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("format") == self.FORMAT:
+                old = data.get("metrics", {})
+                if all(old.get(k) == v for k, v in self.versions.items()):
+                    self.files = data.get("files", {})
+
+    def reusable(self, rel: str, path: Path, st: os.stat_result, changed: Optional[Set[str]]) -> Optional[dict]:
+        """Return the cached {label: value} for rel if it can be reused, else None."""
+        entry = self.files.get(rel)
+        if entry is None:
+            return None
+        if changed is not None:
+            ok = rel not in changed
+        elif entry["size"] != st.st_size:
+            ok = False
+        elif entry["mtime_ns"] == st.st_mtime_ns:
+            ok = True
+        else:
+            ok = file_digest(path) == entry["digest"]
+        if not ok:
+            return None
+        self.keep(rel, st.st_mtime_ns, st.st_size, entry["digest"], entry["values"])
+        return entry["values"]
+
+    def keep(self, rel: str, mtime_ns: int, size: int, digest: str, values: dict) -> None:
+        self._next[rel] = {"mtime_ns": mtime_ns, "size": size, "digest": digest, "values": values}
+
+    def save(self) -> None:
+        """Write the entries of this run (files that disappeared are dropped)."""
+        data = {"format": self.FORMAT, "metrics": self.versions, "files": self._next}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+def main():
+    ap = argparse.ArgumentParser(description="Compute metrics for every .dart file under a Flutter/Dart project")
+    ap.add_argument("root", help="Project directory to scan")
+    ap.add_argument("--output", "-o", default="-",
+                    help="Output file (.csv/.tsv/.jsonl/.parquet/.xlsx); '-' prints CSV (default)")
+    ap.add_argument("--metrics", help="Comma-separated labels or keys (e.g., LoC,NoM,NoP,...)")
+    ap.add_argument("--metric", action="append", help="Repeatable; each a label or key (order preserved)")
+    ap.add_argument("--all", action="store_true", help="Use all 20 metrics (default if no list provided)")
+    ap.add_argument("--exclude", action="append", default=None,
+                    help=f"Glob of files to skip; repeatable (default: {', '.join(DEFAULT_EXCLUDES)})")
+    ap.add_argument("--no-gitignore", action="store_true", help="Do not honour .gitignore files")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    ap.add_argument("--work-size", type=positive_int, default=16, help="Files per work unit (default: 16)")
+    ap.add_argument("--manifest", help="JSON manifest of the previous run; only changed files are recomputed")
+    ap.add_argument("--since", metavar="REV",
+                    help="With --manifest: recompute only files changed since this git revision (plus untracked)")
+    ap.add_argument("--timeout", type=float, metavar="SECONDS",
+                    help="Per-snippet time budget; metrics run in a killable child process and "
+                         "over-budget ones are written as -1")
+    ap.add_argument("--max-chars", type=int, metavar="N", help="Snippets longer than N characters are written as -1")
+    ap.add_argument("--profile", nargs="?", const="-", metavar="DEST",
+                    help="Profile per-metric timings; table to stderr, or write DEST (.json for JSON)")
+    args = ap.parse_args()
+
+    order_keys = []
+    if args.metrics:
+        order_keys.extend([normalize_key(m) for m in args.metrics.split(",") if m.strip()])
+    if args.metric:
+        order_keys.extend([normalize_key(m) for m in args.metric])
+    if args.all or not order_keys:
+        order_keys = list(METRICS)
+
+    bad = [k for k in order_keys if k not in METRICS]
+    if bad:
+        raise SystemExit(f"Unknown metric key(s): {bad}")
+
+    root = Path(args.root)
+    if not root.is_dir():
+        raise SystemExit(f"Not a directory: {root}")
+    excludes = DEFAULT_EXCLUDES if args.exclude is None else args.exclude
+
+    if args.since and not args.manifest:
+        raise SystemExit("--since needs --manifest (rows for unchanged files come from it)")
+
+    labels = [METRICS[k][0] for k in order_keys]
+    manifest = ScanManifest(args.manifest, order_keys) if args.manifest else None
+    changed = git_changed_files(root, args.since) if args.since else None
+
+    # (rel, path, reused values or None), in walk order
+    plan = []
+    for rel, path in iter_dart_files(root, excludes, not args.no_gitignore):
+        st = path.stat()
+        reused = manifest.reusable(rel, path, st, changed) if manifest else None
+        plan.append((rel, path, reused))
+    todo = [(rel, str(path)) for rel, path, reused in plan if reused is None]
+    profiler = MetricProfiler() if args.profile else None
+    guard = SnippetGuard(args.timeout, args.max_chars) if args.timeout or args.max_chars else None
+    load = read_tracked if manifest is not None else read_source
+    rows = iter_rows(todo, order_keys, workers=args.workers, chunk_size=args.work_size, load=load,
+                     profiler=profiler, guard=guard)
+
+    failed = 0
+    with open_writer(args.output, ["path"] + labels, metric_types(order_keys)) as writer:
+        buf = []
+        for rel, _, reused in plan:
+            if reused is not None:
+                buf.append([rel] + [reused[l] for l in labels])
+                continue
+            sid, values, errors = next(rows)
+            buf.append([rel] + [values[l] for l in labels])
+            if manifest is not None and not errors:
+                manifest.keep(rel, *sid[1], values)
+            if errors:
+                failed += 1
+                for label, msg in group_errors(errors):
+                    print(f"WARN: {rel}: {label} failed: {msg}", file=sys.stderr)
+            if len(buf) >= 1000:
+                writer.write_rows(buf)
+                buf = []
+        writer.write_rows(buf)
+
+    print(f"Done. Scanned {writer.rows_written} .dart file(s) under {root}", file=sys.stderr)
+    if manifest is not None:
+        manifest.save()
+        print(f"Incremental: {len(todo)} recomputed, {len(plan) - len(todo)} reused from {args.manifest}",
+              file=sys.stderr)
+    if guard is not None:
+        guard.close()
+    if profiler is not None:
+        profiler.dump(args.profile)
+    if failed:
+        print(f"WARN: {failed} file(s) had failing metrics (recorded as NaN, or -1 when over budget)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Long-running metrics server: the registry is imported and the regexes are
+compiled once, so a request only pays for the analysis itself.
+
+    python -m cli.serve                          # http://127.0.0.1:8765
+    python -m cli.serve --socket /tmp/dart-metrics.sock
+
+Endpoints (JSON in, JSON out; HTTP/1.1 keep-alive):
+    GET  /health   -> {"status": "ok", "metrics": [labels], "workers": N}
+    POST /analyze  {"snippets": ["code", ...] or [{"id": ..., "code": ...}, ...],
+                    "metrics": ["LoC", "cc", ...]}          # optional, default all
+                -> {"results": [{"id": ..., "metrics": {label: value},
+                                 "errors": [{"metric": label, "message": ...}]}],
+                    "elapsed_ms": ...}
+Failed metrics are null. Small batches are computed in the request thread;
+larger ones are split over a pool of worker processes that stay warm too.
+"""
+import argparse
+import json
+import math
+import os
+import socketserver
+import stat
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+from metrics.all_metrics import METRICS, ALIASES
+from metrics.batch import chunked, compute_for_code
+
+DEFAULT_PORT = 8765
+# request bodies larger than this are refused (413)
+MAX_BODY_BYTES = 256 * 1024 * 1024
+
+def normalize_key(k: str) -> str:
+    kk = k.strip().lower()
+    if kk in METRICS:
+        return kk
+    return ALIASES.get(kk, kk)
+
+def _jsonable(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+def _analyze_chunk(codes, keys):
+    """[(values, errors)] for a list of snippets; runs in the request thread or a pool worker."""
+    out = []
+    for code in codes:
+        errors = []
+        values = compute_for_code(code, keys, errors)
+        out.append(({label: _jsonable(v) for label, v in values.items()}, errors))
+    return out
+
+def _warm_up() -> None:
+    # touch every metric once so lazily imported modules and their regexes are ready
+    compute_for_code("class A { void f() { if (a) setState(() {}); } }", list(METRICS))
+
+class MetricsService:
+    """
+    Analyses batches of snippets. Batches of at most inline_max snippets run
+    in the calling thread; larger ones are split into chunk_size pieces over
+    `workers` processes (workers=0: always in-process).
+    """
+
+    def __init__(self, workers: int = 0, inline_max: int = 64, chunk_size: int = 64):
+        self.inline_max = inline_max
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up) if workers > 0 else None
+        _warm_up()
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def analyze(self, request: dict) -> dict:
+        """Handle one /analyze body; raises ValueError on a malformed request."""
+        t0 = perf_counter()
+        snippets = request.get("snippets")
+        if not isinstance(snippets, list):
+            raise ValueError("'snippets' must be a list")
+        names = request.get("metrics") or list(METRICS)
+        if isinstance(names, str):
+            names = names.split(",")
+        keys = [normalize_key(str(m)) for m in names]
+        bad = [m for m, k in zip(names, keys) if k not in METRICS]
+        if bad:
+            raise ValueError(f"Unknown metric(s): {bad}")
+
+        ids, codes = [], []
+        for i, item in enumerate(snippets):
+            if isinstance(item, dict):
+                ids.append(item.get("id", i))
+                codes.append(item.get("code"))
+            else:
+                ids.append(i)
+                codes.append(item)
+        if any(c is not None and not isinstance(c, str) for c in codes):
+            raise ValueError("every snippet must be a string (or {\"id\": ..., \"code\": string})")
+
+        if self.pool is None or len(codes) <= self.inline_max:
+            computed = _analyze_chunk(codes, keys)
+        else:
+            futures = [self.pool.submit(_analyze_chunk, chunk, keys) for chunk in chunked(codes, self.chunk_size)]
+            computed = [row for fut in futures for row in fut.result()]
+
+        results = [
+            {"id": sid, "metrics": values, "errors": [{"metric": label, "message": msg} for label, msg in errors]}
+            for sid, (values, errors) in zip(ids, computed)
+        ]
+        return {"results": results, "elapsed_ms": round((perf_counter() - t0) * 1000, 3)}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "dart-metrics"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write(f"{self.command} {self.path} " + (fmt % args) + "\n")
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _content_length(self) -> int:
+        """The request's Content-Length; ValueError (and the connection is closed) when it is not a length."""
+        text = self.headers.get("Content-Length") or "0"
+        try:
+            length = int(text)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # the body cannot be skipped, so the connection cannot be reused
+            self.close_connection = True
+            raise ValueError(f"invalid Content-Length: {text!r}")
+        return length
+
+    def do_GET(self):
+        if self.path == "/health":
+            service = self.server.service
+            self._reply(200, {"status": "ok", "metrics": [label for label, _ in METRICS.values()],
+                              "workers": service.workers})
+        else:
+            self._reply(404, {"error": f"no such endpoint: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/analyze":
+            self._reply(404, {"error": f"no such endpoint: {self.path}"})
+            return
+        try:
+            length = self._content_length()
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self._reply(413, {"error": f"request body over {MAX_BODY_BYTES} bytes"})
+                return
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request body must be a JSON object")
+            body = self.server.service.analyze(request)
+        except ValueError as exc:  # includes JSONDecodeError
+            self._reply(400, {"error": str(exc)})
+            return
+        except Exception as exc:
+            self._reply(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        self._reply(200, body)
+
+class _TCPHandler(_Handler):
+    # headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        conn, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return conn, ("local", 0)
+
+def _is_socket(path) -> bool:
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+def make_server(service: MetricsService, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                socket_path: str = None, verbose: bool = False):
+    """
+    A server for service on host:port, or on the Unix socket socket_path. A
+    socket left at socket_path by an earlier run is replaced; any other file
+    there raises FileExistsError.
+    """
+    if socket_path:
+        if _is_socket(socket_path):
+            os.unlink(socket_path)
+        elif os.path.lexists(socket_path):
+            raise FileExistsError(f"{socket_path} exists and is not a socket; not replacing it")
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _TCPHandler)
+        server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve Dart/Flutter snippet metrics over local HTTP (JSON)")
+    ap.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    ap.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Worker processes for large batches (default: CPU count; 0: in-process only)")
+    ap.add_argument("--inline-max", type=int, default=64,
+                    help="Batches up to this many snippets skip the pool (default: 64)")
+    ap.add_argument("--chunk-size", type=int, default=64, help="Snippets per pool task (default: 64)")
+    ap.add_argument("--verbose", action="store_true", help="Log every request to stderr")
+    args = ap.parse_args()
+
+    service = MetricsService(args.workers, args.inline_max, args.chunk_size)
+    try:
+        server = make_server(service, args.host, args.port, args.socket, args.verbose)
+    except FileExistsError as exc:
+        service.close()
+        raise SystemExit(f"ERROR: {exc}")
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving {len(METRICS)} metrics on {where} ({args.workers} worker(s)); Ctrl-C to stop", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and _is_socket(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Sharded batch runs: the rows of one input are split into N shards by a
+stable hash of sample_id, each shard is run on its own (`cli.batch --shard
+K/N`, any process or machine) and `cli.merge` puts the outputs back together
+in input order.
+
+Every shard output starts with an `input_row` column (the row's position in
+the input) and comes with a manifest, <output>.manifest.json: the shard, the
+input's checksum, the metric keys with their versions, the output columns,
+row counts, the output's checksum and, with --summary, the summary file and
+its checksum. Merging checks all of them, so shards
+of different inputs, metric selections or code versions are never mixed,
+and a truncated or missing shard is named rather than silently dropped.
+"""
+import csv
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+__all__ = ["ROW_COL", "SHARD_FORMATS", "parse_shard", "shard_of", "file_sha256",
+           "manifest_path", "write_manifest", "read_manifest", "iter_shard_rows"]
+
+ROW_COL = "input_row"
+MANIFEST_FORMAT = 1
+# shard outputs must be readable back row for row; Excel output is split over sheets
+SHARD_FORMATS = ("csv", "jsonl", "parquet")
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'K/N' -> (K, N), with 0 <= K < N."""
+    try:
+        k, n = (int(p) for p in spec.split("/"))
+    except ValueError:
+        raise SystemExit(f"--shard must look like K/N (e.g. 0/8), not '{spec}'")
+    if n < 1 or not 0 <= k < n:
+        raise SystemExit(f"--shard {spec}: need 0 <= K < N")
+    return k, n
+
+def shard_of(sample_id, shards: int) -> int:
+    """Stable shard of a sample_id: blake2b of str(sample_id), not Python's salted hash()."""
+    digest = hashlib.blake2b(str(sample_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def manifest_path(output) -> Path:
+    output = Path(output)
+    return output.with_name(output.name + ".manifest.json")
+
+def write_manifest(output, *, input_path, shard: int, shards: int, versions: Dict[str, str],
+                   columns: Sequence[str], rows: int, input_rows: int, failed_rows: int,
+                   summary=None) -> Path:
+    """Write the manifest of a finished shard output (and its summary file, if any); returns its path."""
+    path = manifest_path(output)
+    data = {
+        "format": MANIFEST_FORMAT,
+        "input": str(input_path),
+        "input_sha256": file_sha256(input_path),
+        "shard": shard,
+        "shards": shards,
+        "metrics": dict(versions),
+        "columns": list(columns),
+        "input_rows": input_rows,
+        "rows": rows,
+        "failed_rows": failed_rows,
+        "output": Path(output).name,
+        "output_sha256": file_sha256(output),
+        # relative to the manifest, like the output
+        "summary": os.path.relpath(summary, path.parent) if summary else None,
+        "summary_sha256": file_sha256(summary) if summary else None,
+    }
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=1) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+def read_manifest(path) -> dict:
+    path = Path(path)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise SystemExit(f"Cannot read manifest {path}: {exc}")
+    if data.get("format") != MANIFEST_FORMAT:
+        raise SystemExit(f"{path}: unsupported manifest format {data.get('format')!r}")
+    data["output_path"] = path.with_name(data["output"])
+    data["summary_path"] = path.parent / data["summary"] if data.get("summary") else None
+    return data
+
+# --- reading shard outputs back ------------------------------------------------
+# Values come back as they were written (CSV cells as text), so a merged file
+# is the same as the output of one unsharded run in the same format.
+def _rows_csv(path: Path) -> Iterator[list]:
+    delim = "\t" if path.suffix.lower() == ".tsv" else ","
+    with open(path, encoding="utf-8", newline="") as fh:
+        reader = csv.reader(fh, delimiter=delim)
+        next(reader, None)
+        yield from reader
+
+def _rows_jsonl(path: Path, columns: List[str]) -> Iterator[list]:
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                rec = json.loads(line)
+                yield [rec.get(c) for c in columns]
+
+def _rows_parquet(path: Path, columns: List[str]) -> Iterator[list]:
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=10_000, columns=columns):
+        yield from (list(r) for r in zip(*(batch.column(c).to_pylist() for c in columns)))
+
+def iter_shard_rows(path, fmt: str, columns: List[str]) -> Iterator[Tuple[int, list]]:
+    """(input_row, the other values) for every row of a shard output, in file order."""
+    path = Path(path)
+    if fmt == "csv":
+        rows = _rows_csv(path)
+    elif fmt == "jsonl":
+        rows = _rows_jsonl(path, columns)
+    else:
+        rows = _rows_parquet(path, columns)
+    for row in rows:
+        yield int(row[0]), row[1:]
@@ -0,0 +1,264 @@
+
+"""
+Chunked readers and incremental writers for the batch CLIs.
+Formats are picked from the file suffix: .csv/.tsv, .jsonl/.ndjson,
+.parquet and .xlsx/.xlsm/.xls. Peak memory is bounded by the chunk size,
+not by the size of the dataset.
+"""
+import csv
+import json
+import math
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+__all__ = ["FORMATS", "detect_format", "iter_columns", "iter_pairs", "metric_types", "open_writer", "EXCEL_MAX_ROWS"]
+
+FORMATS = {
+    ".csv": "csv", ".tsv": "csv",
+    ".jsonl": "jsonl", ".ndjson": "jsonl",
+    ".parquet": "parquet", ".pq": "parquet",
+    ".xlsx": "excel", ".xlsm": "excel", ".xls": "excel",
+}
+
+# Excel sheets stop at 1,048,576 rows (header included)
+EXCEL_MAX_ROWS = 1_048_576
+
+def detect_format(path: Union[str, Path]) -> str:
+    fmt = FORMATS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise SystemExit(f"Unsupported file type '{Path(path).suffix}' (use one of: {', '.join(sorted(FORMATS))})")
+    return fmt
+
+def _missing(col: str, columns: Sequence[str]):
+    return SystemExit(f"Column '{col}' not found in input columns: {list(columns)}")
+
+# --- readers -------------------------------------------------------------------
+def _iter_csv(path: Path, cols: Sequence[str], chunk_size: int):
+    import pandas as pd
+    sep = "\t" if path.suffix.lower() == ".tsv" else ","
+    header = pd.read_csv(path, sep=sep, nrows=0).columns
+    for col in cols:
+        if col not in header:
+            raise _missing(col, header)
+    for df in pd.read_csv(path, sep=sep, usecols=list(dict.fromkeys(cols)), chunksize=chunk_size):
+        yield from zip(*(df[col].tolist() for col in cols))
+
+def _iter_jsonl(path: Path, cols: Sequence[str], chunk_size: int):
+    with open(path, encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            for col in cols:
+                if col not in rec:
+                    raise SystemExit(f"Line {lineno}: column '{col}' not found in record keys: {list(rec)}")
+            yield tuple(rec[col] for col in cols)
+
+def _iter_parquet(path: Path, cols: Sequence[str], chunk_size: int):
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(path)
+    names = pf.schema_arrow.names
+    for col in cols:
+        if col not in names:
+            raise _missing(col, names)
+    for batch in pf.iter_batches(batch_size=chunk_size, columns=list(dict.fromkeys(cols))):
+        yield from zip(*(batch.column(col).to_pylist() for col in cols))
+
+def _iter_excel(path: Path, cols: Sequence[str], chunk_size: int, sheet=0):
+    if path.suffix.lower() == ".xls":
+        # legacy .xls cannot be streamed; read it whole
+        import pandas as pd
+        df = pd.read_excel(path, sheet_name=sheet)
+        for col in cols:
+            if col not in df.columns:
+                raise _missing(col, df.columns)
+        yield from zip(*(df[col].tolist() for col in cols))
+        return
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        rows = ws.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        for col in cols:
+            if col not in header:
+                raise _missing(col, header)
+        idx = [header.index(col) for col in cols]
+        for row in rows:
+            if row is None or all(v is None for v in row):
+                continue
+            # read-only sheets drop trailing empty cells from a row
+            yield tuple(row[i] if i < len(row) else None for i in idx)
+    finally:
+        wb.close()
+
+def iter_columns(path, cols: Sequence[str], chunk_size: int = 10_000, sheet=0) -> Iterator[tuple]:
+    """Lazily yield a tuple of the `cols` values per row of a tabular file, reading chunk_size rows at a time."""
+    path = Path(path)
+    fmt = detect_format(path)
+    if fmt == "excel":
+        return _iter_excel(path, cols, chunk_size, sheet)
+    reader = {"csv": _iter_csv, "jsonl": _iter_jsonl, "parquet": _iter_parquet}[fmt]
+    return reader(path, cols, chunk_size)
+
+def iter_pairs(path, id_col: str, code_col: str, chunk_size: int = 10_000, sheet=0) -> Iterator[Tuple[object, object]]:
+    """Lazily yield (sample_id, code) from a tabular file, reading chunk_size rows at a time."""
+    return iter_columns(path, [id_col, code_col], chunk_size, sheet)
+
+# --- writers -------------------------------------------------------------------
+def _is_nan(v) -> bool:
+    return isinstance(v, float) and math.isnan(v)
+
+def metric_types(keys: Iterable[str]) -> Dict[str, str]:
+    """{label: Arrow type name} of metric columns: int64 counts, double for the ratios."""
+    from metrics.all_metrics import METRICS
+    from metrics.results import FLOAT_METRICS
+    return {METRICS[k][0]: "double" if k in FLOAT_METRICS else "int64" for k in keys}
+
+class _Writer(ABC):
+    def __init__(self, path: Path, columns: List[str], types: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.columns = list(columns)
+        self.types = dict(types or {})
+        self.rows_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @abstractmethod
+    def write_rows(self, rows: List[Sequence]) -> None:
+        """Append rows, one value per column."""
+
+    def close(self) -> None:
+        pass
+
+class _CsvWriter(_Writer):
+    def __init__(self, path, columns, types=None):
+        super().__init__(path, columns, types)
+        if str(path) == "-":
+            self._fh = sys.stdout
+        else:
+            self._fh = open(path, "w", encoding="utf-8", newline="")
+        delim = "\t" if path.suffix.lower() == ".tsv" else ","
+        self._w = csv.writer(self._fh, delimiter=delim)
+        self._w.writerow(self.columns)
+
+    def write_rows(self, rows):
+        self._w.writerows(["" if v is None or _is_nan(v) else v for v in row] for row in rows)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._fh is sys.stdout:
+            self._fh.flush()
+        else:
+            self._fh.close()
+
+class _JsonlWriter(_Writer):
+    def __init__(self, path, columns, types=None):
+        super().__init__(path, columns, types)
+        self._fh = open(path, "w", encoding="utf-8")
+
+    def write_rows(self, rows):
+        cols = self.columns
+        self._fh.writelines(
+            json.dumps({c: (None if _is_nan(v) else v) for c, v in zip(cols, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._fh.close()
+
+class _ParquetWriter(_Writer):
+    def __init__(self, path, columns, types=None):
+        super().__init__(path, columns, types)
+        self._pw = None
+        self._schema = None
+
+    def _type(self, column):
+        import pyarrow as pa
+        name = self.types.get(column)
+        return None if name is None else pa.type_for_alias(name)
+
+    def write_rows(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not rows:
+            return
+        # declared columns keep their type even when a chunk holds only missing values,
+        # which Arrow would otherwise infer as null and later chunks could not be cast to
+        cols = zip(self.columns, zip(*rows))
+        table = pa.Table.from_arrays([pa.array(list(c), type=self._type(name), from_pandas=True) for name, c in cols],
+                                     names=self.columns)
+        if self._pw is None:
+            # an undeclared column with no values yet becomes string, which later ints and floats cast to
+            self._schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                      for f in table.schema])
+            table = table.cast(self._schema)
+            self._pw = pq.ParquetWriter(self.path, self._schema)
+        elif table.schema != self._schema:
+            table = table.cast(self._schema)
+        self._pw.write_table(table)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._pw is None:
+            # no rows: still leave a readable file with the expected columns
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.table({c: pa.array([], self._type(c) or pa.null()) for c in self.columns}), self.path)
+        else:
+            self._pw.close()
+
+class _ExcelWriter(_Writer):
+    """Write-only workbook; rolls over to a new sheet when a sheet is full."""
+
+    def __init__(self, path, columns, types=None):
+        super().__init__(path, columns, types)
+        from openpyxl import Workbook
+        self._wb = Workbook(write_only=True)
+        self._sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self._sheets += 1
+        self._ws = self._wb.create_sheet(f"Sheet{self._sheets}")
+        self._ws.append(self.columns)
+        self._sheet_rows = 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self._sheet_rows >= EXCEL_MAX_ROWS:
+                self._new_sheet()
+            self._ws.append([None if _is_nan(v) else v for v in row])
+            self._sheet_rows += 1
+        self.rows_written += len(rows)
+
+    @property
+    def sheets(self) -> int:
+        return self._sheets
+
+    def close(self):
+        self._wb.save(self.path)
+
+_WRITERS = {"csv": _CsvWriter, "jsonl": _JsonlWriter, "parquet": _ParquetWriter, "excel": _ExcelWriter}
+
+def open_writer(path, columns: Sequence[str], types: Optional[Dict[str, str]] = None) -> _Writer:
+    """
+    Open an incremental writer for `path`; call write_rows() per chunk, then
+    close(). A path of "-" writes CSV to stdout. `types` maps column names to
+    Arrow type names ("int64", "double", "string"); Parquet declares those
+    columns with them and infers the rest from the first chunk.
+    """
+    path = Path(path)
+    if str(path) == "-":
+        return _CsvWriter(path, columns, types)
+    fmt = detect_format(path)
+    if fmt == "excel" and path.suffix.lower() == ".xls":
+        raise SystemExit("Writing legacy .xls is not supported; use .xlsx")
+    return _WRITERS[fmt](path, columns, types)
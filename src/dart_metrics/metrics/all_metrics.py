@@ -1,55 +1,72 @@
+import importlib
 
-from .common import count_loc
-from .methods import number_of_methods, max_number_of_params
-from .complexity import cyclomatic_complexity
-from .nesting import max_nesting_depth
-from .fields import number_of_fields
-from .comments import comment_ratio
-from .widgets import number_of_widgets, max_widget_nesting, child_chain_max_depth
+from .common import SnippetContext
 
-from .side_effects import (
-    setstate_call_count,
-    provider_bloc_mutation_count,
-    field_assignment_count,
-    mutable_collection_mod_count,
-    api_call_count,
-)
+__all__ = ["METRICS", "ALIASES", "INPUTS", "SnippetContext"]
 
-from .runtime_effects import (
-    database_call_count,     # DbC
-    sync_io_count,           # SyncIO
-    image_codec_count,       # ImgC
-    async_await_ui_count,    # AsyncUI
-    timer_stream_init_count, # TmrStr
-)
+class _LazyMetric:
+    """
+    Stands in for a metric function until it is first called. Then its module
+    is imported (compiling its regexes) and the METRICS entry is replaced by
+    the real function, so selecting one metric only loads what it needs.
+    Callers that kept the stand-in (a reference taken from METRICS before
+    the first call) reach the cached function directly from then on.
+    """
 
-__all__ = ["METRICS", "ALIASES"]
+    def __init__(self, key: str, module: str, name: str):
+        self.key = key
+        self.__module__ = f"{__package__}.{module}"
+        self.__name__ = self.__qualname__ = name
+        self._func = None
 
-METRICS = {
-    "loc":  ("LoC",  count_loc),
-    "nom":  ("NoM",  number_of_methods),
-    "nop":  ("NoP",  max_number_of_params),
-    "cc":   ("CC",   cyclomatic_complexity),
-    "mnd":  ("MND",  max_nesting_depth),
-    "nof":  ("NoF",  number_of_fields),
-    "cr":   ("CR",   comment_ratio),
-    "now":  ("NoW",  number_of_widgets),
-    "mnw":  ("MNW",  max_widget_nesting),
-    "sccl": ("SCCL", child_chain_max_depth),
-    
-    "sstc": ("sStC", setstate_call_count),
-    "pbm":  ("PBM",  provider_bloc_mutation_count),
-    "fac":  ("FAC",  field_assignment_count),
-    "mc":   ("MC",   mutable_collection_mod_count),
-    "api":  ("API",  api_call_count),
+    def resolve(self):
+        if self._func is None:
+            self._func = getattr(importlib.import_module(self.__module__), self.__name__)
+            METRICS[self.key] = (METRICS[self.key][0], self._func)
+        return self._func
 
-    "dbc":    ("DbC",    database_call_count),
-    "syncio": ("SyncIO", sync_io_count),
-    "imgc":   ("ImgC",   image_codec_count),
-    "asyncui":("AsyncUI",async_await_ui_count),
-    "tmrstr": ("TmrStr", timer_stream_init_count),
+    def __call__(self, code):
+        func = self._func
+        if func is None:
+            func = self.resolve()
+        return func(code)
+
+    def __repr__(self):
+        state = "loaded" if self._func is not None else "not loaded"
+        return f"<metric {self.__module__}.{self.__name__} ({state})>"
+
+# key: (label, module, function, SnippetContext intermediates it reads; see plan.py)
+_SPEC = {
+    "loc":  ("LoC",  "common",      "count_loc",             ("loc",)),
+    "nom":  ("NoM",  "methods",     "number_of_methods",     ("signatures",)),
+    "nop":  ("NoP",  "methods",     "max_number_of_params",  ("signatures",)),
+    "cc":   ("CC",   "complexity",  "cyclomatic_complexity", ("tokens",)),
+    "mnd":  ("MND",  "nesting",     "max_nesting_depth",     ("tokens",)),
+    "nof":  ("NoF",  "fields",      "number_of_fields",      ("class_bodies",)),
+    "cr":   ("CR",   "comments",    "comment_ratio",         ("loc", "comment_lines")),
+    "now":  ("NoW",  "widgets",     "number_of_widgets",     ("widget_tree",)),
+    "mnw":  ("MNW",  "widgets",     "max_widget_nesting",    ("widget_tree",)),
+    "sccl": ("SCCL", "widgets",     "child_chain_max_depth", ("widget_tree",)),
+
+    "sstc": ("sStC", "side_effects", "setstate_call_count",          ("effect_counts",)),
+    "pbm":  ("PBM",  "side_effects", "provider_bloc_mutation_count", ("effect_counts",)),
+    "fac":  ("FAC",  "side_effects", "field_assignment_count",       ("effect_counts",)),
+    "mc":   ("MC",   "side_effects", "mutable_collection_mod_count", ("effect_counts",)),
+    "api":  ("API",  "side_effects", "api_call_count",               ("effect_counts",)),
+
+    "dbc":    ("DbC",    "runtime_effects", "database_call_count",     ("effect_counts",)),
+    "syncio": ("SyncIO", "runtime_effects", "sync_io_count",           ("effect_counts",)),
+    "imgc":   ("ImgC",   "runtime_effects", "image_codec_count",       ("effect_counts",)),
+    "asyncui":("AsyncUI","runtime_effects", "async_await_ui_count",    ("effect_counts",)),
+    "tmrstr": ("TmrStr", "runtime_effects", "timer_stream_init_count", ("effect_counts",)),
 }
 
+# {key: (label, func)}; func is a _LazyMetric until the metric is first used
+METRICS = {key: (label, _LazyMetric(key, module, name)) for key, (label, module, name, _) in _SPEC.items()}
+
+# {key: intermediates the metric reads}
+INPUTS = {key: spec[3] for key, spec in _SPEC.items()}
+
 ALIASES = {
     "line of code": "loc", "line_of_code": "loc", "line-of-code": "loc",
     "number of methods": "nom", "number_of_methods": "nom", "number-of-methods": "nom",
@@ -59,6 +76,7 @@ ALIASES = {
     "number of fields": "nof", "number_of_fields": "nof", "number-of-fields": "nof",
     "comment ratio": "cr", "comment_ratio": "cr", "comment-ratio": "cr",
     "number of widget": "now", "number_of_widget": "now", "number-of-widget": "now",
+    "number of widgets": "now", "number_of_widgets": "now", "number-of-widgets": "now",
     "maximum nesting widget": "mnw", "maximum_nesting_widget": "mnw", "maximum-nesting-widget": "mnw",
     "max widget tree depth": "mnw", "max_widget_tree_depth": "mnw",
     "single-child wrapper chain length": "sccl",
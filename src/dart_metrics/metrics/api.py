@@ -0,0 +1,107 @@
+"""
+Library entry point for computing metrics over a stream of snippets.
+
+    from metrics.api import analyze_many
+
+    for rec in analyze_many(read_pairs(), ["LoC", "cc", "number of widgets"], workers=4):
+        sink.write(rec.id, rec.values)        # {"LoC": 12, "CC": 3, "NoW": 5}
+
+analyze_many() takes any iterable of (id, code) - a generator over an
+object store, a database cursor, a file walk - and yields one Result per
+pair, lazily and in input order. Nothing is materialised: serially one row
+is in flight, with workers at most a few chunks per worker (see
+metrics.batch.iter_rows), so memory does not grow with the input.
+"""
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .all_metrics import ALIASES, METRICS
+from .batch import iter_rows
+from .cache import ResultCache
+from .guard import SnippetGuard
+
+__all__ = ["Result", "resolve_metrics", "analyze_many"]
+
+class Result:
+    """
+    One analysed snippet: `values` is {label: value} in the order of the
+    selected metrics, `errors` a tuple of (label, message) for metrics that
+    failed (their value is NaN; -1 when over a guard's budget).
+    Unpacks as (id, values, errors).
+    """
+    __slots__ = ("id", "values", "errors")
+
+    def __init__(self, id, values: dict, errors: Tuple[Tuple[str, str], ...] = ()):
+        self.id = id
+        self.values = values
+        self.errors = errors
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __iter__(self):
+        return iter((self.id, self.values, self.errors))
+
+    def __eq__(self, other):
+        if not isinstance(other, Result):
+            return NotImplemented
+        return (self.id, self.values, self.errors) == (other.id, other.values, other.errors)
+
+    def __repr__(self):
+        return f"Result(id={self.id!r}, values={self.values!r}, errors={self.errors!r})"
+
+def resolve_metrics(metrics: Union[None, str, Sequence[str]] = None) -> List[str]:
+    """
+    Registry keys for a selection of metrics, in the given order: keys
+    ("cc"), labels ("CC") or aliases ("cyclomatic complexity"), as a list or
+    one comma-separated string. None selects all 20. Unknown names raise
+    KeyError; repeats are dropped.
+    """
+    if metrics is None:
+        return list(METRICS)
+    if isinstance(metrics, str):
+        metrics = metrics.split(",")
+    keys = []
+    bad = []
+    for name in metrics:
+        kk = name.strip().lower()
+        if not kk:
+            continue
+        key = kk if kk in METRICS else ALIASES.get(kk)
+        if key is None:
+            bad.append(name)
+        elif key not in keys:
+            keys.append(key)
+    if bad:
+        raise KeyError(f"unknown metric(s): {', '.join(map(repr, bad))}")
+    return keys
+
+def analyze_many(
+    items: Iterable[Tuple[object, object]],
+    metrics: Union[None, str, Sequence[str]] = None,
+    *,
+    workers: int = 0,
+    chunk_size: int = 256,
+    guard: Optional[SnippetGuard] = None,
+    cache: Optional[ResultCache] = None,
+    columnar: bool = False,
+) -> Iterator[Result]:
+    """
+    Yield a Result for every (id, code) of `items`, in input order.
+
+    metrics: keys, labels or aliases (see resolve_metrics); all by default.
+    workers: > 1 computes chunks of chunk_size rows in a process pool; ids
+        and code must then be picklable. The input is read ahead by at most
+        4 * workers chunks.
+    guard: a SnippetGuard puts every snippet under a size/time budget.
+    cache: a ResultCache skips metrics already computed for the same code.
+    columnar: compute the regex-count metrics a chunk at a time (same values).
+
+    A missing code (None or NaN) gives zeros; a metric that raises gives NaN
+    and an entry in errors, never an exception, so one bad snippet does not
+    end the stream. An unknown metric raises KeyError here, before any
+    input is read.
+    """
+    keys = resolve_metrics(metrics)
+    rows = iter_rows(items, keys, workers=workers, chunk_size=chunk_size, cache=cache, guard=guard, columnar=columnar)
+    return (Result(sid, values, tuple(errors)) for sid, values, errors in rows)
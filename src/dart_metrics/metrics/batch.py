@@ -0,0 +1,243 @@
+
+import math
+import mmap
+import os
+from collections import deque
+from itertools import islice
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .all_metrics import METRICS
+from .cache import ResultCache, snippet_digest
+from .common import SnippetContext
+from .guard import SnippetGuard
+from .plan import prepare
+from .profile import MetricProfiler
+
+__all__ = ["compute_for_code", "chunked", "group_errors", "iter_rows", "read_source"]
+
+# Files at least this large are decoded straight from a memory map
+MMAP_MIN_BYTES = 64 * 1024
+
+def read_source(path) -> str:
+    """Read a source file as UTF-8 (BOM tolerated), via mmap for large files."""
+    with open(path, "rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            return fh.read().decode("utf-8-sig", errors="replace")
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8-sig", errors="replace")
+
+def compute_for_code(code, keys, errors: Optional[list] = None, timings: Optional[dict] = None):
+    """
+    Compute the metrics in `keys` for one snippet, as {label: value}.
+    A metric that raises is recorded as NaN; pass a list as `errors` to
+    collect (label, message) for each failure. Pass a dict as `timings` to
+    get {label: seconds} per metric (plus the shared intermediates, which
+    are built once up front; see plan.py).
+    """
+    if code is None or (isinstance(code, float) and math.isnan(code)):
+        out = {}
+        for key in keys:
+            label, _ = METRICS[key]
+            out[label] = 0
+        return out
+    ctx = SnippetContext(str(code))
+    timed = timings is not None
+    prepare(ctx, keys, timings)
+    out = {}
+    for key in keys:
+        label, func = METRICS[key]
+        if timed:
+            t0 = perf_counter()
+        try:
+            val = func(ctx)
+        except Exception as exc:
+            val = float("nan")
+            if errors is not None:
+                errors.append((label, f"{type(exc).__name__}: {exc}"))
+        if timed:
+            timings[label] = perf_counter() - t0
+        out[label] = val
+    return out
+
+def group_errors(errors) -> List[Tuple[str, str]]:
+    """Merge (label, message) failures sharing a message into ("A,B,...", message), in first-seen order."""
+    grouped = {}
+    for label, msg in errors:
+        grouped.setdefault(msg, []).append(label)
+    return [(",".join(labels), msg) for msg, labels in grouped.items()]
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+# --- process pool --------------------------------------------------------------
+_WORKER_KEYS: List[str] = []
+_WORKER_LOAD: Optional[Callable] = None
+_WORKER_CACHE: Optional[ResultCache] = None
+_WORKER_PROFILE = False
+_WORKER_GUARD: Optional[SnippetGuard] = None
+_WORKER_COLUMNAR = False
+
+def _init_worker(keys: Sequence[str], load: Optional[Callable] = None, cache_path=None, profile: bool = False,
+                 guard: Optional[SnippetGuard] = None, columnar: bool = False) -> None:
+    global _WORKER_KEYS, _WORKER_LOAD, _WORKER_CACHE, _WORKER_PROFILE, _WORKER_GUARD, _WORKER_COLUMNAR
+    _WORKER_KEYS = list(keys)
+    _WORKER_LOAD = load
+    _WORKER_CACHE = ResultCache(cache_path, readonly=True) if cache_path else None
+    _WORKER_PROFILE = profile
+    _WORKER_GUARD = guard
+    _WORKER_COLUMNAR = columnar
+
+def _nan_row(keys) -> dict:
+    return {METRICS[k][0]: float("nan") for k in keys}
+
+def _is_missing(source) -> bool:
+    return source is None or (isinstance(source, float) and math.isnan(source))
+
+def _compute(code, keys, errors, timings, guard):
+    if guard is None or _is_missing(code):
+        return compute_for_code(code, keys, errors, timings)
+    return guard.compute(str(code), keys, errors, timings)
+
+def _compute_one(sid, source, keys, load, cache, profile=False, guard=None):
+    """
+    Return (sid, values, errors, fresh, prof); fresh is (digest, computed, hit_keys)
+    for the cache, prof is (snippet size, {label: seconds}) when profiling.
+    """
+    errors = []
+    if load is not None:
+        try:
+            source = load(source)
+        except Exception as exc:
+            return sid, _nan_row(keys), [("*", f"{type(exc).__name__}: {exc}")], None, None
+        if isinstance(source, tuple):
+            # load returned (code, info): pass info back with the sample_id
+            source, info = source
+            sid = (sid, info)
+    timings = {} if profile and not _is_missing(source) else None
+    if cache is None or _is_missing(source):
+        values = _compute(source, keys, errors, timings, guard)
+        fresh = None
+    else:
+        code = str(source)
+        digest = snippet_digest(code)
+        hits = cache.lookup(digest, keys)
+        missing = [k for k in keys if k not in hits]
+        computed = _compute(code, missing, errors, timings, guard) if missing else {}
+        values = {}
+        for key in keys:
+            label = METRICS[key][0]
+            values[label] = hits[key] if key in hits else computed[label]
+        # failures (NaN, or BUDGET_EXCEEDED from a guard) are passed as NaN so they are not cached
+        failed = {label for label, _ in errors}
+        fresh = (digest, {k: float("nan") if METRICS[k][0] in failed else computed[METRICS[k][0]] for k in missing},
+                 list(hits))
+    prof = (len(str(source)), timings) if timings else None
+    return sid, values, errors, fresh, prof
+
+def _compute_columnar(chunk, keys):
+    """_compute_one() for a whole chunk of (sid, code) at once, column by column."""
+    from .columnar import compute_columns  # compiles the fused effect scan; load it only when used
+    results = compute_columns([source for _, source in chunk], keys)
+    return [(sid, values, errors, None, None) for (sid, _), (values, errors) in zip(chunk, results)]
+
+def _compute_chunk(chunk):
+    if _WORKER_COLUMNAR:
+        return _compute_columnar(chunk, _WORKER_KEYS)
+    return [_compute_one(sid, source, _WORKER_KEYS, _WORKER_LOAD, _WORKER_CACHE, _WORKER_PROFILE, _WORKER_GUARD)
+            for sid, source in chunk]
+
+def _collect(chunk, future, keys):
+    try:
+        return future.result()
+    except Exception as exc:
+        # the whole chunk was lost (worker crash, unpicklable row, ...)
+        msg = f"{type(exc).__name__}: {exc}"
+        return [(sid, _nan_row(keys), [("*", msg)], None, None) for sid, _ in chunk]
+
+def _iter_computed(pairs, keys, workers, chunk_size, load, cache, profile, guard, columnar):
+    if workers <= 1:
+        if columnar:
+            for chunk in chunked(pairs, chunk_size):
+                yield from _compute_columnar(chunk, keys)
+            return
+        for sid, source in pairs:
+            yield _compute_one(sid, source, keys, load, cache, profile, guard)
+        return
+
+    from concurrent.futures import Future, ProcessPoolExecutor  # only paid for when a pool is used
+    cache_path = None
+    if cache is not None:
+        cache.flush()
+        cache_path = cache.path
+    initargs = (keys, load, cache_path, profile, guard, columnar)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as ex:
+        pending = deque()
+        for chunk in chunked(pairs, chunk_size):
+            try:
+                fut = ex.submit(_compute_chunk, chunk)
+            except Exception as exc:
+                # the pool broke (a worker died): report this chunk, and every later one, row by row
+                fut = Future()
+                fut.set_exception(exc)
+            pending.append((chunk, fut))
+            if len(pending) >= workers * 4:
+                chunk, fut = pending.popleft()
+                yield from _collect(chunk, fut, keys)
+        while pending:
+            chunk, fut = pending.popleft()
+            yield from _collect(chunk, fut, keys)
+
+def iter_rows(
+    pairs: Iterable[Tuple[object, object]],
+    keys: Sequence[str],
+    workers: int = 0,
+    chunk_size: int = 256,
+    load: Optional[Callable] = None,
+    cache: Optional[ResultCache] = None,
+    profiler: Optional[MetricProfiler] = None,
+    guard: Optional[SnippetGuard] = None,
+    columnar: bool = False,
+) -> Iterator[Tuple[object, dict, list]]:
+    """
+    Yield (sample_id, {label: value}, errors) for every (sample_id, code) pair,
+    in input order. With workers > 1, chunks of rows are spread over a process
+    pool whose workers are initialised once with `keys`; at most a few chunks
+    per worker are in flight, so memory stays bounded for long inputs.
+    If `load` is given, pairs carry a source (e.g. a path) that is turned into
+    code by load(source) inside the worker, so reading is parallel too. A load
+    may return (code, info) instead, e.g. a digest of the bytes it read; that
+    row's sample_id then comes back as (sample_id, info).
+    With a ResultCache, only metrics missing from the cache (or cached under an
+    older metric version) are computed; new values are written back here.
+    With a MetricProfiler, per-metric timings of every row (measured in the
+    workers) are aggregated into it.
+    With a SnippetGuard, each snippet runs under its size/time budget; metrics
+    over budget come back as BUDGET_EXCEEDED (-1) with a diagnostic in errors.
+    With columnar=True, each chunk of rows is computed column by column (see
+    metrics.columnar); the values are the same. It only applies without
+    load/cache/profiler/guard, which work row by row.
+    chunk_size below 1 raises ValueError here, before any row is read.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, not {chunk_size}")
+    return _iter_rows(pairs, list(keys), workers, chunk_size, load, cache, profiler, guard, columnar)
+
+def _iter_rows(pairs, keys, workers, chunk_size, load, cache, profiler, guard, columnar):
+    profile = profiler is not None
+    columnar = columnar and load is None and cache is None and not profile and guard is None
+    computed = _iter_computed(pairs, keys, workers, chunk_size, load, cache, profile, guard, columnar)
+    for sid, values, errors, fresh, prof in computed:
+        if fresh is not None:
+            cache.record(*fresh)
+        if profile:
+            profiler.record(sid, *(prof or (None, None)), errors)
+        yield sid, values, errors
+    if cache is not None:
+        cache.flush()
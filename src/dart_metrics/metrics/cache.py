@@ -0,0 +1,170 @@
+
+import ast
+import hashlib
+import importlib
+import inspect
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+from .all_metrics import METRICS
+
+__all__ = ["ResultCache", "snippet_digest", "metric_version", "metric_versions"]
+
+def snippet_digest(code: str) -> bytes:
+    return hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+# --- metric versions -----------------------------------------------------------
+# A metric's version hashes the source of its module and of every module of this
+# package that module imports (transitively, lazy imports included). Editing any
+# function a metric depends on therefore invalidates its cached values.
+
+def _package_imports(modname: str) -> Set[str]:
+    tree = ast.parse(inspect.getsource(importlib.import_module(modname)))
+    deps = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.level:
+            base = modname.rsplit(".", node.level)[0]
+            if node.module:
+                deps.add(f"{base}.{node.module}")
+            else:
+                deps.update(f"{base}.{a.name}" for a in node.names)
+    return deps
+
+def _module_closure(modname: str) -> List[str]:
+    seen, todo = set(), [modname]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        todo.extend(_package_imports(name) - seen)
+    return sorted(seen)
+
+_VERSIONS: Dict[str, str] = {}
+
+def metric_version(key: str) -> str:
+    if key not in _VERSIONS:
+        func = METRICS[key][1]
+        h = hashlib.sha1(func.__qualname__.encode())
+        for name in _module_closure(func.__module__):
+            h.update(inspect.getsource(importlib.import_module(name)).encode())
+        _VERSIONS[key] = h.hexdigest()[:16]
+    return _VERSIONS[key]
+
+def metric_versions() -> Dict[str, str]:
+    return {k: metric_version(k) for k in METRICS}
+
+# --- store ---------------------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    digest    BLOB NOT NULL,
+    metric    TEXT NOT NULL,
+    version   TEXT NOT NULL,
+    value,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, metric)
+);
+CREATE INDEX IF NOT EXISTS results_lru ON results (last_used);
+"""
+
+class ResultCache:
+    """
+    Persistent metric results keyed by (snippet digest, metric key, metric version),
+    stored in SQLite. The main process is the single writer; worker processes open
+    the same file with readonly=True (WAL mode lets them read while it writes).
+    Writes are batched; once the live data exceeds max_mb the least recently used
+    rows are evicted.
+    """
+
+    def __init__(self, path, max_mb: float = 1024, readonly: bool = False, batch: int = 5000):
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.readonly = readonly
+        self.batch = batch
+        self.versions = metric_versions()
+        self.hits = 0
+        self.misses = 0
+        self._puts = []
+        self._touches = []
+        if readonly:
+            self._db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        else:
+            self._db = sqlite3.connect(str(self.path))
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, digest: bytes, keys: Iterable[str]) -> Dict[str, object]:
+        """Return {key: value} for the cached, up-to-date metrics among keys."""
+        wanted = set(keys)
+        out = {}
+        for metric, version, value in self._db.execute(
+            "SELECT metric, version, value FROM results WHERE digest = ?", (digest,)
+        ):
+            if metric in wanted and self.versions.get(metric) == version:
+                out[metric] = value
+        return out
+
+    def record(self, digest: bytes, computed: Dict[str, object], hit_keys: Iterable[str] = ()) -> None:
+        """Queue newly computed values and LRU touches for cached ones."""
+        now = time.time()
+        self.misses += len(computed)
+        for key, value in computed.items():
+            if isinstance(value, float) and math.isnan(value):
+                continue  # failures are retried on the next run
+            self._puts.append((digest, key, self.versions[key], value, now))
+        for key in hit_keys:
+            self.hits += 1
+            self._touches.append((now, digest, key))
+        if len(self._puts) + len(self._touches) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.readonly or not (self._puts or self._touches):
+            return
+        with self._db:
+            if self._puts:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO results (digest, metric, version, value, last_used) VALUES (?, ?, ?, ?, ?)",
+                    self._puts,
+                )
+            if self._touches:
+                self._db.executemany(
+                    "UPDATE results SET last_used = ? WHERE digest = ? AND metric = ?", self._touches
+                )
+        self._puts.clear()
+        self._touches.clear()
+        self.evict()
+
+    def used_bytes(self) -> int:
+        page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        pages = self._db.execute("PRAGMA page_count").fetchone()[0]
+        free = self._db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def evict(self) -> int:
+        """Drop least recently used rows until the store is back under ~90% of its cap."""
+        used = self.used_bytes()
+        if used <= self.max_bytes:
+            return 0
+        rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        drop = math.ceil(rows * (1 - 0.9 * self.max_bytes / used))
+        with self._db:
+            self._db.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY last_used LIMIT ?)", (drop,)
+            )
+        return drop
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
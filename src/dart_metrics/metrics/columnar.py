@@ -0,0 +1,96 @@
+
+"""
+Column-at-a-time execution for batches of snippets.
+
+The ten effect counters are plain regex counts, so for a column of snippets
+they are computed by one fused scan over all comment-stripped snippets joined
+with a separator, instead of one scan (and one Python dispatch) per row.
+Comments are stripped with tokens.strip_comments, which skips the full lexer.
+Each match is attributed to the row it starts in. A match can only differ
+from the per-row result if it runs across a separator. Rows touched by such
+a match are recounted on their own, so results equal the per-snippet
+functions exactly. The separator "\n\0\n" contains no word characters, and
+\s* cannot cross it, so no pattern can start a match inside it.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .all_metrics import METRICS
+from .common import SnippetContext
+from .effects import EFFECT_PATTERNS, _FUSED, count_effects
+
+__all__ = ["COLUMNAR_KEYS", "effect_count_columns", "compute_columns"]
+
+# metrics computed column-wide; the rest still run per row on a shared context
+COLUMNAR_KEYS = tuple(EFFECT_PATTERNS)
+
+SEPARATOR = "\n\0\n"
+
+def effect_count_columns(codes_nc: Sequence[str], keys: Sequence[str] = COLUMNAR_KEYS) -> Dict[str, List[int]]:
+    """{key: [count per row]} for the effect metrics in keys, over comment-stripped snippets."""
+    keys = [k for k in keys if k in EFFECT_PATTERNS]
+    n = len(codes_nc)
+    cols = {k: [0] * n for k in keys}
+    if not n or not keys:
+        return cols
+    text = SEPARATOR.join(codes_nc)
+    ends = []  # end offset of each row in text
+    pos = 0
+    for code in codes_nc:
+        pos += len(code)
+        ends.append(pos)
+        pos += len(SEPARATOR)
+
+    dirty = set()
+    resume = dict.fromkeys(keys, 0)
+    row = 0
+    for m in _FUSED.finditer(text):
+        start = m.start()
+        while row < n - 1 and start >= ends[row]:
+            row += 1
+        for key in keys:
+            s = m.start(key)
+            if s >= resume[key]:
+                e = m.end(key)
+                resume[key] = e
+                cols[key][row] += 1
+                if e > ends[row]:
+                    last = row
+                    while last < n - 1 and e > ends[last]:
+                        last += 1
+                    dirty.update(range(row, last + 1))
+    for i in dirty:
+        counts = count_effects(codes_nc[i])
+        for key in keys:
+            cols[key][i] = counts[key]
+    return cols
+
+def _missing(code) -> bool:
+    return code is None or (isinstance(code, float) and math.isnan(code))
+
+def compute_columns(codes: Sequence[object], keys: Sequence[str]) -> List[Tuple[dict, list]]:
+    """
+    Compute the metrics in `keys` for a column of snippets; returns one
+    ({label: value}, errors) per snippet, matching compute_for_code().
+    """
+    ctxs: List[Optional[SnippetContext]] = [None if _missing(c) else SnippetContext(str(c)) for c in codes]
+    live = [i for i, ctx in enumerate(ctxs) if ctx is not None]
+    counted = effect_count_columns([ctxs[i].code_nc for i in live], keys)
+    row_of = {i: j for j, i in enumerate(live)}
+    out = []
+    for i, ctx in enumerate(ctxs):
+        values, errors = {}, []
+        for key in keys:
+            label, func = METRICS[key]
+            if ctx is None:
+                values[label] = 0
+            elif key in counted:
+                values[label] = counted[key][row_of[i]]
+            else:
+                try:
+                    values[label] = func(ctx)
+                except Exception as exc:
+                    values[label] = float("nan")
+                    errors.append((label, f"{type(exc).__name__}: {exc}"))
+        out.append((values, errors))
+    return out
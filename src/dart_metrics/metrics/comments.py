@@ -1,9 +1,10 @@
 
-from .common import count_loc, comment_lines
+from .common import Snippet, snippet_context
 
 __all__ = ["comment_ratio"]
 
-def comment_ratio(code: str) -> float:
-    loc = count_loc(code)
-    com = comment_lines(code)
+def comment_ratio(code: Snippet) -> float:
+    ctx = snippet_context(code)
+    loc = ctx.loc
+    com = ctx.comment_lines
     return round((com / loc) if loc else 0.0, 3)
@@ -1,10 +1,15 @@
 
 import re
+from functools import cached_property
+from typing import Dict, List, Tuple, Union
+
+from .tokens import TokenStream, strip_comments, tokenize
 
 __all__ = [
     "strip_block_comments", "strip_line_comments", "remove_comments",
     "count_loc", "comment_lines",
     "find_matching_brace", "find_matching_paren",
+    "SnippetContext", "Snippet", "snippet_context",
 ]
 
 def strip_block_comments(code: str) -> str:
@@ -18,9 +23,10 @@ def strip_line_comments(code: str) -> str:
     return "\n".join(out)
 
 def remove_comments(code: str) -> str:
-    return strip_line_comments(strip_block_comments(code))
+    """Blank out comments with the Dart lexer; strings stay intact and offsets are preserved."""
+    return strip_comments(code)
 
-def count_loc(code: str) -> int:
+def _count_loc(code: str) -> int:
     code_wo_block = strip_block_comments(code)
     cnt = 0
     for line in code_wo_block.splitlines():
@@ -32,9 +38,11 @@ def count_loc(code: str) -> int:
         cnt += 1
     return cnt
 
-def comment_lines(code: str) -> int:
-    lines = code.splitlines()
-    in_block = False
+def _comment_lines(lines: List[str]) -> int:
+    return _comment_line_scan(lines, False)[0]
+
+def _comment_line_scan(lines: List[str], in_block: bool) -> Tuple[int, bool]:
+    """(comment lines, still inside a block comment) for lines that start in_block."""
     count = 0
     for line in lines:
         s = line.strip()
@@ -52,48 +60,114 @@ def comment_lines(code: str) -> int:
             if "*/" in s:
                 in_block = False
             continue
-    return count
-
-def find_matching_brace(s: str, open_idx: int) -> int:
-    depth = 0
-    in_q = None
-    i = open_idx
-    while i < len(s):
-        ch = s[i]
-        if in_q:
-            if ch == in_q:
-                in_q = None
-            i += 1
-            continue
-        if ch in ("'", '"'):
-            in_q = ch
-        elif ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                return i
-        i += 1
-    return -1
-
-def find_matching_paren(s: str, open_idx: int) -> int:
-    depth = 0
-    in_q = None
-    i = open_idx
-    while i < len(s):
-        ch = s[i]
-        if in_q:
-            if ch == in_q:
-                in_q = None
-            i += 1
-            continue
-        if ch in ("'", '"'):
-            in_q = ch
-        elif ch == "(":
-            depth += 1
-        elif ch == ")":
-            depth -= 1
-            if depth == 0:
-                return i
-        i += 1
-    return -1
+    return count, in_block
+
+class SnippetContext:
+    """
+    Preprocessed view of one snippet, shared by every metric.
+    Derived values are computed on first access and cached, so running
+    many metrics over the same snippet lexes, strips comments and splits
+    lines once. `code_nc` has the same offsets as `code`.
+    """
+
+    def __init__(self, code: str):
+        self.code = code
+
+    @cached_property
+    def tokens(self) -> TokenStream:
+        return tokenize(self.code)
+
+    @cached_property
+    def code_nc(self) -> str:
+        # reuse the token stream if a metric already built it; otherwise skip
+        # straight to the literals and comments (same text either way)
+        if "tokens" in self.__dict__:
+            return self.tokens.without_comments()
+        return strip_comments(self.code)
+
+    @cached_property
+    def lines(self) -> List[str]:
+        return self.code.splitlines()
+
+    @cached_property
+    def loc(self) -> int:
+        return _count_loc(self.code)
+
+    @cached_property
+    def comment_lines(self) -> int:
+        return _comment_lines(self.lines)
+
+    @cached_property
+    def effect_counts(self) -> Dict[str, int]:
+        """Counts of all ten side-effect / runtime-effect metrics, from one scan."""
+        from .effects import count_effects
+        return count_effects(self.code_nc)
+
+    @cached_property
+    def signatures(self) -> List[Tuple[int, int]]:
+        """(open, close) paren offsets of method/function declarations (NoM, NoP)."""
+        from .methods import find_signatures
+        return find_signatures(self)
+
+    @cached_property
+    def class_bodies(self) -> List[Tuple[int, int]]:
+        """(open, close) brace offsets of every class body (NoF)."""
+        from .fields import extract_class_bodies
+        return extract_class_bodies(self)
+
+    @cached_property
+    def widget_tree(self) -> "WidgetTree":
+        """Constructor calls as a compact tree (NoW, MNW, SCCL)."""
+        from .widgets import build_widget_tree
+        return build_widget_tree(self)
+
+    @cached_property
+    def scopes(self) -> "ScopeIndex":
+        """Class and method spans as a tree, for per-scope breakdowns (see scopes.py)."""
+        from .scopes import ScopeIndex
+        return ScopeIndex(self)
+
+Snippet = Union[str, SnippetContext]
+
+def snippet_context(code: Snippet) -> SnippetContext:
+    """Return `code` itself if it is already a context, else build one."""
+    if isinstance(code, SnippetContext):
+        return code
+    return SnippetContext(code)
+
+def count_loc(code: Snippet) -> int:
+    return snippet_context(code).loc
+
+def comment_lines(code: Snippet) -> int:
+    return snippet_context(code).comment_lines
+
+# the context of the last plain string passed to find_matching_*: callers
+# looping over the brackets of one text would otherwise lex it once per call
+_last_context = None
+
+def _bracket_context(s: Snippet) -> SnippetContext:
+    global _last_context
+    if isinstance(s, SnippetContext):
+        return s
+    ctx = _last_context
+    if ctx is None or (ctx.code is not s and ctx.code != s):
+        ctx = _last_context = SnippetContext(s)
+    return ctx
+
+def _find_matching(s: Snippet, open_idx: int, opener: str) -> int:
+    ctx = _bracket_context(s)
+    if ctx.code[open_idx:open_idx+1] != opener:
+        return -1
+    return ctx.tokens.match_bracket(open_idx)
+
+def find_matching_brace(s: Snippet, open_idx: int) -> int:
+    """
+    Offset of the '}' closing the '{' at open_idx (-1 if none), from the token
+    index. Pass the SnippetContext when there is one; a plain string reuses
+    the context of the previous call only if it is the same text.
+    """
+    return _find_matching(s, open_idx, "{")
+
+def find_matching_paren(s: Snippet, open_idx: int) -> int:
+    """Offset of the ')' closing the '(' at open_idx (-1 if none); see find_matching_brace."""
+    return _find_matching(s, open_idx, "(")
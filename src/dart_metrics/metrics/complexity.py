@@ -1,16 +1,114 @@
 
-import re
-from .common import remove_comments
+from typing import List, Optional
 
-__all__ = ["cyclomatic_complexity"]
+from .common import Snippet, snippet_context
+from .tokens import COMMENT, IDENT, KEYWORD, PUNCT, STRING, TokenStream, interpolation_spans, tokenize
 
-CC_TOKENS = re.compile(r'\bif\b|\bfor\b|\bwhile\b|\bcase\b|\bcatch\b|&&|\|\|', re.MULTILINE)
-TERNARY = re.compile(r'(?<!\?)\?(?!\?)')
+__all__ = ["cyclomatic_complexity", "decision_offsets"]
 
-def cyclomatic_complexity(code: str) -> int:
-    code_nc = remove_comments(code)
-    decisions = len(CC_TOKENS.findall(code_nc))
-    for m in TERNARY.finditer(code_nc):
-        if ':' in code_nc[m.end(): m.end()+200]:
-            decisions += 1
-    return 1 + decisions
+DECISION_KEYWORDS = frozenset(("if", "for", "while", "case", "catch"))
+DECISION_OPS = frozenset(("&&", "||"))
+
+# What the previous token says about the bracket that follows it (bit flags):
+# a '(' after a HEAD is a declaration's parameter list or a statement's
+# condition, so the '{' after its ')' opens a BODY. A '(' after anything
+# else starts a function literal, whose body can sit between a ternary's
+# '?' and ':' (`ok ? () { ... } : null`).
+HEAD, BODY = 1, 2
+_KEYWORD_FLAGS = {
+    **dict.fromkeys(("if", "for", "while", "catch", "super", "this"), HEAD | BODY),
+    **dict.fromkeys(("const", "new"), 0),  # a '{' after these starts a literal
+}
+# `) async {`, `) sync* {`: still the body of what the ')' closed
+_BODY_MODIFIERS = frozenset(("async", "sync"))
+
+class _TernaryState:
+    """What _decisions() carries from one piece of a text to the next."""
+    __slots__ = ("open_q", "heads", "prev")
+
+    def __init__(self):
+        self.open_q = [0]  # unpaired '?' per bracket depth
+        self.heads = []    # per open '(': whether it followed a HEAD
+        self.prev = 0      # HEAD/BODY flags of the last code token
+
+def _decisions(ts: TokenStream, state: Optional[_TernaryState] = None, hits: Optional[List[int]] = None,
+               base: int = 0) -> int:
+    """
+    One pass over the tokens. Keywords and &&/|| count directly. A `?` token
+    (`??`, `?.`, `?..` and `...?` are separate tokens) counts as a ternary
+    only once a `:` at the same bracket depth pairs with it; `?`s still open
+    at a `,`, `;`, a closing bracket or the `{` of a body were nullable types
+    (`String?`, `a?[i]`, `String? f() { ... }`).
+    Ternaries and conditions inside string interpolations count too.
+    Pass state to continue from (and update) the state of an earlier piece.
+    Pass hits to collect the offset (plus base) of every decision; a ternary
+    is placed at its `:`.
+    """
+    code = ts.code
+    decisions = 0
+    if state is None:
+        state = _TernaryState()
+    open_q, heads = state.open_q, state.heads
+    prev = state.prev
+    for kind, start, end in zip(ts.kinds, ts.starts, ts.ends):
+        if kind == PUNCT:
+            op = code[start:end]
+            flags = 0
+            if op == "?":
+                open_q[-1] += 1
+            elif op == ":":
+                if open_q[-1]:
+                    open_q[-1] -= 1
+                    decisions += 1
+                    if hits is not None:
+                        hits.append(base + start)
+            elif op in DECISION_OPS:
+                decisions += 1
+                if hits is not None:
+                    hits.append(base + start)
+            elif op in "([{":
+                if op == "(":
+                    heads.append(prev & HEAD)
+                elif op == "{" and prev & BODY:
+                    open_q[-1] = 0
+                open_q.append(0)
+            elif op in ")]}":
+                if len(open_q) > 1:
+                    open_q.pop()
+                else:
+                    open_q[0] = 0
+                if op == ")" and heads and heads.pop():
+                    flags = BODY
+            elif op == ";" or op == ",":
+                open_q[-1] = 0
+            elif op == ">":
+                flags = HEAD  # type arguments: `foo<T>(`
+            elif op == "*":
+                flags = prev & BODY  # `sync*`, `async*`
+            prev = flags
+        elif kind == IDENT:
+            prev = HEAD | BODY
+        elif kind == KEYWORD:
+            word = code[start:end]
+            if word in DECISION_KEYWORDS:
+                decisions += 1
+                if hits is not None:
+                    hits.append(base + start)
+            if word not in _BODY_MODIFIERS:
+                prev = _KEYWORD_FLAGS.get(word, BODY)
+        elif kind != COMMENT:
+            if kind == STRING and code.find("${", start, end) != -1:
+                for lo, hi in interpolation_spans(code, start):
+                    decisions += _decisions(tokenize(code[lo:hi]), None, hits, base + lo)
+            prev = 0
+    state.prev = prev
+    return decisions
+
+def cyclomatic_complexity(code: Snippet) -> int:
+    return 1 + _decisions(snippet_context(code).tokens)
+
+def decision_offsets(code: Snippet) -> List[int]:
+    """Offsets of the decision points counted by CC."""
+    hits = []
+    _decisions(snippet_context(code).tokens, hits=hits)
+    return hits
@@ -0,0 +1,85 @@
+
+"""
+Single-pass scanner for the ten side-effect / runtime-effect counters.
+
+The per-metric regexes in side_effects.py and runtime_effects.py stay the
+definition of each metric; here they are fused into one pattern that is tried
+once per candidate position. Every metric's regex sits in its own optional
+lookahead group, so one position can feed several counters, and each counter
+skips hits that start inside its own previous match. That reproduces
+len(rx.findall(s)) exactly for every metric.
+"""
+import re
+from typing import Dict, List
+
+from .side_effects import _SETSTATE_RE, _PBM_RE, _FAC_RE, _MC_RE, _API_RE
+from .runtime_effects import _DBC_RE, _SYNCIO_RE, _IMGC_RE, _AWAIT_RE, _TMRSTR_RE
+
+__all__ = ["EFFECT_PATTERNS", "count_effects", "effect_hits"]
+
+# metric key -> its regex (the metric keys of all_metrics.METRICS)
+EFFECT_PATTERNS = {
+    "sstc": _SETSTATE_RE,
+    "pbm": _PBM_RE,
+    "fac": _FAC_RE,
+    "mc": _MC_RE,
+    "api": _API_RE,
+    "dbc": _DBC_RE,
+    "syncio": _SYNCIO_RE,
+    "imgc": _IMGC_RE,
+    "asyncui": _AWAIT_RE,
+    "tmrstr": _TMRSTR_RE,
+}
+
+# Every position where any of the patterns can start matches one of these
+# prefixes; the per-metric lookaheads are only tried there.
+_ANCHOR = r"""
+    \b(?:setState|this|widget|Timer|Stream|BehaviorSubject|PublishSubject|ReplaySubject
+        |instantiateImageCodec|decodeImage|ImageDescriptor|await|sleep
+        |read|write|flush|open|rename|delete|create|exists|stat|copy)
+  | (?i:\b(?:http|dio|websocket|db|database|hive|box|sharedpreferences|prefs|preferences
+             |into|select|custom|update|delete|store))
+  | (?i:context\.|blocprovider\.|provider\.|ref\.read)
+  | \.(?:add|insert|remove|clear)
+  | \[
+"""
+
+def _fuse() -> "re.Pattern":
+    # the leading character class lets the regex engine skip spaces and
+    # punctuation quickly before the anchor alternation is tried
+    parts = [r"(?=[\w.\[])", f"(?=(?x:{_ANCHOR}))"]
+    for key, rx in EFFECT_PATTERNS.items():
+        body = rx.pattern
+        if rx.flags & re.VERBOSE:
+            body = f"(?x:{body}\n)"
+        if rx.flags & re.IGNORECASE:
+            body = f"(?i:{body})"
+        parts.append(f"(?:(?=(?P<{key}>{body})))?")
+    return re.compile("".join(parts))
+
+_FUSED = _fuse()
+_KEYS = tuple(EFFECT_PATTERNS)
+
+def count_effects(code_nc: str) -> Dict[str, int]:
+    """Return {metric key: count} for all ten effect metrics in one scan."""
+    counts = dict.fromkeys(_KEYS, 0)
+    resume = dict.fromkeys(_KEYS, 0)
+    for m in _FUSED.finditer(code_nc):
+        for key in _KEYS:
+            start = m.start(key)
+            if start >= resume[key]:  # -1 when the metric did not match here
+                counts[key] += 1
+                resume[key] = m.end(key)
+    return counts
+
+def effect_hits(code_nc: str) -> Dict[str, List[int]]:
+    """Like count_effects(), but {metric key: start offset of every hit}."""
+    hits = {key: [] for key in _KEYS}
+    resume = dict.fromkeys(_KEYS, 0)
+    for m in _FUSED.finditer(code_nc):
+        for key in _KEYS:
+            start = m.start(key)
+            if start >= resume[key]:
+                hits[key].append(start)
+                resume[key] = m.end(key)
+    return hits
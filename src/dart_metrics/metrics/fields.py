@@ -1,123 +1,88 @@
 
 import re
-from .common import remove_comments, find_matching_brace
+from .common import Snippet, snippet_context, find_matching_brace
+from .tokens import COMMENT, IDENT, KEYWORD, PUNCT
 
-__all__ = ["number_of_fields"]
+__all__ = ["number_of_fields", "class_field_counts"]
 
 CLASS_RE = re.compile(r'\bclass\s+[A-Za-z_]\w*[^\{]*\{', re.MULTILINE)
-VAR_NAME_RE = re.compile(r'\b([A-Za-z_]\w*)\b')
 
-def extract_class_bodies(code_nc: str):
+def extract_class_bodies(code: Snippet):
+    """Return (open_brace, close_brace) offsets of every class body (shared as SnippetContext.class_bodies)."""
+    ctx = snippet_context(code)
+    code_nc = ctx.code_nc
     bodies = []
     for m in CLASS_RE.finditer(code_nc):
         open_brace = code_nc.find('{', m.end()-1)
         if open_brace == -1:
             continue
-        close_brace = find_matching_brace(code_nc, open_brace)
+        close_brace = find_matching_brace(ctx, open_brace)
         if close_brace == -1:
             continue
-        bodies.append(code_nc[open_brace+1:close_brace])
+        bodies.append((open_brace, close_brace))
     return bodies
 
-def split_top_level_statements(body: str):
+def split_top_level_statements(ts, lo: int, hi: int):
+    """Return (first, last) token indexes of ';'-terminated statements at brace depth 0."""
+    s = ts.code
+    kinds, starts = ts.kinds, ts.starts
     stmts = []
-    start = 0
+    start = lo
     depth = 0
-    in_q = None
-    i = 0
-    while i < len(body):
-        ch = body[i]
-        if in_q:
-            if ch == in_q:
-                in_q = None
-            i += 1
+    for i in range(lo, hi):
+        if kinds[i] != PUNCT:
             continue
-        if ch in ("'", '"'):
-            in_q = ch
-        elif ch == '{':
+        ch = s[starts[i]]
+        if ch == '{':
             depth += 1
         elif ch == '}':
             depth = max(0, depth - 1)
         elif ch == ';' and depth == 0:
-            stmts.append(body[start:i+1])
+            stmts.append((start, i))
             start = i + 1
-        i += 1
-    tail = body[start:].strip()
-    if tail:
-        stmts.append(tail)
     return stmts
 
-def count_fields_in_class(body: str) -> int:
-    stmts = split_top_level_statements(body)
+def count_fields_in_class(ts, lo: int, hi: int) -> int:
+    s = ts.code
+    kinds, starts = ts.kinds, ts.starts
     count = 0
-    for st in stmts:
-        s = st.strip()
-        if not s.endswith(';'):
-            continue
-        # exclude abstract methods/getters: '(' at top level
-        has_paren = False
-        lvl = 0
-        in_q = None
-        for ch in s:
-            if in_q:
-                if ch == in_q:
-                    in_q = None
-                continue
-            if ch in ("'", '"'):
-                in_q = ch
-            elif ch == '(':
-                lvl += 1
-                has_paren = True
-            elif ch == ')':
-                lvl = max(0, lvl - 1)
-        if has_paren:
+    for first, last in split_top_level_statements(ts, lo, hi):
+        # exclude abstract methods/getters: any '(' in the statement
+        if any(kinds[i] == PUNCT and s[starts[i]] == '(' for i in range(first, last)):
             continue
 
-        # split by top-level commas
-        decl = s[:-1]
-        parts = []
-        buf = []
-        stack = []
-        in_q = None
-        for ch in decl:
-            if in_q:
-                buf.append(ch)
-                if ch == in_q:
-                    in_q = None
-                continue
-            if ch in ("'", '"'):
-                in_q = ch
-                buf.append(ch)
-                continue
-            if ch in "<{[(":
-                stack.append(ch)
-                buf.append(ch)
+        # split by top-level commas; the name is the last word before '='
+        depth = 0
+        name = None
+        seen_eq = False
+        for i in range(first, last + 1):
+            kind = kinds[i]
+            if kind == COMMENT:
                 continue
-            if ch in ">}])":
-                if stack:
-                    stack.pop()
-                buf.append(ch)
-                continue
-            if ch == ',' and not stack:
-                parts.append(''.join(buf).strip())
-                buf = []
-                continue
-            buf.append(ch)
-        if buf:
-            parts.append(''.join(buf).strip())
-
-        for p in parts:
-            left = p.split('=')[0].strip()
-            ids = VAR_NAME_RE.findall(left)
-            if ids:
-                name = ids[-1]
-                if name not in {"get", "set", "factory"}:
-                    count += 1
+            if kind == PUNCT:
+                ch = s[starts[i]]
+                if ch in "<{[(":
+                    depth += 1
+                elif ch in ">}])":
+                    if depth:
+                        depth -= 1
+                elif (ch == ',' and not depth) or ch == ';':
+                    if name is not None and name not in {"get", "set", "factory"}:
+                        count += 1
+                    name = None
+                    seen_eq = False
+                elif '=' in ts.text(i):
+                    seen_eq = True
+            elif not seen_eq and kind in (IDENT, KEYWORD):
+                name = ts.text(i)
     return count
 
-def number_of_fields(code: str) -> int:
-    code_nc = remove_comments(code)
-    total = 0
-    for body in extract_class_bodies(code_nc):
-        total += count_fields_in_class(body)
-    return total
+def class_field_counts(code: Snippet):
+    """(open_brace, field count) of every class body."""
+    ctx = snippet_context(code)
+    ts = ctx.tokens
+    return [(open_brace, count_fields_in_class(ts, ts.index_at(open_brace) + 1, ts.index_at(close_brace)))
+            for open_brace, close_brace in ctx.class_bodies]
+
+def number_of_fields(code: Snippet) -> int:
+    return sum(n for _, n in class_field_counts(code))
@@ -0,0 +1,176 @@
+
+"""
+Budgeted metric execution for untrusted or pathological snippets.
+
+SnippetGuard enforces a per-snippet size budget (checked up front) and time
+budget. With a time budget the metrics run in a child process, one at a time,
+reporting each result as it finishes. When the budget runs out the child is
+killed: the metric that was running gets BUDGET_EXCEEDED and a "Timeout"
+diagnostic naming it, metrics that had not started yet get BUDGET_EXCEEDED as
+"skipped", and a fresh child serves the next snippet. Diagnostics go to the
+usual `errors` list as (label, message).
+"""
+from time import monotonic, perf_counter
+from typing import Dict, Optional, Sequence
+
+from .all_metrics import METRICS
+from .common import SnippetContext
+from .profile import EFFECTS, PREPARE
+
+__all__ = ["BUDGET_EXCEEDED", "SnippetGuard"]
+
+# value written for metrics that were not computed within the budget
+BUDGET_EXCEEDED = -1
+
+def _steps(keys: Sequence[str]) -> list:
+    """
+    Order of work in the child: the shared preprocessing, the other metrics,
+    then the fused effect scan and the effect metrics, so a pathological
+    effect scan cannot starve the cheap metrics.
+    """
+    from .effects import EFFECT_PATTERNS
+    effects = [k for k in keys if k in EFFECT_PATTERNS]
+    steps = [PREPARE] + [k for k in keys if k not in EFFECT_PATTERNS]
+    return steps + [EFFECTS] + effects if effects else steps
+
+def _serve(conn) -> None:
+    """Child loop: run the steps for each (code, keys) request, one message per step."""
+    while True:
+        try:
+            code, keys = conn.recv()
+        except EOFError:
+            return
+        ctx = SnippetContext(code)
+        for step in _steps(keys):
+            t0 = perf_counter()
+            try:
+                if step == PREPARE:
+                    ctx.tokens
+                    ctx.code_nc
+                    value = None
+                elif step == EFFECTS:
+                    ctx.effect_counts
+                    value = None
+                else:
+                    value = METRICS[step][1](ctx)
+                conn.send(("ok", step, value, perf_counter() - t0))
+            except Exception as exc:
+                conn.send(("err", step, f"{type(exc).__name__}: {exc}", perf_counter() - t0))
+        conn.send(("done",))
+
+class SnippetGuard:
+    """
+    timeout:   seconds allowed per snippet (None: no time budget, run in-process)
+    max_chars: snippets longer than this are not analysed (None: no size budget)
+    A guard is cheap to pickle (the child is not), so it can be handed to pool
+    workers; each worker then starts its own child on first use.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, max_chars: Optional[int] = None):
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self._proc = None
+        self._conn = None
+
+    def __getstate__(self):
+        return {"timeout": self.timeout, "max_chars": self.max_chars}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self) -> None:
+        import multiprocessing as mp  # only paid for when a time budget is set
+        parent, child = mp.Pipe()
+        self._proc = mp.Process(target=_serve, args=(child,), daemon=True)
+        self._proc.start()
+        child.close()
+        self._conn = parent
+
+    def _kill(self) -> None:
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.join()
+            self._conn.close()
+        self._proc = self._conn = None
+
+    def close(self) -> None:
+        if self._proc is not None:
+            self._conn.close()  # the child sees EOF and exits
+            self._proc.join(1)
+            self._kill()
+
+    def compute(self, code: str, keys: Sequence[str], errors: Optional[list] = None,
+                timings: Optional[dict] = None) -> Dict[str, object]:
+        """Like compute_for_code(), but over-budget metrics become BUDGET_EXCEEDED."""
+        if errors is None:
+            errors = []
+        if self.max_chars is not None and len(code) > self.max_chars:
+            msg = f"SizeBudget: {len(code)} chars > {self.max_chars}"
+            errors.extend((METRICS[k][0], msg) for k in keys)
+            return {METRICS[k][0]: BUDGET_EXCEEDED for k in keys}
+        if self.timeout is None:
+            from .batch import compute_for_code
+            return compute_for_code(code, keys, errors, timings)
+
+        if self._proc is None or not self._proc.is_alive():
+            self._kill()
+            self._start()
+        deadline = monotonic() + self.timeout
+        steps = _steps(keys)
+        out = {}
+        try:
+            self._conn.send((code, list(keys)))
+        except OSError:
+            return self._abandon(True, steps, out, errors, timings)
+        while True:
+            left = deadline - monotonic()
+            try:
+                msg = self._conn.recv() if left > 0 and self._conn.poll(left) else None
+            except (EOFError, OSError):
+                return self._abandon(True, steps, out, errors, timings)
+            if msg is None:
+                return self._abandon(False, steps, out, errors, timings)
+            if msg[0] == "done":
+                return out
+            kind, step, value, seconds = msg
+            steps.pop(0)
+            if timings is not None:
+                timings[step if step in (PREPARE, EFFECTS) else METRICS[step][0]] = seconds
+            if step in (PREPARE, EFFECTS):
+                continue
+            label = METRICS[step][0]
+            if kind == "err":
+                errors.append((label, value))
+                value = float("nan")
+            out[label] = value
+
+    def _abandon(self, died: bool, steps, out, errors, timings):
+        """Kill the child and fill in the metrics it did not finish."""
+        exitcode = None
+        if died and self._proc is not None:
+            self._proc.join(1)
+            exitcode = self._proc.exitcode
+        self._kill()
+        culprit = steps[0]
+        stage = culprit in (PREPARE, EFFECTS)
+        where = culprit if stage else METRICS[culprit][0]
+        if died:
+            reason = f"WorkerDied: exit code {exitcode} in {where}"
+        else:
+            reason = f"Timeout: exceeded the {self.timeout:g}s budget in {where}"
+            if timings is not None:
+                timings[where] = self.timeout
+        for step in steps:
+            if step in (PREPARE, EFFECTS):
+                continue
+            label = METRICS[step][0]
+            out[label] = BUDGET_EXCEEDED
+            victim = stage or step == culprit
+            errors.append((label, reason if victim else f"Skipped: budget spent in {where}"))
+        return out
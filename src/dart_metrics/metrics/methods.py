@@ -1,84 +1,80 @@
-import re
-from typing import Optional
-from .common import remove_comments, find_matching_paren
+from bisect import bisect_right
+from typing import List, Tuple
 
-__all__ = ["number_of_methods", "max_number_of_params"]
+from .common import Snippet, snippet_context, find_matching_paren
+from .tokens import COMMENT, IDENT, KEYWORD, PUNCT
+
+__all__ = ["number_of_methods", "max_number_of_params", "find_signatures", "param_counts"]
 
 KEYWORDS = {
     "if","for","while","switch","catch","else","class","enum",
     "extension","typedef","operator","return","assert","throw","new"
 }
 
-def _prev_ident(s: str, start_idx: int) -> Optional[str]:
-    """Return identifier immediately preceding '(' that starts at start_idx."""
-    i = start_idx - 1
-    # skip spaces/newlines
-    while i >= 0 and s[i].isspace():
-        i -= 1
-    # read identifier backwards
-    j = i
-    while j >= 0 and (s[j].isalnum() or s[j] == "_"):
-        j -= 1
-    ident = s[j+1:i+1]
-    return ident if ident else None
-
-def _iter_signatures(code: str):
+def find_signatures(code: Snippet) -> List[Tuple[int, int]]:
     """
-    Yield (paren_open, paren_close) for declarations that look like:
+    Return (paren_open, paren_close) for declarations that look like:
         <ret/type> name ( ... ) { ... }
     We skip control-flow keywords (if, for, while, switch, catch, else).
+    Metrics read this once per snippet as SnippetContext.signatures.
     """
-    s = remove_comments(code)
-    i, n = 0, len(s)
-    while True:
-        idx = s.find("(", i)
-        if idx == -1:
-            break
-        close = find_matching_paren(s, idx)
+    ctx = snippet_context(code)
+    ts = ctx.tokens
+    s = ts.code
+    bpos, bchars = ts.bracket_pos, ts.bracket_chars
+    found = []
+    j = bchars.find("(")
+    while j != -1:
+        idx = bpos[j]
+        close = find_matching_paren(ctx, idx)
         if close == -1:
-            i = idx + 1
+            j = bchars.find("(", j + 1)
             continue
-        # next non-space after ')'
-        k = close + 1
-        while k < n and s[k].isspace():
-            k += 1
-        if k < n and s[k] == "{":
-            ident = _prev_ident(s, idx)
-            if ident and ident not in KEYWORDS:
-                yield (idx, close)
-        i = close + 1
+        # next token after ')' must open a body
+        k = ts.next_code(ts.index_at(close))
+        if k != -1 and s[ts.starts[k]] == "{":
+            p = ts.prev_code(ts.index_at(idx))
+            if p != -1 and ts.kinds[p] in (IDENT, KEYWORD) and ts.text(p) not in KEYWORDS:
+                found.append((idx, close))
+        j = bchars.find("(", bisect_right(bpos, close))
+    return found
 
-def number_of_methods(code: str) -> int:
-    return sum(1 for _ in _iter_signatures(code))
+def number_of_methods(code: Snippet) -> int:
+    return len(snippet_context(code).signatures)
 
-def max_number_of_params(code: str) -> int:
-    s = remove_comments(code)
-    max_p = 0
-    for op, cp in _iter_signatures(s):
-        params = s[op+1:cp]
-        if not params.strip():
+def _param_count(ts, op: int, cp: int) -> int:
+    """Parameters between the parens at op and cp, or -1 for an empty list."""
+    s = ts.code
+    kinds, starts = ts.kinds, ts.starts
+    # Count top-level commas ignoring nested <>{}[]() and strings
+    depth, commas, empty = 0, 0, True
+    for i in range(ts.index_at(op) + 1, ts.index_at(cp)):
+        kind = kinds[i]
+        if kind == COMMENT:
+            continue
+        empty = False
+        if kind != PUNCT:
             continue
-        # Count top-level commas ignoring nested <>{}[]() and quoted strings
-        stack, in_q, commas = [], None, 0
-        j = 0
-        while j < len(params):
-            ch = params[j]
-            if in_q:
-                if ch == in_q:
-                    in_q = None
-                j += 1
-                continue
-            if ch in ("'", '"'):
-                in_q = ch
-            elif ch in "<{[(":
-                stack.append(ch)
-            elif ch in ">}])":
-                if stack:
-                    stack.pop()
-            elif ch == "," and not stack:
-                commas += 1
-            j += 1
-        cur = commas + 1 if params.strip() else 0
-        if cur > max_p:
-            max_p = cur
-    return max_p
+        ch = s[starts[i]]
+        if ch in "<{[(":
+            depth += 1
+        elif ch in ">}])":
+            if depth:
+                depth -= 1
+        elif ch == "," and not depth:
+            commas += 1
+    return -1 if empty else commas + 1
+
+def param_counts(code: Snippet) -> List[Tuple[int, int]]:
+    """(paren_open, parameter count) of every signature with parameters."""
+    ctx = snippet_context(code)
+    ts = ctx.tokens
+    out = []
+    for op, cp in ctx.signatures:
+        n = _param_count(ts, op, cp)
+        if n != -1:
+            out.append((op, n))
+    return out
+
+def max_number_of_params(code: Snippet) -> int:
+    return max((n for _, n in param_counts(code)), default=0)
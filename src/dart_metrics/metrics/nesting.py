@@ -1,28 +1,19 @@
 
-from .common import remove_comments
+from .common import Snippet, snippet_context
 
 __all__ = ["max_nesting_depth"]
 
-def max_nesting_depth(code: str) -> int:
-    s = remove_comments(code)
-    depth = 0
-    max_depth = 0
-    in_q = None
-    i = 0
-    while i < len(s):
-        ch = s[i]
-        if in_q:
-            if ch == in_q:
-                in_q = None
-            i += 1
-            continue
-        if ch in ("'", '"'):
-            in_q = ch
-        elif ch == '{':
+def _brace_depth(bracket_chars: str, depth: int = 0, max_depth: int = 0):
+    """(depth, max depth) after the braces in bracket_chars, starting at depth."""
+    for ch in bracket_chars:
+        if ch == '{':
             depth += 1
             if depth > max_depth:
                 max_depth = depth
         elif ch == '}':
             depth = max(0, depth - 1)
-        i += 1
+    return depth, max_depth
+
+def max_nesting_depth(code: Snippet) -> int:
+    _, max_depth = _brace_depth(snippet_context(code).tokens.bracket_chars)
     return max(0, max_depth - 1)
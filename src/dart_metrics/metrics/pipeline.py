@@ -0,0 +1,187 @@
+"""
+Asyncio ingestion pipeline: several sources are read concurrently, metrics
+run in an executor and results reach a sink as they finish.
+
+    read (one producer task per source) -> bounded queue
+      -> compute (batches in a process pool) -> bounded queue -> sink
+
+Reads, computation and writes overlap, so an I/O stall on one source (a slow
+network mount, a blocked pipe) leaves the workers busy with rows already
+read. The bounded queues give backpressure: a slow sink or slow workers stop
+the producers instead of letting rows pile up in memory.
+
+A source is an async iterable of (sample_id, code); use from_files(),
+from_stdin() or from_iterable() (for cli.tabular.iter_pairs and the like).
+A source may yield an exception in place of the code to report a read
+failure; that row comes out as NaN with the error.
+"""
+import asyncio
+import inspect
+import sys
+from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Mapping, Sequence, Tuple, Union
+
+from .all_metrics import METRICS
+from .batch import compute_for_code, read_source
+
+__all__ = ["from_files", "from_stdin", "from_iterable", "run_pipeline"]
+
+Pair = Tuple[object, object]
+# sink(source name, sample_id, {label: value}, errors)
+Sink = Callable[[str, object, dict, list], Union[None, Awaitable[None]]]
+
+_END = object()
+
+# --- sources -------------------------------------------------------------------
+async def from_files(paths: Iterable, readers: int = 8) -> AsyncIterator[Pair]:
+    """Yield (path, code) for every file, up to `readers` reads in flight; in completion order."""
+    if readers < 1:
+        raise ValueError(f"readers must be at least 1, not {readers}")
+    loop = asyncio.get_running_loop()
+    paths = iter(paths)
+    pending = {}
+    while True:
+        while len(pending) < readers:
+            path = next(paths, _END)
+            if path is _END:
+                break
+            pending[asyncio.ensure_future(loop.run_in_executor(None, read_source, path))] = path
+        if not pending:
+            return
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for fut in done:
+            path = pending.pop(fut)
+            exc = fut.exception()
+            yield str(path), exc if exc is not None else fut.result()
+
+async def from_stdin(sample_id="-") -> AsyncIterator[Pair]:
+    """Yield stdin, read to the end in a thread, as a single snippet."""
+    code = await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+    yield sample_id, code
+
+async def from_iterable(pairs: Iterable[Pair], batch: int = 256) -> AsyncIterator[Pair]:
+    """Yield from a blocking iterator of (sample_id, code), pulling `batch` items per thread hop."""
+    loop = asyncio.get_running_loop()
+    it = iter(pairs)
+    while True:
+        items = await loop.run_in_executor(None, lambda: list(islice(it, batch)))
+        if not items:
+            return
+        for item in items:
+            yield item
+
+# --- stages --------------------------------------------------------------------
+def _compute_batch(items, keys):
+    """[(source, sid, values, errors)]; runs in a pool worker."""
+    out = []
+    for name, sid, code in items:
+        errors = []
+        if isinstance(code, BaseException):
+            values = {METRICS[k][0]: float("nan") for k in keys}
+            errors.append(("*", f"{type(code).__name__}: {code}"))
+        else:
+            values = compute_for_code(code, keys, errors)
+        out.append((name, sid, values, errors))
+    return out
+
+async def _produce(name: str, source: AsyncIterable[Pair], queue: asyncio.Queue) -> None:
+    async for sid, code in source:
+        await queue.put((name, sid, code))
+
+async def _dispatch(inq: asyncio.Queue, outq: asyncio.Queue, executor, keys, batch_size: int) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await inq.get()
+        if item is _END:
+            inq.put_nowait(_END)  # the other dispatchers stop on it too
+            return
+        items = [item]
+        # take what is already queued, up to a batch, without waiting for more
+        while len(items) < batch_size and not inq.empty():
+            nxt = inq.get_nowait()
+            if nxt is _END:
+                inq.put_nowait(_END)
+                break
+            items.append(nxt)
+        try:
+            rows = await loop.run_in_executor(executor, _compute_batch, items, keys)
+        except Exception as exc:
+            # the whole batch was lost (worker crash, unpicklable row, ...)
+            msg = f"{type(exc).__name__}: {exc}"
+            nan = {METRICS[k][0]: float("nan") for k in keys}
+            rows = [(name, sid, dict(nan), [("*", msg)]) for name, sid, _ in items]
+        await outq.put(rows)
+
+async def _drain(outq: asyncio.Queue, sink: Sink) -> int:
+    count = 0
+    while True:
+        rows = await outq.get()
+        if rows is _END:
+            return count
+        for row in rows:
+            res = sink(*row)
+            if inspect.isawaitable(res):
+                await res
+        count += len(rows)
+
+async def run_pipeline(
+    sources: Mapping[str, AsyncIterable[Pair]],
+    keys: Sequence[str],
+    sink: Sink,
+    workers: int = 0,
+    executor=None,
+    queue_size: int = 1024,
+    batch_size: int = 32,
+) -> int:
+    """
+    Compute `keys` for every snippet of every source and pass each row to
+    sink(source name, sample_id, {label: value}, errors) as soon as its batch
+    is done; returns the number of rows. The sink may be a coroutine function.
+
+    Rows are computed in batches of up to batch_size in `executor`, or in a
+    process pool of `workers` processes created here (workers <= 1: one
+    thread, which still overlaps with reads and writes). At most queue_size
+    rows wait for a worker, and about as many for the sink.
+    A failing metric is NaN with (label, message) in errors, as in
+    metrics.batch.compute_for_code.
+    batch_size and queue_size below 1 raise ValueError (a queue size of 0
+    would make asyncio's queues unbounded).
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, not {batch_size}")
+    if queue_size < 1:
+        raise ValueError(f"queue_size must be at least 1, not {queue_size}")
+    keys = list(keys)
+    own = executor is None
+    if own:
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=1)
+    lanes = max(workers, 1) * 2  # batches in flight: keep every worker fed while results travel back
+    inq = asyncio.Queue(queue_size)
+    outq = asyncio.Queue(max(1, queue_size // batch_size))
+
+    async def feed():
+        await asyncio.gather(*producers)
+        await inq.put(_END)
+        await asyncio.gather(*dispatchers)
+        await outq.put(_END)
+
+    try:
+        drain = asyncio.ensure_future(_drain(outq, sink))
+        dispatchers = [asyncio.ensure_future(_dispatch(inq, outq, executor, keys, batch_size)) for _ in range(lanes)]
+        producers = [asyncio.ensure_future(_produce(name, src, inq)) for name, src in sources.items()]
+        try:
+            # gathered together, so a failing sink cannot leave the feed blocked on a full queue
+            _, count = await asyncio.gather(feed(), drain)
+            return count
+        except BaseException:
+            for task in producers + dispatchers + [drain]:
+                task.cancel()
+            raise
+    finally:
+        if own:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,74 @@
+
+"""
+Execution plans for a metric selection.
+
+Each metric declares the SnippetContext intermediates it reads (INPUTS in
+all_metrics); DEPENDS says what each intermediate is built from. plan(keys)
+lists the intermediates a selection needs, inputs first, and prepare() builds
+them once per snippet before the metrics run. Order matters beyond
+correctness: once the token stream exists, code_nc is cut from it instead of
+re-scanning the text, so tokens come first whenever both are needed.
+"""
+from functools import lru_cache
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .all_metrics import INPUTS
+from .profile import EFFECTS, PREPARE
+
+__all__ = ["DEPENDS", "plan", "prepare", "stage"]
+
+# intermediate -> intermediates it is computed from, listed in a valid build order
+DEPENDS = {
+    "tokens":        (),
+    "code_nc":       (),  # reuses tokens when they were built first
+    "lines":         (),
+    "loc":           (),
+    "comment_lines": ("lines",),
+    "effect_counts": ("code_nc",),
+    "signatures":    ("tokens",),
+    "class_bodies":  ("tokens", "code_nc"),
+    "widget_tree":   ("tokens", "code_nc"),
+}
+
+def stage(name: str) -> str:
+    """Name an intermediate is profiled under: lexing/stripping/splitting is "(prepare)"."""
+    if name in ("tokens", "code_nc", "lines"):
+        return PREPARE
+    if name == "effect_counts":
+        return EFFECTS
+    return f"({name})"
+
+@lru_cache(maxsize=256)
+def _plan(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    needed = set()
+    def visit(name):
+        if name not in needed:
+            needed.add(name)
+            for dep in DEPENDS[name]:
+                visit(dep)
+    for key in keys:
+        for name in INPUTS[key]:
+            visit(name)
+    return tuple(name for name in DEPENDS if name in needed)
+
+def plan(keys: Sequence[str]) -> List[str]:
+    """Intermediates needed by the metrics `keys`, each after its inputs."""
+    return list(_plan(tuple(keys)))
+
+def prepare(ctx, keys: Sequence[str], timings: Optional[Dict[str, float]] = None) -> None:
+    """
+    Build the intermediates of plan(keys) on ctx. With timings, add each one's
+    seconds under its stage(). An intermediate that raises is left unbuilt; the
+    metric reading it raises again and is reported as usual.
+    """
+    for name in _plan(tuple(keys)):
+        if timings is not None:
+            t0 = perf_counter()
+        try:
+            getattr(ctx, name)
+        except Exception:
+            pass
+        if timings is not None:
+            label = stage(name)
+            timings[label] = timings.get(label, 0.0) + perf_counter() - t0
@@ -0,0 +1,204 @@
+
+"""
+Per-metric profiling for batch runs.
+
+compute_for_code(..., timings={}) fills {label: seconds} for every metric it
+runs. The shared intermediates of the plan (see plan.py) are timed separately
+so they are not charged to whichever metric happens to touch them first:
+"(prepare)" for lexing/comment stripping/line splitting, "(effects)" for the
+fused effect scan, "(signatures)", "(class_bodies)", "(loc)" and so on for the rest. MetricProfiler aggregates those
+per-row timings: cumulative time, p50/p95/p99 (from fixed log-scale
+histograms, so memory stays constant), the same per snippet-size bucket,
+failure counts and the slowest rows with their sample_ids.
+Nothing is timed unless a profiler is passed in.
+"""
+import heapq
+import json
+import math
+import sys
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+
+__all__ = ["MetricProfiler", "SIZE_BUCKETS"]
+
+PREPARE = "(prepare)"
+EFFECTS = "(effects)"
+ROW = "(row)"
+
+# snippet size buckets: (upper bound in characters, label)
+SIZE_BUCKETS = (
+    (1_000, "<1k"),
+    (4_000, "1k-4k"),
+    (16_000, "4k-16k"),
+    (64_000, "16k-64k"),
+    (256_000, "64k-256k"),
+    (math.inf, ">=256k"),
+)
+
+# log-scale histogram: bin i covers [1us * G**i, 1us * G**(i+1)), G = 2**(1/4)
+_HIST_MIN = 1e-6
+_HIST_GROWTH = 2 ** 0.25
+_HIST_LOG = math.log(_HIST_GROWTH)
+_HIST_BINS = 128
+
+def size_bucket(size: int) -> str:
+    for limit, label in SIZE_BUCKETS:
+        if size < limit:
+            return label
+    return SIZE_BUCKETS[-1][1]
+
+class _Timing:
+    __slots__ = ("count", "total", "max", "bins")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bins = [0] * _HIST_BINS
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        i = int(math.log(seconds / _HIST_MIN) / _HIST_LOG) if seconds > _HIST_MIN else 0
+        self.bins[min(i, _HIST_BINS - 1)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper edge of the bin holding the q-quantile (within ~19%), capped at the max."""
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.bins):
+            seen += n
+            if n and seen >= rank:
+                return min(_HIST_MIN * _HIST_GROWTH ** (i + 1), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        ms = lambda s: round(s * 1000, 3)
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": ms(self.total / self.count) if self.count else 0.0,
+            "p50_ms": ms(self.quantile(0.50)),
+            "p95_ms": ms(self.quantile(0.95)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max),
+        }
+
+class MetricProfiler:
+    """
+    Aggregates per-row metric timings (see iter_rows(..., profiler=...)).
+    A metric call slower than slow_ms counts as a slow outlier; the `top`
+    slowest calls per metric and slowest rows are kept with their sample_ids.
+    """
+
+    def __init__(self, slow_ms: float = 100.0, top: int = 5):
+        self.slow_s = slow_ms / 1000
+        self.top = top
+        self.rows = 0
+        self.timings: Dict[str, _Timing] = {}
+        self.by_size: Dict[str, Dict[str, _Timing]] = {}
+        self.failures: Dict[str, int] = {}
+        self.failed_ids: Dict[str, list] = {}
+        self.slow: Dict[str, int] = {}
+        self._slowest: Dict[str, List[Tuple[float, int, object]]] = {}
+        self._seq = count()
+
+    def _keep_slowest(self, name: str, seconds: float, sid) -> None:
+        heap = self._slowest.setdefault(name, [])
+        item = (seconds, next(self._seq), sid)
+        if len(heap) < self.top:
+            heapq.heappush(heap, item)
+        elif seconds > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def record(self, sid, size: Optional[int], timings: Optional[Dict[str, float]], errors=()) -> None:
+        """Add one row: its snippet size, {label: seconds} and (label, message) failures."""
+        for label, _ in errors:
+            self.failures[label] = self.failures.get(label, 0) + 1
+            ids = self.failed_ids.setdefault(label, [])
+            if len(ids) < self.top:
+                ids.append(sid)
+        if not timings:
+            return
+        self.rows += 1
+        bucket = self.by_size.setdefault(size_bucket(size or 0), {})
+        for name, seconds in timings.items():
+            for table in (self.timings, bucket):
+                stat = table.get(name)
+                if stat is None:
+                    stat = table[name] = _Timing()
+                stat.add(seconds)
+            if seconds >= self.slow_s:
+                self.slow[name] = self.slow.get(name, 0) + 1
+            self._keep_slowest(name, seconds, sid)
+        total = sum(timings.values())
+        for table in (self.timings, bucket):
+            table.setdefault(ROW, _Timing()).add(total)
+        self._keep_slowest(ROW, total, sid)
+
+    def slowest(self, name: str) -> List[Tuple[object, float]]:
+        """[(sample_id, seconds)] of the slowest calls of `name`, slowest first."""
+        return [(sid, s) for s, _, sid in sorted(self._slowest.get(name, []), reverse=True)]
+
+    def to_dict(self) -> dict:
+        def entry(name, stat):
+            d = stat.to_dict()
+            d["slow"] = self.slow.get(name, 0)
+            d["failures"] = self.failures.get(name, 0)
+            d["failed_ids"] = self.failed_ids.get(name, [])
+            d["slowest"] = [{"sample_id": sid, "ms": round(s * 1000, 3)} for sid, s in self.slowest(name)]
+            return d
+        order = [label for _, label in SIZE_BUCKETS if label in self.by_size]
+        return {
+            "rows": self.rows,
+            "slow_ms": self.slow_s * 1000,
+            "metrics": {name: entry(name, stat) for name, stat in self.timings.items()},
+            "by_size": {b: {name: stat.to_dict() for name, stat in self.by_size[b].items()} for b in order},
+            "failures_without_timing": {k: v for k, v in self.failures.items() if k not in self.timings},
+        }
+
+    def format_table(self) -> str:
+        total = self.timings.get(ROW)
+        grand = total.total if total else 0.0
+        lines = [f"Profile: {self.rows} row(s), {grand:.3f}s in metrics (slow = >= {self.slow_s * 1000:g} ms)",
+                 f"{'metric':<16}{'total s':>9}{'share':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                 f"{'max ms':>10}{'slow':>6}{'fail':>6}  slowest sample_id"]
+        ranked = sorted(((n, s) for n, s in self.timings.items() if n != ROW), key=lambda x: -x[1].total)
+        if total:
+            ranked.append((ROW, total))
+        for name, stat in ranked:
+            top = self.slowest(name)
+            lines.append(
+                f"{name:<16}{stat.total:>9.3f}{(stat.total / grand if grand and name != ROW else 1):>7.1%}"
+                f"{stat.quantile(.5) * 1000:>9.2f}{stat.quantile(.95) * 1000:>9.2f}{stat.quantile(.99) * 1000:>9.2f}"
+                f"{stat.max * 1000:>10.2f}{self.slow.get(name, 0):>6}{self.failures.get(name, 0):>6}"
+                f"  {top[0][0] if top else ''}"
+            )
+        lines.append("")
+        lines.append(f"{'size':<10}{'rows':>7}{'total s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  slowest metric")
+        for _, label in SIZE_BUCKETS:
+            stats = self.by_size.get(label)
+            if not stats:
+                continue
+            row = stats[ROW]
+            worst = max((n for n in stats if n != ROW), key=lambda n: stats[n].total, default="")
+            lines.append(f"{label:<10}{row.count:>7}{row.total:>9.3f}{row.quantile(.5) * 1000:>9.2f}"
+                         f"{row.quantile(.95) * 1000:>9.2f}{row.quantile(.99) * 1000:>9.2f}  {worst}")
+        other = {k: v for k, v in self.failures.items() if k not in self.timings}
+        if other:
+            lines.append("")
+            lines.append("Failures outside metrics: " + ", ".join(f"{k}={v}" for k, v in other.items()))
+        return "\n".join(lines)
+
+    def dump(self, dest: str) -> None:
+        """Write the report: '-' prints the table to stderr, *.json writes JSON, else a text table."""
+        if dest == "-":
+            print(self.format_table(), file=sys.stderr)
+        elif dest.lower().endswith(".json"):
+            with open(dest, "w", encoding="utf-8") as fh:
+                json.dump(self.to_dict(), fh, indent=2, default=str)
+        else:
+            with open(dest, "w", encoding="utf-8") as fh:
+                fh.write(self.format_table() + "\n")
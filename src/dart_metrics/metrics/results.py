@@ -0,0 +1,129 @@
+
+"""
+Compact storage for batch results.
+
+Instead of one {label: value} dict per row, ResultColumns writes each row
+straight into preallocated typed columns in metric order: int32 for the
+counts and float32 for CR. A failed count (NaN) is kept in a boolean mask
+that is only allocated once a column has a failure; CR stores NaN itself.
+That is 80 bytes of metric values per row for all 20 metrics (plus 8 for
+the sample_id reference). The columns are handed to pandas or Arrow without
+copying.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .all_metrics import METRICS
+
+__all__ = ["FLOAT_METRICS", "ResultColumns"]
+
+# metrics stored as float32, with the decimals they are rounded to; the rest are int32 counts
+FLOAT_METRICS: Dict[str, int] = {"cr": 3}
+
+class ResultColumns:
+    """
+    Typed result columns for `keys`, in order. capacity preallocates that many
+    rows (e.g. the row count of an input sheet); columns double when full.
+    """
+
+    def __init__(self, keys: Sequence[str], capacity: int = 1024, id_name: str = "sample_id"):
+        self.keys = list(keys)
+        self.labels = [METRICS[k][0] for k in self.keys]
+        self.id_name = id_name
+        self._n = 0
+        self._cap = max(int(capacity), 1)
+        self._ids = np.empty(self._cap, dtype=object)
+        self._cols: List[np.ndarray] = [
+            np.zeros(self._cap, dtype=np.float32 if k in FLOAT_METRICS else np.int32) for k in self.keys
+        ]
+        self._masks: List[Optional[np.ndarray]] = [None] * len(self.keys)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the id references, value columns and masks (allocated capacity)."""
+        return self._ids.nbytes + sum(c.nbytes for c in self._cols) + sum(m.nbytes for m in self._masks if m is not None)
+
+    def _grow(self) -> None:
+        cap = self._cap * 2
+        def grown(a):
+            # np.resize would fill the new rows by repeating a; they must start empty
+            out = np.zeros(cap, dtype=a.dtype)
+            out[:self._cap] = a
+            return out
+        self._ids = grown(self._ids)
+        self._cols = [grown(c) for c in self._cols]
+        self._masks = [None if m is None else grown(m) for m in self._masks]
+        self._cap = cap
+
+    def append(self, sid, values: Dict[str, object]) -> None:
+        """Store one row given as {label: value} (as yielded by iter_rows)."""
+        i = self._n
+        if i == self._cap:
+            self._grow()
+        self._ids[i] = sid
+        for j, label in enumerate(self.labels):
+            col = self._cols[j]
+            val = values[label]
+            if col.dtype == np.float32:
+                col[i] = val
+            elif isinstance(val, float) and math.isnan(val):
+                mask = self._masks[j]
+                if mask is None:
+                    mask = self._masks[j] = np.zeros(self._cap, dtype=bool)
+                mask[i] = True
+                col[i] = 0
+            else:
+                col[i] = val
+        self._n = i + 1
+
+    def extend(self, rows: Iterable) -> None:
+        for sid, values, *_ in rows:
+            self.append(sid, values)
+
+    def column(self, label: str) -> np.ndarray:
+        """The stored values of one metric (a view; failed counts read as 0, see mask())."""
+        return self._cols[self.labels.index(label)][:self._n]
+
+    def mask(self, label: str) -> Optional[np.ndarray]:
+        """True where the metric failed, or None if it never did."""
+        m = self._masks[self.labels.index(label)]
+        return None if m is None else m[:self._n]
+
+    def _float64(self, j: int) -> np.ndarray:
+        # float32 cannot hold e.g. 0.333 exactly; widening and re-rounding restores the metric's value
+        return np.round(self._cols[j][:self._n].astype(np.float64), FLOAT_METRICS[self.keys[j]])
+
+    def to_pandas(self, float64: bool = False):
+        """
+        DataFrame of sample_id plus one column per metric, sharing memory with
+        these columns. Counts with failures become nullable Int32 (<NA> where
+        failed). float64=True widens the float32 columns to their rounded
+        float64 values (a copy), i.e. exactly the values the metrics returned.
+        """
+        import pandas as pd
+        n = self._n
+        data = {self.id_name: self._ids[:n]}
+        for j, label in enumerate(self.labels):
+            col, mask = self._cols[j][:n], self._masks[j]
+            if col.dtype == np.float32:
+                data[label] = self._float64(j) if float64 else col
+            elif mask is not None:
+                data[label] = pd.arrays.IntegerArray(col, mask[:n])
+            else:
+                data[label] = col
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self):
+        """pyarrow Table of the same columns; the value buffers are not copied."""
+        import pyarrow as pa
+        n = self._n
+        arrays = [pa.array(self._ids[:n].tolist())]
+        for j, col in enumerate(self._cols):
+            mask = self._masks[j]
+            arrays.append(pa.array(col[:n], mask=None if mask is None else mask[:n]))
+        return pa.Table.from_arrays(arrays, names=[self.id_name] + self.labels)
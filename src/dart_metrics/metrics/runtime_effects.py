@@ -1,6 +1,9 @@
 # dart_metrics_modular/metrics/runtime_effects.py
 import re
-from .common import remove_comments
+from .common import Snippet, snippet_context
+
+# The regexes below define the metrics; the counts come from the fused
+# single-pass scanner in effects.py (via SnippetContext.effect_counts).
 
 __all__ = [
     "database_call_count",     # DbC
@@ -30,9 +33,8 @@ _DBC_RE = re.compile(
     re.IGNORECASE | re.VERBOSE,
 )
 
-def database_call_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_DBC_RE.findall(s))
+def database_call_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["dbc"]
 
 # --- SyncIO: Synchronous I/O (dart:io) ---
 _SYNCIO_RE = re.compile(
@@ -45,9 +47,8 @@ _SYNCIO_RE = re.compile(
     re.VERBOSE,
 )
 
-def sync_io_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_SYNCIO_RE.findall(s))
+def sync_io_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["syncio"]
 
 # --- ImgC: Image decoding / codec usage ---
 _IMGC_RE = re.compile(
@@ -58,16 +59,14 @@ _IMGC_RE = re.compile(
     re.VERBOSE,
 )
 
-def image_codec_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_IMGC_RE.findall(s))
+def image_codec_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["imgc"]
 
 # --- AsyncUI: await occurrences (UI path) ---
 _AWAIT_RE = re.compile(r"\bawait\b")
 
-def async_await_ui_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_AWAIT_RE.findall(s))
+def async_await_ui_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["asyncui"]
 
 # --- TmrStr: Timer / Stream initialization ---
 _TMRSTR_RE = re.compile(
@@ -80,6 +79,5 @@ _TMRSTR_RE = re.compile(
     re.VERBOSE,
 )
 
-def timer_stream_init_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_TMRSTR_RE.findall(s))
+def timer_stream_init_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["tmrstr"]
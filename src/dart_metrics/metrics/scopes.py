@@ -0,0 +1,194 @@
+"""
+Scope index: the classes and methods of a snippet as a tree of offset spans,
+built once from SnippetContext.class_bodies and .signatures.
+
+Metrics that can say where their hits are (an offset per widget call, per
+decision point, per await, ...) are broken down per scope by looking those
+offsets up in the index, so a per-method table costs one pass per metric,
+not a re-run of every metric on every method's text:
+
+    for scope, values in scope_breakdown(code, ["cc", "asyncui", "now"]):
+        print(scope.path, values)      # e.g. "_HomeState.build" {"CC": 4, ...}
+
+Values are inclusive: a class counts the hits of its methods, a method those
+of its local functions. The root scope (kind "snippet") holds the values of
+the whole snippet, which equal the ordinary metrics.
+"""
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .all_metrics import METRICS
+from .common import Snippet, snippet_context
+from .tokens import KEYWORD
+
+__all__ = ["Scope", "ScopeIndex", "SCOPED_METRICS", "scope_breakdown"]
+
+class Scope:
+    """
+    One class or method: `start` is its first token (the `class` keyword or
+    the method name), `end` the offset of its closing brace.
+    """
+    __slots__ = ("kind", "name", "start", "end", "parent", "children")
+
+    def __init__(self, kind: str, name: str, start: int, end: int, parent: Optional["Scope"] = None):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = end
+        self.parent = parent
+        self.children: List["Scope"] = []
+
+    @property
+    def path(self) -> str:
+        """Dotted names from the outermost class or method, e.g. "_HomeState.build"."""
+        names = []
+        s = self
+        while s.parent is not None:
+            names.append(s.name)
+            s = s.parent
+        return ".".join(reversed(names)) or "<snippet>"
+
+    def __repr__(self):
+        return f"<{self.kind} {self.path} {self.start}:{self.end}>"
+
+def _class_spans(ctx) -> Iterable[Tuple[str, str, int, int]]:
+    ts = ctx.tokens
+    kinds = ts.kinds
+    for open_brace, close_brace in ctx.class_bodies:
+        # CLASS_RE ends at the brace, so the `class` keyword is the closest one before it
+        i = ts.index_at(open_brace) - 1
+        while i >= 0 and not (kinds[i] == KEYWORD and ts.text(i) == "class"):
+            i -= 1
+        if i < 0:
+            yield "class", "?", open_brace, close_brace
+            continue
+        n = ts.next_code(i)
+        yield "class", ts.text(n) if n != -1 else "?", ts.starts[i], close_brace
+
+def _method_spans(ctx) -> Iterable[Tuple[str, str, int, int]]:
+    ts = ctx.tokens
+    for op, cp in ctx.signatures:
+        # find_signatures only keeps declarations whose ')' is followed by a '{'
+        body = ts.starts[ts.next_code(ts.index_at(cp))]
+        close = ts.match_bracket(body)
+        if close == -1:
+            continue
+        name = ts.prev_code(ts.index_at(op))
+        yield "method", ts.text(name), ts.starts[name], close
+
+class ScopeIndex:
+    """
+    The scope tree of one snippet. `scopes` lists it in pre-order (root
+    first), which is also ascending start offset; scope_at() finds the
+    innermost scope of an offset by bisection.
+    """
+
+    def __init__(self, code: Snippet):
+        ctx = snippet_context(code)
+        self.root = Scope("snippet", "", 0, len(ctx.code))
+        spans = sorted([*_class_spans(ctx), *_method_spans(ctx)], key=lambda s: (s[2], -s[3]))
+        self.scopes = [self.root]
+        stack = [self.root]
+        for kind, name, start, end in spans:
+            # malformed spans that straddle their neighbour become its siblings
+            while stack[-1] is not self.root and not (start < stack[-1].end and end <= stack[-1].end):
+                stack.pop()
+            scope = Scope(kind, name, start, end, stack[-1])
+            stack[-1].children.append(scope)
+            self.scopes.append(scope)
+            stack.append(scope)
+        self._starts = [s.start for s in self.scopes]
+        self._pos = {id(s): i for i, s in enumerate(self.scopes)}
+
+    def __len__(self) -> int:
+        return len(self.scopes)
+
+    def scope_at(self, offset: int) -> Scope:
+        """Innermost scope containing offset (the root if none does)."""
+        s = self.scopes[max(0, bisect_right(self._starts, offset) - 1)]
+        while s.parent is not None and offset > s.end:
+            s = s.parent
+        return s
+
+    def tally(self, hits: Iterable[Tuple[int, int]], reduce: Callable[[int, int], int] = int.__add__) -> List[int]:
+        """
+        Inclusive value per scope (in `scopes` order) for (offset, value) hits:
+        each hit is folded into its innermost scope, then every scope into its
+        parent, with `reduce` (sum by default; pass max for maxima). Scopes
+        without hits are 0.
+        """
+        out = [0] * len(self.scopes)
+        pos = self._pos
+        for offset, value in hits:
+            i = pos[id(self.scope_at(offset))]
+            out[i] = reduce(out[i], value)
+        for i in range(len(self.scopes) - 1, 0, -1):
+            j = pos[id(self.scopes[i].parent)]
+            out[j] = reduce(out[j], out[i])
+        return out
+
+# --- per-metric hits -----------------------------------------------------------
+def _ones(offsets):
+    return ((off, 1) for off in offsets)
+
+def _signature_hits(ctx):
+    return _ones(op for op, _ in ctx.signatures)
+
+def _param_hits(ctx):
+    from .methods import param_counts
+    return param_counts(ctx)
+
+def _decision_hits(ctx):
+    from .complexity import decision_offsets
+    return _ones(decision_offsets(ctx))
+
+def _widget_hits(ctx):
+    from .widgets import widget_offsets
+    return _ones(widget_offsets(ctx))
+
+def _field_hits(ctx):
+    from .fields import class_field_counts
+    return class_field_counts(ctx)
+
+_EFFECT_KEYS = ("sstc", "pbm", "fac", "mc", "api", "dbc", "syncio", "imgc", "asyncui", "tmrstr")
+
+# key -> (hits(ctx) -> (offset, value) pairs, how values combine); the ten
+# effect counts share one fused scan (effects.effect_hits) instead
+SCOPED_METRICS: Dict[str, Tuple[Optional[Callable], Callable[[int, int], int]]] = {
+    "nom": (_signature_hits, int.__add__),
+    "nop": (_param_hits, max),
+    "cc":  (_decision_hits, int.__add__),  # plus 1 per scope, the McCabe baseline
+    "nof": (_field_hits, int.__add__),
+    "now": (_widget_hits, int.__add__),
+    **{key: (None, int.__add__) for key in _EFFECT_KEYS},
+}
+
+def scope_breakdown(code: Snippet, keys: Optional[Sequence[str]] = None) -> List[Tuple[Scope, Dict[str, int]]]:
+    """
+    [(scope, {label: value})] for every scope in pre-order (root first).
+    keys defaults to every metric in SCOPED_METRICS; others raise KeyError,
+    as whole-snippet measures such as LoC, CR or MND have no hits to place.
+    """
+    ctx = snippet_context(code)
+    keys = list(SCOPED_METRICS) if keys is None else list(keys)
+    for key in keys:
+        if key not in SCOPED_METRICS:
+            raise KeyError(f"metric '{key}' cannot be broken down by scope")
+    index = ctx.scopes
+    rows = [{} for _ in index.scopes]
+    effects = None
+    for key in keys:
+        hits, reduce = SCOPED_METRICS[key]
+        if hits is None:
+            if effects is None:
+                from .effects import effect_hits
+                effects = effect_hits(ctx.code_nc)
+            pairs = _ones(effects[key])
+        else:
+            pairs = hits(ctx)
+        values = index.tally(pairs, reduce)
+        label = METRICS[key][0]
+        base = 1 if key == "cc" else 0
+        for row, v in zip(rows, values):
+            row[label] = v + base
+    return list(zip(index.scopes, rows))
@@ -1,6 +1,9 @@
 # dart_metrics_modular/metrics/side_effects.py
 import re
-from .common import remove_comments
+from .common import Snippet, snippet_context
+
+# The regexes below define the metrics; the counts come from the fused
+# single-pass scanner in effects.py (via SnippetContext.effect_counts).
 
 __all__ = [
     "setstate_call_count",
@@ -13,9 +16,8 @@ __all__ = [
 # --- sStC: setState() calls ---------------------------------------------------
 _SETSTATE_RE = re.compile(r'\bsetState\s*\(')
 
-def setstate_call_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_SETSTATE_RE.findall(s))
+def setstate_call_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["sstc"]
 
 # --- PBM: Provider/Bloc/Riverpod mutations -----------------------------------
 _PBM_RE = re.compile(
@@ -31,17 +33,15 @@ _PBM_RE = re.compile(
     re.IGNORECASE | re.VERBOSE,
 )
 
-def provider_bloc_mutation_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_PBM_RE.findall(s))
+def provider_bloc_mutation_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["pbm"]
 
 # --- FAC: assignments to class fields in UI code ------------------------------
 # Heuristic: count assignments to 'this.<field> =' or 'widget.<field> ='
 _FAC_RE = re.compile(r'\b(?:this|widget)\s*\.\s*[A-Za-z_]\w*\s*=')
 
-def field_assignment_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_FAC_RE.findall(s))
+def field_assignment_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["fac"]
 
 # --- MC: mutable collection modifications -------------------------------------
 # list.add/insert/remove/clear, map[...] = ..., list[index] = ...
@@ -53,9 +53,8 @@ _MC_RE = re.compile(
     re.VERBOSE,
 )
 
-def mutable_collection_mod_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_MC_RE.findall(s))
+def mutable_collection_mod_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["mc"]
 
 # --- API: network calls in UI code --------------------------------------------
 _API_RE = re.compile(
@@ -68,6 +67,5 @@ _API_RE = re.compile(
     re.IGNORECASE | re.VERBOSE,
 )
 
-def api_call_count(code: str) -> int:
-    s = remove_comments(code)
-    return len(_API_RE.findall(s))
+def api_call_count(code: Snippet) -> int:
+    return snippet_context(code).effect_counts["api"]
@@ -0,0 +1,369 @@
+"""
+Streaming summary statistics over batch results.
+
+RunStats folds rows into per-metric summaries as they are computed, so a run
+can report mean, standard deviation, quantiles, histograms and correlations
+without holding its rows or reading its output back. Rows are buffered into
+blocks of a few thousand and each block is folded in with numpy:
+
+- count, mean and variance: Welford/Chan updates, merged block by block
+- quantiles: a value-count sketch, exact while a metric has at most
+  max_bins distinct values (every count metric in practice), after that
+  neighbouring bins are merged into weighted centroids
+- histograms: fixed bins (powers of two for counts, tenths up to 1 then
+  powers of two for CR), so summaries of different runs or shards can be
+  added up
+- correlations: Pearson, from co-moments over the rows where every metric
+  succeeded
+
+Failed metrics (NaN) and over-budget ones (-1) are counted, not folded in.
+Summaries merge (RunStats.merge). dump(path, state=True) also writes the
+raw accumulators (moments, sketch bins, co-moments), so summaries written
+by separate processes can be loaded back (RunStats.load) and merged; this
+is how cli.merge combines the --summary files of shards.
+"""
+import json
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .all_metrics import METRICS
+from .guard import BUDGET_EXCEEDED
+from .results import FLOAT_METRICS
+
+__all__ = ["QUANTILES", "QuantileSketch", "MetricSummary", "RunStats", "histogram_edges"]
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# [0, 1, 2, 3, 5, 9, 17, ..., 2**20 + 1]: bin i is [edges[i], edges[i+1]); the last bin is open-ended
+_COUNT_EDGES = np.array([0, 1, 2] + [2 ** i + 1 for i in range(1, 21)], dtype=np.float64)
+# [0, 0.1, ..., 1, 2, 4, 8, 16]: CR is comment lines per code line, so it can pass 1; the last bin is open-ended
+_RATIO_EDGES = np.concatenate([np.round(np.linspace(0.0, 1.0, 11), 1), [2.0, 4.0, 8.0, 16.0]])
+
+def histogram_edges(key: str) -> np.ndarray:
+    return _RATIO_EDGES if key in FLOAT_METRICS else _COUNT_EDGES
+
+class QuantileSketch:
+    """Weighted (value, count) bins, sorted by value; at most max_bins of them."""
+    __slots__ = ("max_bins", "values", "weights")
+
+    def __init__(self, max_bins: int = 2048):
+        self.max_bins = max_bins
+        self.values = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.weights.sum())
+
+    def add(self, values: np.ndarray, weights: Optional[np.ndarray] = None) -> None:
+        if weights is None:
+            values, weights = np.unique(values, return_counts=True)
+        allv = np.concatenate([self.values, values])
+        allw = np.concatenate([self.weights, np.asarray(weights, dtype=np.float64)])
+        uniq, inv = np.unique(allv, return_inverse=True)
+        w = np.bincount(inv, weights=allw, minlength=len(uniq))
+        while len(uniq) > self.max_bins:
+            uniq, w = self._halve(uniq, w)
+        self.values, self.weights = uniq, w
+
+    @staticmethod
+    def _halve(v: np.ndarray, w: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # merge neighbours pairwise into their weighted mean
+        n = len(v) // 2 * 2
+        pw = w[:n].reshape(-1, 2)
+        ws = pw.sum(axis=1)
+        vs = (v[:n].reshape(-1, 2) * pw).sum(axis=1) / ws
+        return np.concatenate([vs, v[n:]]), np.concatenate([ws, w[n:]])
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self.add(other.values, other.weights)
+
+    def quantile(self, q: float) -> float:
+        """Smallest bin value whose cumulative count reaches q of the total (NaN when empty)."""
+        if not len(self.values):
+            return float("nan")
+        cum = np.cumsum(self.weights)
+        i = int(np.searchsorted(cum, q * cum[-1], side="left"))
+        return float(self.values[min(i, len(self.values) - 1)])
+
+class MetricSummary:
+    """Running statistics of every metric of one group of rows."""
+
+    def __init__(self, keys: Sequence[str], max_bins: int = 2048):
+        self.keys = list(keys)
+        k = len(self.keys)
+        self.rows = 0
+        self.count = np.zeros(k, dtype=np.int64)
+        self.failed = np.zeros(k, dtype=np.int64)
+        self.over_budget = np.zeros(k, dtype=np.int64)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.sketches = [QuantileSketch(max_bins) for _ in self.keys]
+        self.edges = [histogram_edges(key) for key in self.keys]
+        self.hist = [np.zeros(len(e) - 1, dtype=np.int64) for e in self.edges]
+        # co-moments over rows where every metric succeeded
+        self.complete = 0
+        self.co_mean = np.zeros(k)
+        self.co_m2 = np.zeros((k, k))
+
+    def add_block(self, block: np.ndarray) -> None:
+        """Fold in an (n rows, len(keys)) float64 block; NaN is a failure, -1 over budget."""
+        n = block.shape[0]
+        if not n:
+            return
+        self.rows += n
+        nan = np.isnan(block)
+        over = block == BUDGET_EXCEEDED
+        ok = ~(nan | over)
+        self.failed += nan.sum(axis=0)
+        self.over_budget += over.sum(axis=0)
+        for j in range(len(self.keys)):
+            x = block[ok[:, j], j]
+            nb = len(x)
+            if not nb:
+                continue
+            self._merge_moments(j, nb, float(x.mean()), float(((x - x.mean()) ** 2).sum()))
+            self.min[j] = min(self.min[j], float(x.min()))
+            self.max[j] = max(self.max[j], float(x.max()))
+            self.sketches[j].add(x)
+            edges = self.edges[j]
+            bins = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, len(edges) - 2)
+            self.hist[j] += np.bincount(bins, minlength=len(edges) - 1)
+        full = block[ok.all(axis=1)]
+        if len(full):
+            mean = full.mean(axis=0)
+            d = full - mean
+            self._merge_co(len(full), mean, d.T @ d)
+
+    def _merge_moments(self, j: int, nb: int, mb: float, m2b: float) -> None:
+        na = int(self.count[j])
+        n = na + nb
+        delta = mb - self.mean[j]
+        self.mean[j] += delta * nb / n
+        self.m2[j] += m2b + delta * delta * na * nb / n
+        self.count[j] = n
+
+    def _merge_co(self, nb: int, mb: np.ndarray, m2b: np.ndarray) -> None:
+        na = self.complete
+        n = na + nb
+        delta = mb - self.co_mean
+        self.co_mean = self.co_mean + delta * nb / n
+        self.co_m2 = self.co_m2 + m2b + np.outer(delta, delta) * na * nb / n
+        self.complete = n
+
+    def merge(self, other: "MetricSummary") -> None:
+        """Add another summary of the same keys (e.g. from another shard) into this one."""
+        self.rows += other.rows
+        self.failed += other.failed
+        self.over_budget += other.over_budget
+        for j in range(len(self.keys)):
+            if other.count[j]:
+                self._merge_moments(j, int(other.count[j]), float(other.mean[j]), float(other.m2[j]))
+                self.sketches[j].merge(other.sketches[j])
+            self.min[j] = min(self.min[j], other.min[j])
+            self.max[j] = max(self.max[j], other.max[j])
+            self.hist[j] += other.hist[j]
+        if other.complete:
+            self._merge_co(other.complete, other.co_mean, other.co_m2)
+
+    def state(self) -> dict:
+        """The accumulators as JSON-ready lists (inverse: from_state); floats round-trip exactly."""
+        return {
+            "rows": self.rows,
+            "count": self.count.tolist(),
+            "failed": self.failed.tolist(),
+            "over_budget": self.over_budget.tolist(),
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+            # +-inf while a metric has no values; JSON has no infinity
+            "min": [None if math.isinf(v) else v for v in self.min.tolist()],
+            "max": [None if math.isinf(v) else v for v in self.max.tolist()],
+            "sketches": [[sk.values.tolist(), sk.weights.tolist()] for sk in self.sketches],
+            "hist": [h.tolist() for h in self.hist],
+            "complete": self.complete,
+            "co_mean": self.co_mean.tolist(),
+            "co_m2": self.co_m2.tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, keys: Sequence[str], state: dict, max_bins: int = 2048) -> "MetricSummary":
+        s = cls(keys, max_bins)
+        s.rows = state["rows"]
+        s.count = np.array(state["count"], dtype=np.int64)
+        s.failed = np.array(state["failed"], dtype=np.int64)
+        s.over_budget = np.array(state["over_budget"], dtype=np.int64)
+        s.mean = np.array(state["mean"], dtype=np.float64)
+        s.m2 = np.array(state["m2"], dtype=np.float64)
+        s.min = np.array([np.inf if v is None else v for v in state["min"]], dtype=np.float64)
+        s.max = np.array([-np.inf if v is None else v for v in state["max"]], dtype=np.float64)
+        for sk, (values, weights) in zip(s.sketches, state["sketches"]):
+            sk.values = np.array(values, dtype=np.float64)
+            sk.weights = np.array(weights, dtype=np.float64)
+        s.hist = [np.array(h, dtype=np.int64) for h in state["hist"]]
+        for key, edges, h in zip(s.keys, s.edges, s.hist):
+            if len(h) != len(edges) - 1:
+                raise ValueError(f"{METRICS[key][0]} histogram has {len(h)} bins, expected {len(edges) - 1} "
+                                 "(summary written by another version)")
+        s.complete = state["complete"]
+        s.co_mean = np.array(state["co_mean"], dtype=np.float64).reshape(len(s.keys))
+        s.co_m2 = np.array(state["co_m2"], dtype=np.float64).reshape(len(s.keys), len(s.keys))
+        return s
+
+    def correlation(self) -> np.ndarray:
+        """Pearson correlation matrix; NaN where a metric did not vary."""
+        sd = np.sqrt(np.diag(self.co_m2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.co_m2 / np.outer(sd, sd)
+
+    def to_dict(self) -> dict:
+        metrics = {}
+        for j, key in enumerate(self.keys):
+            n = int(self.count[j])
+            metrics[METRICS[key][0]] = {
+                "count": n,
+                "failed": int(self.failed[j]),
+                "over_budget": int(self.over_budget[j]),
+                "mean": _num(self.mean[j]) if n else None,
+                "std": _num(math.sqrt(self.m2[j] / (n - 1))) if n > 1 else None,  # sample std, as pandas
+                "min": _num(self.min[j]) if n else None,
+                "max": _num(self.max[j]) if n else None,
+                "quantiles": {f"p{round(q * 100):02d}": _num(self.sketches[j].quantile(q)) for q in QUANTILES},
+                "histogram": {"edges": [_num(e) for e in self.edges[j]], "counts": self.hist[j].tolist()},
+            }
+        corr = self.correlation()
+        return {
+            "rows": self.rows,
+            "metrics": metrics,
+            "correlation": {
+                "rows": self.complete,
+                "labels": [METRICS[k][0] for k in self.keys],
+                "matrix": [[_num(v) for v in row] for row in corr.tolist()],
+            },
+        }
+
+def _num(v):
+    v = float(v)
+    if math.isnan(v) or math.isinf(v):
+        return None
+    return int(v) if v.is_integer() else round(v, 6)
+
+class RunStats:
+    """
+    Aggregates {label: value} rows of a batch run, overall and, with
+    grouped=True, per group (e.g. a category column). At most block_rows
+    rows are buffered, over all groups, before they are folded in. Call
+    add() per row, then summary() or dump().
+    """
+
+    def __init__(self, keys: Sequence[str], grouped: bool = False, block_rows: int = 4096, max_bins: int = 2048):
+        self.keys = list(keys)
+        self.labels = [METRICS[k][0] for k in self.keys]
+        self.block_rows = block_rows
+        self.max_bins = max_bins
+        self.total = MetricSummary(self.keys, max_bins)
+        self.groups: Dict[object, MetricSummary] = {}
+        self._pending: Dict[object, List[list]] = {}
+        self._buffered = 0
+        self._grouped = grouped
+
+    def add(self, values: dict, group=None) -> None:
+        if isinstance(group, float) and math.isnan(group):
+            group = None
+        buf = self._pending.get(group)
+        if buf is None:
+            buf = self._pending[group] = []
+        buf.append([values[l] for l in self.labels])
+        self._buffered += 1
+        if self._buffered >= self.block_rows:
+            self.flush()
+
+    def _flush(self, group) -> None:
+        rows = self._pending.pop(group, None)
+        if not rows:
+            return
+        block = np.array(rows, dtype=np.float64)
+        self.total.add_block(block)
+        if self._grouped:
+            summary = self.groups.get(group)
+            if summary is None:
+                summary = self.groups[group] = MetricSummary(self.keys, self.max_bins)
+            summary.add_block(block)
+
+    def merge(self, other: "RunStats") -> None:
+        self.flush()
+        other.flush()
+        self.total.merge(other.total)
+        self._grouped = self._grouped or other._grouped
+        for group, summary in other.groups.items():
+            if group in self.groups:
+                self.groups[group].merge(summary)
+            else:
+                mine = self.groups[group] = MetricSummary(self.keys, self.max_bins)
+                mine.merge(summary)
+
+    def flush(self) -> None:
+        for group in list(self._pending):
+            self._flush(group)
+        self._buffered = 0
+
+    def summary(self) -> dict:
+        self.flush()
+        out = self.total.to_dict()
+        if self._grouped:
+            # JSON keys are strings; rows without a group are under "null"
+            out["groups"] = {("null" if g is None else str(g)): s.to_dict()
+                             for g, s in sorted(self.groups.items(), key=lambda kv: str(kv[0]))}
+        return out
+
+    def state(self) -> dict:
+        self.flush()
+        return {
+            "keys": self.keys,
+            "grouped": self._grouped,
+            "total": self.total.state(),
+            # [group, state] pairs: group values need not be strings
+            "groups": [[_json_group(g), s.state()] for g, s in self.groups.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RunStats":
+        stats = cls(state["keys"], grouped=state["grouped"])
+        stats.total = MetricSummary.from_state(stats.keys, state["total"], stats.max_bins)
+        for group, gstate in state["groups"]:
+            stats.groups[group] = MetricSummary.from_state(stats.keys, gstate, stats.max_bins)
+        return stats
+
+    @classmethod
+    def load(cls, path) -> "RunStats":
+        """Read back a summary written with dump(path, state=True)."""
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        if "state" not in data:
+            raise ValueError(f"{path}: summary has no mergeable state (written without state=True)")
+        return cls.from_state(data["state"])
+
+    def dump(self, path, state: bool = False) -> None:
+        """
+        Write summary() as JSON to path ("-" for stdout); with state=True
+        also the accumulators under "state", so load() can read it back.
+        """
+        out = self.summary()
+        if state:
+            out["state"] = self.state()
+        text = json.dumps(out, separators=(",", ":"))
+        if str(path) == "-":
+            print(text)
+        else:
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(text + "\n")
+
+def _json_group(group):
+    if hasattr(group, "item"):  # numpy scalars from the tabular readers
+        group = group.item()
+    if group is None or isinstance(group, (str, bool, int, float)):
+        return group
+    return str(group)
@@ -0,0 +1,543 @@
+"""
+Streaming analysis of one large source file.
+
+analyze_file() memory-maps the file and decodes it piece by piece, giving
+exactly the text Path.read_text(encoding="utf-8") would. The text is cut into
+segments at line breaks where nothing a metric reads can be open. That means:
+ - no token (comment, string literal) spans the break;
+ - the last code character is not one a pattern lets whitespace follow
+   (a word character or one of . ( ) : > ]);
+ - every "(" and "<" has a ")" or ">" after it, because a `[^)]` or `[^>]` run
+   in an effect pattern could otherwise continue past the break.
+Each segment is lexed and stripped on its own, as a SnippetContext. Every
+metric folds over the segments and carries only the state that runs across
+them: bracket stacks, the CC ternary stack, open method parens and class
+bodies, a class header still waiting for its "{", an unclosed naive /* of
+LoC, and an open "[" that MC's `[...] =` may still match. The values equal
+the in-memory metrics of the whole text (tests/test_stream.py checks every
+fold against them). About one segment is held at a time (a segment only grows
+past chunk_bytes while no line break is a safe cut).
+This trades time for memory: the text after the last safe cut is lexed again
+with the next chunk, and the folds walk the tokens in Python, so a file takes
+about 1.2-1.4x as long as with the in-memory metrics.
+"""
+import codecs
+import io
+import mmap
+import os
+import re
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from .all_metrics import METRICS
+from .common import SnippetContext, _comment_line_scan
+from .tokens import COMMENT, IDENT, KEYWORD, PUNCT, TokenStream, tokenize
+
+__all__ = ["DEFAULT_CHUNK_BYTES", "STREAM_KEYS", "iter_segments", "analyze_file"]
+
+DEFAULT_CHUNK_BYTES = 1 << 20
+
+# a character a pattern element can end with right before \s* (see module doc)
+_ELEMENT_END_RE = re.compile(r"[\w.():>\]]")
+
+# --- reading and cutting ---------------------------------------------------------
+class _MappedText:
+    """A file's text decoded from a memory map, nbytes at a time."""
+
+    def __init__(self, path):
+        self._fh = open(path, "rb")
+        self._size = os.fstat(self._fh.fileno()).st_size
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+        self._pos = 0
+        self.eof = False
+        # the decoder text-mode open() uses: strict UTF-8 plus universal newlines
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), translate=True)
+
+    def read(self, nbytes: int) -> str:
+        end = min(self._pos + nbytes, self._size)
+        data = self._mm[self._pos:end] if self._mm is not None else b""
+        self._pos = end
+        self.eof = end >= self._size
+        return self._decoder.decode(data, final=self.eof)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _safe_cut(ts: TokenStream, code_nc: str) -> int:
+    """Offset just past the last line break of the text that is a safe cut (see module doc), or 0."""
+    starts, ends = ts.starts, ts.ends
+    po, pc = code_nc.rfind("("), code_nc.rfind(")")
+    ao, ac = code_nc.rfind("<"), code_nc.rfind(">")
+    nl = code_nc.rfind("\n")
+    while nl != -1:
+        cut = nl + 1
+        # the last "(" / ")" / "<" / ">" before cut, moving left only
+        if po >= cut:
+            po = code_nc.rfind("(", 0, cut)
+        if pc >= cut:
+            pc = code_nc.rfind(")", 0, cut)
+        if ao >= cut:
+            ao = code_nc.rfind("<", 0, cut)
+        if ac >= cut:
+            ac = code_nc.rfind(">", 0, cut)
+        if po <= pc and ao <= ac:
+            i = bisect_right(starts, nl) - 1
+            if i < 0 or ends[i] <= nl:
+                j = nl
+                while j and code_nc[j - 1].isspace():
+                    j -= 1
+                if not j or not _ELEMENT_END_RE.match(code_nc, j - 1):
+                    return cut
+        nl = code_nc.rfind("\n", 0, nl)
+    return 0
+
+def iter_segments(path, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[SnippetContext]:
+    """
+    Yield the file's text as consecutive SnippetContexts of about chunk_bytes,
+    cut only where the metrics can be folded across (their tokens and code_nc
+    are those of the whole text). The last one may be empty.
+    chunk_bytes below 1 raises ValueError.
+    """
+    if chunk_bytes < 1:
+        raise ValueError(f"chunk_bytes must be at least 1, not {chunk_bytes}")
+    rest = ""
+    want = chunk_bytes
+    with _MappedText(path) as src:
+        while True:
+            text = rest + src.read(want)
+            if src.eof:
+                break
+            ts = tokenize(text)
+            code_nc = ts.without_comments()
+            cut = _safe_cut(ts, code_nc)
+            if not cut:
+                # read as much again, so lexing a long unsafe stretch stays linear
+                rest = text
+                want = max(chunk_bytes, len(text))
+                continue
+            head = ts.prefix(cut)
+            seg = SnippetContext(head.code)
+            seg.tokens = head
+            seg.code_nc = code_nc[:cut]
+            yield seg
+            rest = text[cut:]
+            want = chunk_bytes
+    yield SnippetContext(text)
+
+# --- per-metric folds ------------------------------------------------------------
+# Each fold takes the segments in order (feed), then finish() once; value(key)
+# gives the metric.
+
+_LINE_BREAKS = frozenset("\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029")  # str.splitlines() boundaries
+
+class _LocCounter:
+    """common._count_loc over text that arrives in pieces (block comments already removed)."""
+    __slots__ = ("count", "head")
+
+    def __init__(self, count: int = 0, head: str = ""):
+        self.count = count
+        self.head = head  # first two non-blank characters of the line in progress
+
+    def feed(self, text: str) -> None:
+        if not text:
+            return
+        lines = text.splitlines()
+        open_end = text[-1] not in _LINE_BREAKS
+        last = len(lines) - 1
+        head = self.head
+        for i, line in enumerate(lines):
+            s = head + line if head else line.lstrip()
+            head = ""
+            if i == last and open_end:
+                head = s[:2]
+            elif s and not s.startswith("//"):
+                self.count += 1
+        self.head = head
+
+    def total(self) -> int:
+        return self.count + (1 if self.head and not self.head.startswith("//") else 0)
+
+class _LineFold:
+    """LoC and comment lines, hence CR."""
+
+    def __init__(self):
+        self.loc = _LocCounter()
+        # LoC's regex drops /* ... */ (non-nested, strings included). While one is
+        # open, `unclosed` counts on as if it were text: if it never closes, the
+        # regex removes nothing from there on.
+        self.unclosed: Optional[_LocCounter] = None
+        self.comments = 0
+        self.in_block = False
+
+    def feed(self, seg: SnippetContext) -> None:
+        count, self.in_block = _comment_line_scan(seg.lines, self.in_block)
+        self.comments += count
+        text = seg.code
+        pos = 0
+        since = 0  # where `unclosed` starts counting in this segment
+        while True:
+            if self.unclosed is None:
+                j = text.find("/*", pos)
+                if j == -1:
+                    self.loc.feed(text[pos:])
+                    return
+                self.loc.feed(text[pos:j])
+                self.unclosed = _LocCounter(self.loc.count, self.loc.head)
+                since = j
+                pos = j + 2
+            else:
+                k = text.find("*/", pos)
+                if k == -1:
+                    self.unclosed.feed(text[since:])
+                    return
+                self.unclosed = None
+                pos = k + 2
+
+    def finish(self) -> None:
+        if self.unclosed is not None:
+            self.loc = self.unclosed
+
+    def value(self, key: str):
+        loc = self.loc.total()
+        if key == "loc":
+            return loc
+        return round((self.comments / loc) if loc else 0.0, 3)
+
+class _ComplexityFold:
+    def __init__(self):
+        from .complexity import _TernaryState
+        self.state = _TernaryState()
+        self.decisions = 0
+
+    def feed(self, seg: SnippetContext) -> None:
+        from .complexity import _decisions
+        self.decisions += _decisions(seg.tokens, self.state)
+
+    def finish(self) -> None:
+        pass
+
+    def value(self, key: str):
+        return 1 + self.decisions
+
+class _BraceDepthFold:
+    def __init__(self):
+        self.depth = self.max_depth = 0
+
+    def feed(self, seg: SnippetContext) -> None:
+        from .nesting import _brace_depth
+        self.depth, self.max_depth = _brace_depth(seg.tokens.bracket_chars, self.depth, self.max_depth)
+
+    def finish(self) -> None:
+        pass
+
+    def value(self, key: str):
+        return max(0, self.max_depth - 1)
+
+class _Paren:
+    __slots__ = ("sig", "mark", "depth", "commas", "nom", "nop")
+
+    def __init__(self, sig: bool, mark: int):
+        self.sig = sig    # the code token before it may name a declaration
+        self.mark = mark  # code tokens seen up to and including it (empty parens)
+        self.depth = 0    # NoP's <{[( depth and top-level commas inside it
+        self.commas = 0
+        self.nom = 0      # what the parens inside it add if it is never closed
+        self.nop = 0
+
+class _SignatureFold:
+    """
+    NoM and NoP. methods.find_signatures walks the outermost matched parens,
+    and an unmatched "(" is looked through. Whether a "(" is matched is only
+    known at its ")" (or at the end), so each open "(" collects the results
+    of the parens inside it: they are dropped when it closes (it is then the
+    outer one) and passed down when it never does.
+    """
+
+    def __init__(self):
+        self.stack: List[_Paren] = []
+        self.pending = None  # (paren, empty) just closed; the next code token decides
+        self.prev_ok = False
+        self.seen = 0
+        self.nom = self.nop = 0
+
+    def _add(self, nom: int, nop: int) -> None:
+        target = self.stack[-1] if self.stack else self
+        target.nom += nom
+        if nop > target.nop:
+            target.nop = nop
+
+    def feed(self, seg: SnippetContext) -> None:
+        from .methods import KEYWORDS
+        ts = seg.tokens
+        code = ts.code
+        stack = self.stack
+        for kind, start, end in zip(ts.kinds, ts.starts, ts.ends):
+            if kind == COMMENT:
+                continue
+            ch = code[start]
+            if self.pending is not None:
+                paren, empty = self.pending
+                self.pending = None
+                if ch == "{" and paren.sig:
+                    self._add(1, 0 if empty else paren.commas + 1)
+            if kind == PUNCT:
+                closed = None
+                if ch == ")" and stack:
+                    closed = stack.pop()
+                for p in stack:
+                    if not p.sig:
+                        continue
+                    if ch in "<{[(":
+                        p.depth += 1
+                    elif ch in ">}])":
+                        if p.depth:
+                            p.depth -= 1
+                    elif ch == "," and not p.depth:
+                        p.commas += 1
+                if closed is not None:
+                    self.pending = (closed, self.seen == closed.mark)
+                elif ch == "(":
+                    stack.append(_Paren(self.prev_ok, self.seen + 1))
+            self.prev_ok = kind in (IDENT, KEYWORD) and code[start:end] not in KEYWORDS
+            self.seen += 1
+
+    def finish(self) -> None:
+        self.pending = None
+        while self.stack:
+            p = self.stack.pop()
+            self._add(p.nom, p.nop)
+
+    def value(self, key: str):
+        return self.nom if key == "nom" else self.nop
+
+class _Body:
+    __slots__ = ("height", "total", "sdepth", "paren", "fdepth", "name", "seen_eq", "count")
+
+    def __init__(self, height: int):
+        self.height = height  # "{" nesting once its brace is open
+        self.total = 0
+        self.sdepth = 0       # brace depth that splits statements
+        self._reset()
+
+    def _reset(self) -> None:
+        # the statement in progress (fields.count_fields_in_class)
+        self.paren = False
+        self.fdepth = 0
+        self.name = None
+        self.seen_eq = False
+        self.count = 0
+
+    def step(self, kind: int, ch: str, text: str) -> None:
+        if kind == COMMENT:
+            return
+        if kind == PUNCT:
+            if ch in "<{[(":
+                self.fdepth += 1
+                if ch == "(":
+                    self.paren = True
+            elif ch in ">}])":
+                if self.fdepth:
+                    self.fdepth -= 1
+            elif (ch == "," and not self.fdepth) or ch == ";":
+                if self.name is not None and self.name not in {"get", "set", "factory"}:
+                    self.count += 1
+                self.name = None
+                self.seen_eq = False
+            elif "=" in text:
+                self.seen_eq = True
+            if ch == "{":
+                self.sdepth += 1
+            elif ch == "}":
+                self.sdepth = max(0, self.sdepth - 1)
+            elif ch == ";" and self.sdepth == 0:
+                if not self.paren:
+                    self.total += self.count
+                self._reset()
+        elif not self.seen_eq and kind in (IDENT, KEYWORD):
+            self.name = text
+
+class _FieldFold:
+    """NoF: class bodies found by fields.CLASS_RE, their fields counted as the tokens go by."""
+
+    def __init__(self):
+        self.height = 0          # open "{" (unmatched "}" are ignored, as in bracket_pairs)
+        self.bodies: List[_Body] = []
+        self.header = False      # a class header seen, its "{" not yet
+        self.total = 0
+
+    def _body_braces(self, code_nc: str) -> set:
+        from .fields import CLASS_RE
+        opens = set()
+        pos = 0
+        if self.header:
+            pos = code_nc.find("{")
+            if pos == -1:
+                return opens
+            opens.add(pos)
+            self.header = False
+            pos += 1
+        for m in CLASS_RE.finditer(code_nc, pos):
+            opens.add(m.end() - 1)
+            pos = m.end()
+        # CLASS_RE's [^{]* may run into the next segment
+        self.header = _CLASS_HEAD_RE.search(code_nc, pos) is not None
+        return opens
+
+    def feed(self, seg: SnippetContext) -> None:
+        opens = self._body_braces(seg.code_nc)
+        ts = seg.tokens
+        code = ts.code
+        bodies = self.bodies
+        for kind, start, end in zip(ts.kinds, ts.starts, ts.ends):
+            ch = code[start] if kind == PUNCT else ""
+            if ch == "}" and self.height:
+                if bodies and bodies[-1].height == self.height:
+                    self.total += bodies.pop().total
+                self.height -= 1
+            if bodies:
+                text = code[start:end]
+                for body in bodies:
+                    body.step(kind, ch, text)
+            if ch == "{":
+                self.height += 1
+                if start in opens:
+                    bodies.append(_Body(self.height))
+
+    def finish(self) -> None:
+        self.bodies = []  # never closed: not a body
+
+    def value(self, key: str):
+        return self.total
+
+_CLASS_HEAD_RE = re.compile(r"\bclass\s+[A-Za-z_]")
+
+class _WidgetFold:
+    """NoW, MNW and SCCL."""
+
+    def __init__(self):
+        self.widgets = 0
+        self.stack = []
+        self.state = (0, 0, False)  # MNW depth, max depth, previous word capitalised
+        self.height = 0             # open "(" for SCCL
+        self.spans = []             # [height, deepest chain closed inside] of open `child: X(` parens
+        self.chain = 0
+
+    def _lift(self, depth: int) -> None:
+        if self.spans:
+            if depth > self.spans[-1][1]:
+                self.spans[-1][1] = depth
+        elif depth > self.chain:
+            self.chain = depth
+
+    def feed(self, seg: SnippetContext) -> None:
+        from .widgets import CHILD_CTOR, _widget_nesting, number_of_widgets
+        self.widgets += number_of_widgets(seg)
+        self.state = _widget_nesting(seg.code_nc, self.stack, *self.state)
+        # SCCL: a chain's depth is known once its parens close; one never closed does not count
+        parens = {m.end() - 1 for m in CHILD_CTOR.finditer(seg.code_nc)}
+        ts = seg.tokens
+        spans = self.spans
+        for off, ch in zip(ts.bracket_pos, ts.bracket_chars):
+            if ch == "(":
+                self.height += 1
+                if off in parens:
+                    spans.append([self.height, 0])
+            elif ch == ")" and self.height:
+                if spans and spans[-1][0] == self.height:
+                    self._lift(spans.pop()[1] + 1)
+                self.height -= 1
+
+    def finish(self) -> None:
+        while self.spans:
+            self._lift(self.spans.pop()[1])
+
+    def value(self, key: str):
+        if key == "now":
+            return self.widgets
+        if key == "mnw":
+            return self.state[1]
+        return self.chain
+
+_INDEX_ASSIGN_END_RE = re.compile(r"\]\s*=")
+
+class _EffectFold:
+    """
+    The ten effect counts. The cut rules keep every match inside a segment
+    except MC's `\\[[^\\]]+\\]\\s*=`, which may run from an open "[" to the
+    first "]" of a later segment; the MC matches it would swallow are
+    counted provisionally and taken back if it does match.
+    """
+
+    def __init__(self):
+        from .effects import EFFECT_PATTERNS
+        self.counts = dict.fromkeys(EFFECT_PATTERNS, 0)
+        self.swallowed = None  # MC matches after the open "[", while one is open
+
+    def feed(self, seg: SnippetContext) -> None:
+        from .side_effects import _MC_RE
+        found = seg.effect_counts
+        for key, n in found.items():
+            self.counts[key] += n
+        code_nc = seg.code_nc
+        if self.swallowed is not None:
+            close = code_nc.find("]")
+            if close == -1:
+                self.swallowed += found["mc"]
+                return
+            m = _INDEX_ASSIGN_END_RE.match(code_nc, close)
+            if m:
+                rest = len(_MC_RE.findall(code_nc, m.end()))
+                self.counts["mc"] += 1 - self.swallowed - found["mc"] + rest
+            self.swallowed = None
+        open_at = code_nc.find("[", code_nc.rfind("]") + 1)
+        if open_at != -1:
+            self.swallowed = len(_MC_RE.findall(code_nc, open_at))
+
+    def finish(self) -> None:
+        pass
+
+    def value(self, key: str):
+        return self.counts[key]
+
+_FOLDS = {
+    "loc": _LineFold, "cr": _LineFold,
+    "nom": _SignatureFold, "nop": _SignatureFold,
+    "cc": _ComplexityFold,
+    "mnd": _BraceDepthFold,
+    "nof": _FieldFold,
+    "now": _WidgetFold, "mnw": _WidgetFold, "sccl": _WidgetFold,
+    "sstc": _EffectFold, "pbm": _EffectFold, "fac": _EffectFold, "mc": _EffectFold, "api": _EffectFold,
+    "dbc": _EffectFold, "syncio": _EffectFold, "imgc": _EffectFold, "asyncui": _EffectFold, "tmrstr": _EffectFold,
+}
+
+# metrics analyze_file() supports (all of them)
+STREAM_KEYS = tuple(_FOLDS)
+
+def analyze_file(path, keys: Sequence[str], chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Dict[str, object]:
+    """
+    Compute the metrics in `keys` for one file without holding its whole text,
+    as {label: value}; the values equal the metrics of the whole file read
+    with Path.read_text(encoding="utf-8"). chunk_bytes below 1 raises
+    ValueError before the file is opened.
+    """
+    if chunk_bytes < 1:
+        raise ValueError(f"chunk_bytes must be at least 1, not {chunk_bytes}")
+    folds = {}
+    for key in keys:
+        cls = _FOLDS[key]
+        if cls not in folds:
+            folds[cls] = cls()
+    for seg in iter_segments(path, chunk_bytes):
+        for fold in folds.values():
+            fold.feed(seg)
+    for fold in folds.values():
+        fold.finish()
+    return {METRICS[key][0]: folds[_FOLDS[key]].value(key) for key in keys}
@@ -0,0 +1,317 @@
+
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+__all__ = [
+    "COMMENT", "STRING", "KEYWORD", "IDENT", "NUMBER", "PUNCT",
+    "DART_KEYWORDS", "TokenStream", "tokenize", "interpolation_spans", "strip_comments",
+]
+
+# Token kinds
+COMMENT, STRING, KEYWORD, IDENT, NUMBER, PUNCT = range(6)
+
+DART_KEYWORDS = frozenset("""
+    abstract as assert async await base break case catch class const continue
+    covariant default deferred do dynamic else enum export extends extension
+    external factory false final finally for get hide if implements import in
+    interface is late library mixin new null on operator part required rethrow
+    return sealed set show static super switch sync this throw true try typedef
+    var void when while with yield
+""".split())
+
+BRACKETS = "(){}[]"
+
+_TOKEN_RE = re.compile(
+    r"""
+    \s*
+    (?:
+      (?P<line>//[^\r\n]*)
+    | (?P<block>/\*)
+    | (?P<str>r?(?:'''|\"\"\"|'|"))
+    | (?P<word>[A-Za-z_$][\w$]*)
+    | (?P<num>0[xX][0-9A-Fa-f]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<op>=>|\?\?=?|\?\.\.?|\.\.\.\??|\.\.|&&|\|\||[=!]=|\S)
+    )
+    """,
+    re.VERBOSE,
+)
+
+_BLOCK_DELIM_RE = re.compile(r"/\*|\*/")
+
+# Body of a non-raw string up to the next quote, `${`, newline or stray backslash
+_STRING_BODY = {
+    "'": re.compile(r"(?:[^'\\$\r\n]+|\\.|\$(?!\{))*"),
+    '"': re.compile(r'(?:[^"\\$\r\n]+|\\.|\$(?!\{))*'),
+    "'''": re.compile(r"(?:[^'\\$]+|\\[\s\S]|\$(?!\{)|'(?!''))*"),
+    '"""': re.compile(r'(?:[^"\\$]+|\\[\s\S]|\$(?!\{)|"(?!""))*'),
+}
+_RAW_LINE_BODY = {
+    "'": re.compile(r"[^'\r\n]*"),
+    '"': re.compile(r'[^"\r\n]*'),
+}
+
+_NOT_EOL_RE = re.compile(r"[^\r\n]")
+
+# Where a comment or string literal can start. No other token contains a quote
+# or "/" followed by "/" or "*", so outside literals and comments every match is one.
+_LITERAL_START_RE = re.compile(r"""//[^\r\n]*|/\*|r?(?:'''|\"\"\"|'|")""")
+_WORD_CHAR_RE = re.compile(r"[\w$]")
+
+def _skip_block_comment(code: str, pos: int) -> int:
+    """Return the offset just past the (nestable) block comment opening at pos."""
+    depth = 0
+    for m in _BLOCK_DELIM_RE.finditer(code, pos):
+        if m.group() == "/*":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return len(code)
+
+def _scan_string(code: str, pos: int, quote: str, raw: bool) -> int:
+    """Return the offset just past a string literal whose body starts at pos."""
+    n = len(code)
+    if raw:
+        if len(quote) == 3:
+            end = code.find(quote, pos)
+            return n if end == -1 else end + 3
+        end = _RAW_LINE_BODY[quote].match(code, pos).end()
+        return end + 1 if end < n and code[end] == quote else end
+    body = _STRING_BODY[quote]
+    while True:
+        pos = body.match(code, pos).end()
+        if pos >= n:
+            return n
+        if code.startswith(quote, pos):
+            return pos + len(quote)
+        if code.startswith("${", pos):
+            pos = _skip_interpolation(code, pos + 2)
+            continue
+        # single-line literal cut by a newline, or a dangling backslash
+        return pos
+
+def _skip_interpolation(code: str, pos: int) -> int:
+    """Return the offset just past the `}` closing a `${` that ends at pos."""
+    n = len(code)
+    depth = 0
+    match = _TOKEN_RE.match
+    while pos < n:
+        m = match(code, pos)
+        if m is None:
+            break
+        kind = m.lastgroup
+        end = m.end()
+        if kind == "block":
+            end = _skip_block_comment(code, m.start(kind))
+        elif kind == "str":
+            q = m.group(kind)
+            raw = q[0] == "r"
+            end = _scan_string(code, end, q[1:] if raw else q, raw)
+        elif kind == "op":
+            ch = code[m.start(kind)]
+            if ch == "{":
+                depth += 1
+            elif ch == "}":
+                if depth == 0:
+                    return end
+                depth -= 1
+        pos = end
+    return n
+
+def interpolation_spans(code: str, start: int) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the top-level `${...}` bodies of the string literal at start."""
+    m = _TOKEN_RE.match(code, start)
+    q = m.group("str") if m else None
+    if not q or q[0] == "r":
+        return []
+    body = _STRING_BODY[q]
+    n = len(code)
+    pos = m.end()
+    spans = []
+    while True:
+        pos = body.match(code, pos).end()
+        if pos >= n or not code.startswith("${", pos):
+            return spans
+        close = _skip_interpolation(code, pos + 2)
+        spans.append((pos + 2, close - 1 if code[close - 1:close] == "}" else close))
+        pos = close
+
+class TokenStream:
+    """
+    Compact token stream for one snippet: parallel arrays of kind, start and
+    end offsets (into the original text), plus the bracket subsequence.
+    Comments and whole string literals (including interpolations) are single
+    tokens, so nothing inside them is seen as code.
+    """
+    __slots__ = ("code", "kinds", "starts", "ends", "bracket_pos", "bracket_chars", "_pairs")
+
+    def __init__(self, code: str):
+        self.code = code
+        self.kinds = array("b")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.bracket_pos = array("i")
+        self.bracket_chars = ""
+        self._pairs = None
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def text(self, i: int) -> str:
+        return self.code[self.starts[i]:self.ends[i]]
+
+    def index_at(self, offset: int) -> int:
+        """Index of the token starting exactly at offset, or -1."""
+        i = bisect_left(self.starts, offset)
+        if i < len(self.starts) and self.starts[i] == offset:
+            return i
+        return -1
+
+    def prev_code(self, i: int) -> int:
+        """Index of the closest non-comment token before i, or -1."""
+        i -= 1
+        while i >= 0 and self.kinds[i] == COMMENT:
+            i -= 1
+        return i
+
+    def next_code(self, i: int) -> int:
+        """Index of the closest non-comment token after i, or -1."""
+        i += 1
+        n = len(self.kinds)
+        while i < n and self.kinds[i] == COMMENT:
+            i += 1
+        return i if i < n else -1
+
+    def prefix(self, end: int) -> "TokenStream":
+        """The stream of code[:end]; no token may span end."""
+        n = bisect_left(self.starts, end)
+        b = bisect_left(self.bracket_pos, end)
+        ts = TokenStream(self.code[:end])
+        ts.kinds = self.kinds[:n]
+        ts.starts = self.starts[:n]
+        ts.ends = self.ends[:n]
+        ts.bracket_pos = self.bracket_pos[:b]
+        ts.bracket_chars = self.bracket_chars[:b]
+        return ts
+
+    def comment_spans(self) -> List[Tuple[int, int]]:
+        kinds, starts, ends = self.kinds, self.starts, self.ends
+        return [(starts[i], ends[i]) for i in range(len(kinds)) if kinds[i] == COMMENT]
+
+    def without_comments(self) -> str:
+        """Source text with every comment blanked out (newlines kept, offsets unchanged)."""
+        code = self.code
+        parts = []
+        last = 0
+        for s, e in self.comment_spans():
+            parts.append(code[last:s])
+            parts.append(_NOT_EOL_RE.sub(" ", code[s:e]))
+            last = e
+        if not parts:
+            return code
+        parts.append(code[last:])
+        return "".join(parts)
+
+    def bracket_pairs(self) -> Dict[int, int]:
+        """
+        Map every matched opening bracket offset to its partner, built in one
+        stack pass. Each bracket kind is matched independently, so a stray
+        ')' never closes a '{'.
+        """
+        if self._pairs is None:
+            pairs = {}
+            stacks = {"(": [], "{": [], "[": []}
+            openers = {")": stacks["("], "}": stacks["{"], "]": stacks["["]}
+            for off, ch in zip(self.bracket_pos, self.bracket_chars):
+                st = stacks.get(ch)
+                if st is not None:
+                    st.append(off)
+                else:
+                    st = openers[ch]
+                    if st:
+                        pairs[st.pop()] = off
+            self._pairs = pairs
+        return self._pairs
+
+    def match_bracket(self, open_idx: int) -> int:
+        """Offset of the bracket closing the one at open_idx, or -1."""
+        return self.bracket_pairs().get(open_idx, -1)
+
+def tokenize(code: str) -> TokenStream:
+    """Lex a Dart snippet in one left-to-right pass."""
+    ts = TokenStream(code)
+    kinds = ts.kinds.append
+    starts = ts.starts.append
+    ends = ts.ends.append
+    bpos = ts.bracket_pos.append
+    bchars = []
+    match = _TOKEN_RE.match
+    n = len(code)
+    pos = 0
+    while pos < n:
+        m = match(code, pos)
+        if m is None:  # trailing whitespace
+            break
+        kind = m.lastgroup
+        start = m.start(kind)
+        end = m.end()
+        if kind == "word":
+            tk = KEYWORD if m.group(kind) in DART_KEYWORDS else IDENT
+        elif kind == "op":
+            tk = PUNCT
+            ch = code[start]
+            if ch in BRACKETS:
+                bpos(start)
+                bchars.append(ch)
+        elif kind == "str":
+            q = m.group(kind)
+            raw = q[0] == "r"
+            end = _scan_string(code, end, q[1:] if raw else q, raw)
+            tk = STRING
+        elif kind == "line":
+            tk = COMMENT
+        elif kind == "block":
+            end = _skip_block_comment(code, start)
+            tk = COMMENT
+        else:
+            tk = NUMBER
+        kinds(tk)
+        starts(start)
+        ends(end)
+        pos = end
+    ts.bracket_chars = "".join(bchars)
+    return ts
+
+def strip_comments(code: str) -> str:
+    """
+    Same text as tokenize(code).without_comments(), but only string literals
+    and comments are scanned, so no token stream is built.
+    """
+    parts = []
+    last = pos = 0
+    search = _LITERAL_START_RE.search
+    while True:
+        m = search(code, pos)
+        if m is None:
+            break
+        start = m.start()
+        tok = m.group()
+        if tok[0] == "/":
+            end = m.end() if tok[1] == "/" else _skip_block_comment(code, start)
+            parts.append(code[last:start])
+            parts.append(_NOT_EOL_RE.sub(" ", code[start:end]))
+            last = end
+        else:
+            raw = tok[0] == "r"
+            if raw and start and _WORD_CHAR_RE.match(code, start - 1):
+                # the "r" may end an identifier or number: let the lexer decide
+                return tokenize(code).without_comments()
+            end = _scan_string(code, m.end(), tok[1:] if raw else tok, raw)
+        pos = end
+    if not parts:
+        return code
+    parts.append(code[last:])
+    return "".join(parts)
@@ -1,64 +1,196 @@
 
 import re
-from .common import remove_comments, find_matching_paren
+from array import array
+from typing import Dict, List
 
-__all__ = ["number_of_widgets", "max_widget_nesting", "child_chain_max_depth"]
+from .common import Snippet, snippet_context
+
+__all__ = [
+    "number_of_widgets", "max_widget_nesting", "child_chain_max_depth", "widget_offsets",
+    "WidgetTree", "build_widget_tree", "CTOR", "LEVEL", "CHILD",
+]
 
 WIDGET_CTOR = re.compile(r'(?<![a-z0-9_])([A-Z][A-Za-z0-9_]*)\s*\(')
 
-def number_of_widgets(code: str) -> int:
-    code_nc = remove_comments(code)
-    return len(WIDGET_CTOR.findall(code_nc))
+# --- widget tree ---------------------------------------------------------------
+# node flags
+CTOR = 1   # a `Name(` call counted by NoW
+LEVEL = 2  # a '(' right after a capitalised word: one level of MNW
+CHILD = 4  # the `X(` of a `child: X(` whose parens match (SCCL)
+
+# the MNW tokens, with the `\s*(` of a call taken along with the name
+_TREE_TOKEN = re.compile(
+    r"(?P<cap>[A-Z][A-Za-z0-9_]*(?!\w))(?P<ccall>\s*\()?"
+    r"|(?P<word>[A-Za-z_]\w*)(?P<wcall>\s*\()?"
+    r"|(?P<open>\()|(?P<close>\))"
+)
+_NOT_CTOR_PREV = frozenset("abcdefghijklmnopqrstuvwxyz0123456789_")
+
+class WidgetTree:
+    """
+    The constructor-like calls of one snippet as parallel arrays, one entry
+    per node in source order: name id (into `names`), parent node (-1 at the
+    top), MNW depth, flags (CTOR | LEVEL | CHILD) and the offset NoW reports.
+    A node's parent is the closest node whose (real, matched) parens enclose
+    it. NoW, MNW and SCCL are all read off these arrays.
+    """
+    __slots__ = ("names", "name_ids", "parents", "depths", "flags", "starts")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.name_ids = array("i")
+        self.parents = array("i")
+        self.depths = array("i")
+        self.flags = array("b")
+        self.starts = array("i")
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def name(self, i: int) -> str:
+        return self.names[self.name_ids[i]]
 
-def max_widget_nesting(code: str) -> int:
-    code_nc = remove_comments(code)
-    tokens = re.finditer(r'[A-Za-z_]\w*|\(|\)', code_nc)
-    stack = []
+    def widget_count(self) -> int:
+        return sum(1 for f in self.flags if f & CTOR)
+
+    def max_depth(self) -> int:
+        return max((d for d, f in zip(self.depths, self.flags) if f & LEVEL), default=0)
+
+    def child_chains(self) -> array:
+        """Per node, the `child:` constructors on its path from the top, itself included."""
+        chains = array("i", bytes(4 * len(self.flags)))
+        for i, (p, f) in enumerate(zip(self.parents, self.flags)):
+            chains[i] = (chains[p] if p != -1 else 0) + (1 if f & CHILD else 0)
+        return chains
+
+    def max_child_chain(self) -> int:
+        return max((c for c, f in zip(self.child_chains(), self.flags) if f & CHILD), default=0)
+
+def build_widget_tree(code: Snippet) -> WidgetTree:
+    """
+    One scan of the comment-stripped text builds the tree; shared by NoW,
+    MNW and SCCL as SnippetContext.widget_tree. The token stream says which
+    parens are real brackets (not inside a string literal) and where they close.
+    """
+    ctx = snippet_context(code)
+    code_nc = ctx.code_nc
+    pairs = ctx.tokens.bracket_pairs()
+    tree = WidgetTree()
+    ids: Dict[str, int] = {}
+    names = tree.names
+    add_name, add_parent, add_depth = tree.name_ids.append, tree.parents.append, tree.depths.append
+    add_flags, add_start = tree.flags.append, tree.starts.append
+    stack = []        # MNW: per open paren, whether it opened a widget level
+    enclosing = []    # (close offset, node) of nodes whose parens are real and matched
     depth = 0
-    max_depth = 0
     prev_cap = False
-    prev_token = ""
-    for t in tokens:
-        s = t.group(0)
-        if s == '(':
-            is_widget = prev_cap and bool(re.match(r'^[A-Z][A-Za-z0-9_]*$', prev_token))
-            stack.append(is_widget)
-            if is_widget:
+    cap_name = ""
+    child_paren = -1  # the '(' of the last `child: X(` seen
+    search = WIDGET_CTOR.search
+    for m in _TREE_TOKEN.finditer(code_nc):
+        kind = m.lastgroup
+        if kind == "word":
+            prev_cap = False
+            if m.group() == "child":
+                c = CHILD_CTOR.match(code_nc, m.start())
+                if c:
+                    child_paren = c.end() - 1
+            continue
+        if kind == "cap":
+            prev_cap = True
+            cap_name = m.group()
+            continue
+        if kind == "close":
+            if stack and stack.pop() and depth > 0:
+                depth -= 1
+            prev_cap = False
+            continue
+        pos = m.end() - 1
+        flags = 0
+        name = None
+        start = m.start()
+        if kind == "ccall":
+            cap_name = m.group("cap")
+            flags = LEVEL
+            if start == 0 or code_nc[start - 1] not in _NOT_CTOR_PREV:
+                flags |= CTOR
+                name = cap_name
+        elif kind == "open":
+            if prev_cap:
+                flags = LEVEL
+        if not flags & CTOR and kind != "open":
+            # a call whose name only partly qualifies, e.g. the "RL(" of `getURL(`
+            w = search(code_nc, start, pos + 1)
+            if w:
+                flags |= CTOR
+                name = w.group(1)
+                start = w.start()
+        if pos == child_paren and pos in pairs:
+            flags |= CHILD
+        stack.append(bool(flags & LEVEL))
+        if flags & LEVEL:
+            depth += 1
+        prev_cap = False
+        if not flags:
+            continue
+        if name is None:
+            name = cap_name
+        while enclosing and enclosing[-1][0] < pos:
+            enclosing.pop()
+        node = len(tree.flags)
+        nid = ids.get(name)
+        if nid is None:
+            nid = ids[name] = len(names)
+            names.append(name)
+        add_name(nid)
+        add_parent(enclosing[-1][1] if enclosing else -1)
+        add_depth(depth)
+        add_flags(flags)
+        add_start(start)
+        close = pairs.get(pos)
+        if close is not None:
+            enclosing.append((close, node))
+    return tree
+
+def number_of_widgets(code: Snippet) -> int:
+    return snippet_context(code).widget_tree.widget_count()
+
+def widget_offsets(code: Snippet):
+    """Offsets of the widget constructor calls counted by NoW."""
+    tree = snippet_context(code).widget_tree
+    return [off for off, f in zip(tree.starts, tree.flags) if f & CTOR]
+
+# MNW on its own, resumable piece by piece (stream.py): a capitalised
+# ASCII-only word (a widget name), any other word, or a paren
+_MNW_TOKEN = re.compile(r"(?P<cap>[A-Z][A-Za-z0-9_]*(?!\w))|[A-Za-z_]\w*|(?P<open>\()|(?P<close>\))")
+
+def _widget_nesting(code_nc: str, stack: list, depth: int = 0, max_depth: int = 0, prev_cap: bool = False):
+    """
+    Scan code_nc for MNW from the given state (stack is updated in place);
+    return (depth, max_depth, prev_cap) to continue with the next piece.
+    """
+    for m in _MNW_TOKEN.finditer(code_nc):
+        kind = m.lastgroup
+        if kind == "open":
+            # a '(' right after a widget name opens a widget level
+            stack.append(prev_cap)
+            if prev_cap:
                 depth += 1
                 if depth > max_depth:
                     max_depth = depth
             prev_cap = False
-        elif s == ')':
-            if stack:
-                is_widget = stack.pop()
-                if is_widget and depth > 0:
-                    depth -= 1
+        elif kind == "close":
+            if stack and stack.pop() and depth > 0:
+                depth -= 1
             prev_cap = False
         else:
-            prev_token = s
-            prev_cap = bool(re.match(r'^[A-Z][A-Za-z0-9_]*$', s))
-    return max_depth
+            prev_cap = kind == "cap"
+    return depth, max_depth, prev_cap
+
+def max_widget_nesting(code: Snippet) -> int:
+    return snippet_context(code).widget_tree.max_depth()
 
 CHILD_CTOR = re.compile(r'\bchild\s*:\s*([A-Z][A-Za-z0-9_]*)\s*\(')
 
-def child_chain_max_depth(code: str) -> int:
-    code_nc = remove_comments(code)
-    spans = []
-    for m in CHILD_CTOR.finditer(code_nc):
-        open_paren = code_nc.find('(', m.end()-1)
-        if open_paren == -1:
-            continue
-        close = find_matching_paren(code_nc, open_paren)
-        if close == -1:
-            continue
-        spans.append((m.start(), close))
-    spans.sort(key=lambda x: (x[0], -(x[1]-x[0])))
-    stack = []
-    maxd = 0
-    for s, e in spans:
-        while stack and s >= stack[-1][1]:
-            stack.pop()
-        stack.append((s, e))
-        if len(stack) > maxd:
-            maxd = len(stack)
-    return maxd
+def child_chain_max_depth(code: Snippet) -> int:
+    return snippet_context(code).widget_tree.max_child_chain()
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# metrics/, cli/ and bench/ are namespace packages imported from src/dart_metrics,
+# as when the CLIs run there with `python -m cli.X`
+PKG_DIR = Path(__file__).resolve().parents[1] / "src" / "dart_metrics"
+sys.path.insert(0, str(PKG_DIR))
@@ -0,0 +1,62 @@
+import importlib
+
+import pytest
+
+from metrics import all_metrics
+from metrics.all_metrics import ALIASES, METRICS
+from metrics.api import Result, analyze_many, resolve_metrics
+from metrics.batch import compute_for_code
+
+CODE = "class A { int n = 0; Widget b() => Center(child: Text('x')); }"
+
+@pytest.mark.parametrize("name", [
+    "number of widget", "number of widgets", "number_of_widgets", "Number-Of-Widgets", "NoW", "now",
+])
+def test_widget_count_spellings(name):
+    assert resolve_metrics([name]) == ["now"]
+
+def test_docstring_example_resolves():
+    # the example at the top of metrics/api.py
+    assert resolve_metrics(["LoC", "cc", "number of widgets"]) == ["loc", "cc", "now"]
+
+def test_keys_labels_and_aliases_in_order_without_repeats():
+    assert resolve_metrics("CC, loc ,cyclomatic complexity,,LoC") == ["cc", "loc"]
+    assert resolve_metrics(None) == list(METRICS)
+    assert all(key in METRICS for key in ALIASES.values())
+
+def test_unknown_metric_raises_before_input_is_read():
+    def items():
+        raise AssertionError("input was read")
+        yield
+    with pytest.raises(KeyError, match="'widgetz'"):
+        analyze_many(items(), ["LoC", "widgetz"])
+
+def test_chunk_size_below_one_raises():
+    with pytest.raises(ValueError):
+        analyze_many([(1, CODE)], "LoC", chunk_size=0)
+
+def test_analyze_many_matches_compute_for_code():
+    items = [(1, CODE), ("b", "void f() {}"), (None, None)]
+    keys = resolve_metrics("LoC,CC,NoW,number of widgets,SCCL")
+    results = list(analyze_many(iter(items), "LoC,CC,NoW,number of widgets,SCCL"))
+    assert [r.id for r in results] == [1, "b", None]
+    for (sid, code), result in zip(items, results):
+        assert result == Result(sid, compute_for_code(code, keys))
+        assert list(result.values) == ["LoC", "CC", "NoW", "SCCL"]
+        assert result.ok
+    assert results[2].values == {"LoC": 0, "CC": 0, "NoW": 0, "SCCL": 0}
+
+def test_result_unpacks_as_id_values_errors():
+    sid, values, errors = next(analyze_many([(7, CODE)], ["NoW"]))
+    assert (sid, values, errors) == (7, {"NoW": 2}, ())
+
+def test_lazy_metric_resolves_once(monkeypatch):
+    stand_in = all_metrics._LazyMetric("loc", "common", "count_loc")
+    monkeypatch.setitem(METRICS, "loc", ("LoC", stand_in))
+    imports = []
+    real = importlib.import_module
+    monkeypatch.setattr(all_metrics.importlib, "import_module", lambda name: imports.append(name) or real(name))
+    assert [stand_in(code) for code in ("int a;", "int a;\nint b;", "")] == [1, 2, 0]
+    assert imports == ["metrics.common"]
+    assert METRICS["loc"][1] is stand_in.resolve() is not stand_in
+    assert "(loaded)" in repr(stand_in)
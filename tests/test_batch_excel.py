@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import pytest
+
+from conftest import PKG_DIR
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("openpyxl")
+
+def test_status_lines_go_to_stdout(tmp_path):
+    # unlike cli.batch, the Excel output is never stdout, so its status lines stay there
+    path = tmp_path / "in.xlsx"
+    pd.DataFrame({"sample_id": [1, 2], "code_snippet": ["int a;", None]}).to_excel(path, index=False)
+    proc = subprocess.run([sys.executable, "-m", "cli.batch_excel", "-i", str(path), "--metrics", "LoC"],
+                          cwd=PKG_DIR, capture_output=True, text=True, check=True)
+    assert "Done. Wrote metrics for 2 rows to:" in proc.stdout
+    assert "Done." not in proc.stderr
+    out = pd.read_excel(tmp_path / "in.metrics.xlsx")
+    assert out["LoC"].tolist() == [1, 0]
+
+def test_compute_for_code_is_still_importable_from_batch_excel():
+    from cli.batch_excel import compute_for_code
+    from metrics.batch import compute_for_code as shared
+    assert compute_for_code is shared
+    assert compute_for_code("int a;", ["loc", "cc"]) == {"LoC": 1, "CC": 1}
@@ -0,0 +1,55 @@
+from metrics.all_metrics import METRICS
+from metrics.batch import compute_for_code, iter_rows
+from metrics.cache import ResultCache, _module_closure, metric_version, snippet_digest
+
+CODE = "class A { int n = 0; int f(int a) { if (a > 0) { return a; } return 0; } }"
+KEYS = ["loc", "cc", "nof"]
+
+def run(cache, pairs):
+    return [values for _, values, _ in iter_rows(pairs, KEYS, cache=cache)]
+
+def test_second_run_is_served_from_cache(tmp_path):
+    path = tmp_path / "c.db"
+    with ResultCache(path) as cache:
+        first = run(cache, [(1, CODE)])
+        assert (cache.hits, cache.misses) == (0, 3)
+    with ResultCache(path) as cache:
+        assert run(cache, [(2, CODE)]) == first
+        assert (cache.hits, cache.misses) == (3, 0)
+    assert first == [compute_for_code(CODE, KEYS)]
+
+def test_changed_metric_version_invalidates_only_that_metric(tmp_path):
+    path = tmp_path / "c.db"
+    with ResultCache(path) as cache:
+        run(cache, [(1, CODE)])
+    with ResultCache(path) as cache:
+        cache.versions["cc"] = "0" * 16  # as if complexity.py had been edited
+        digest = snippet_digest(CODE)
+        assert set(cache.lookup(digest, KEYS)) == {"loc", "nof"}
+        run(cache, [(1, CODE)])
+        assert (cache.hits, cache.misses) == (2, 1)
+    with ResultCache(path) as cache:
+        # the stale row was replaced, under the current version it is stale again
+        assert set(cache.lookup(snippet_digest(CODE), KEYS)) == {"loc", "nof"}
+
+def test_failures_are_not_cached(tmp_path):
+    with ResultCache(tmp_path / "c.db") as cache:
+        cache.record(b"d" * 16, {"cc": float("nan"), "loc": 3})
+        cache.flush()
+        assert cache.lookup(b"d" * 16, ["cc", "loc"]) == {"loc": 3}
+
+def test_version_covers_transitive_imports():
+    # CC reads the token stream, so editing tokens.py must change its version
+    assert "metrics.tokens" in _module_closure(METRICS["cc"][1].__module__)
+    assert metric_version("cc") != metric_version("loc")
+    assert len(metric_version("cc")) == 16
+
+def test_eviction_keeps_the_store_under_its_cap(tmp_path):
+    with ResultCache(tmp_path / "c.db", max_mb=0.25, batch=500) as cache:
+        for i in range(10_000):
+            cache.record(snippet_digest(f"code {i}"), {"loc": i})
+        cache.flush()
+        assert cache.used_bytes() <= cache.max_bytes
+        # least recently used rows go first
+        assert cache.lookup(snippet_digest("code 9999"), ["loc"]) == {"loc": 9999}
+        assert cache.lookup(snippet_digest("code 0"), ["loc"]) == {}
@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+from bench.corpus import PROFILES, generate_corpus
+from metrics.all_metrics import METRICS
+from metrics.batch import compute_for_code, iter_rows
+from metrics.columnar import COLUMNAR_KEYS, compute_columns, effect_count_columns
+from metrics.effects import count_effects
+
+ALL_KEYS = list(METRICS)
+
+def same(a, b):
+    """Row equality where NaN (a missing snippet) equals NaN."""
+    return a.keys() == b.keys() and all(
+        x == y or (isinstance(x, float) and isinstance(y, float) and math.isnan(x) and math.isnan(y))
+        for x, y in zip(a.values(), b.values())
+    )
+
+# rows whose text would run into the next row if the column were one string
+SPLIT_ROWS = [
+    "x = a[",                 # `[...] =` across the separator
+    "0] = 1; setState(",
+    "() {}); this.",
+    "n = 2; context.read<A>()",
+    ".add(E()); await",
+    "",
+    "Timer",
+    "(d, f); http.get(u);",
+]
+
+def corpus():
+    codes = []
+    for profile in sorted(PROFILES):
+        params = dict(PROFILES[profile], size=min(PROFILES[profile]["size"], 6_000))
+        codes += generate_corpus(4, seed=11, **params)
+    return codes
+
+def test_effect_columns_match_per_row_counts_across_separators():
+    cols = effect_count_columns(SPLIT_ROWS)
+    for i, code in enumerate(SPLIT_ROWS):
+        assert {k: cols[k][i] for k in COLUMNAR_KEYS} == count_effects(code)
+
+def test_effect_columns_on_a_subset_of_keys():
+    cols = effect_count_columns(SPLIT_ROWS, ["mc", "loc"])
+    assert list(cols) == ["mc"]
+    assert cols["mc"] == [count_effects(c)["mc"] for c in SPLIT_ROWS]
+
+@pytest.mark.parametrize("keys", [ALL_KEYS, list(COLUMNAR_KEYS), ["loc", "cc", "sstc", "mc"]])
+def test_compute_columns_matches_compute_for_code(keys):
+    codes = corpus() + SPLIT_ROWS + [None, float("nan")]
+    for code, (values, errors) in zip(codes, compute_columns(codes, keys)):
+        expected_errors = []
+        assert same(values, compute_for_code(code, keys, expected_errors))
+        assert errors == expected_errors
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_columnar_iter_rows_matches_default_path(workers):
+    codes = corpus() + SPLIT_ROWS + [None, float("nan")]
+    pairs = list(enumerate(codes))
+    rows = list(iter_rows(pairs, ALL_KEYS, chunk_size=5))
+    col_rows = list(iter_rows(pairs, ALL_KEYS, workers=workers, chunk_size=5, columnar=True))
+    assert [sid for sid, _, _ in col_rows] == [sid for sid, _, _ in rows]
+    for (_, values, errors), (_, col_values, col_errors) in zip(rows, col_rows):
+        assert same(col_values, values)
+        assert col_errors == errors
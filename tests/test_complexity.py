@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import pytest
+
+from metrics.complexity import cyclomatic_complexity, decision_offsets
+
+DATA = Path(__file__).resolve().parents[1] / "data_examples" / "rawdata.xlsx"
+
+@pytest.mark.parametrize("code, cc", [
+    ("int f(bool a) { return a ? 1 : 2; }", 2),
+    ("int f(bool a, bool b) { return a ? (b ? 1 : 2) : 3; }", 3),
+    ("int f(bool a, bool b) { return a ? 1 : b ? 2 : 3; }", 3),
+    ("Widget w(bool a) => Text('x', style: a ? TextStyle(fontSize: 18, color: c) : TextStyle(fontSize: 14));", 2),
+    # null-aware operators are not decisions
+    ("int? f(A? a) { return a?.b?.c; }", 1),
+    ("int f(int? a, int? b) { return a ?? b ?? 0; }", 1),
+    ("void f() { x ??= 1; }", 1),
+    ("void f(A? a) { a?..b = 1..c = 2; }", 1),
+    ("void f(List<int>? l) { g([...?l]); }", 1),
+    ("void f(List<int>? l) { g(l?[0]); }", 1),
+    # nullable types before a later ':' (named arguments, map literals)
+    ("void f(int? a, Map<String, int?>? m) { g(k: a, m: {'x': 1}); }", 1),
+    # a nullable return type before a block body does not pair with a later ':'
+    ("class A { String? foo() { return x; } A(int y) : z = y; }", 1),
+    ("class A { A(int y) : z = y; String? foo() { return x; } }", 1),
+    ("class A { String? get n { return x; } A(int y) : z = y; }", 1),
+    ("class A { Future<int>? f() async { return 1; } A(int y) : z = y; }", 1),
+    ("class A { Stream<int>? f() async* { yield 1; } A(int y) : z = y; }", 1),
+    # ... but a function literal between '?' and ':' is still a ternary
+    ("w(bool ok) => B(onTap: ok ? () { f(); } : null);", 2),
+    ("w(bool ok) => B(onTap: ok ? () async { await f(); } : null);", 2),
+    ("x = a ? const {1: 2} : {};", 2),
+    # interpolations are code, the rest of a string is not
+    ("String f(bool a) { return 'v ${a ? 1 : 2}'; }", 2),
+    ("String f(bool a) { return \"${a && b ? '{' : '}'}\"; }", 3),
+    ("String f() { return 'a ? b : c'; }", 1),
+    (r"final r = RegExp(r'^(\d+)?:?(\w+)?$');", 1),
+    ("/* a ? b : c */ int f() => 0;", 1),
+    # keywords and boolean operators
+    ("void f(a, b) { if (a && b || a) { for (;;) {} } while (a) {} "
+     "switch (a) { case 1: break; case 2: break; } try {} catch (e) {} }", 9),
+])
+def test_cyclomatic_complexity(code, cc):
+    assert cyclomatic_complexity(code) == cc
+
+def test_ternary_is_placed_at_its_colon():
+    code = "x = a ? 1 : 2;"
+    assert decision_offsets(code) == [code.index(":")]
+
+def test_nullable_return_type_does_not_leak_into_scopes():
+    from metrics.scopes import scope_breakdown
+    code = ("class A {\n  String? name() { return n; }\n  A(int y) : z = y;\n"
+            "  int f(bool a) { if (a) return 1; return a ? 2 : 3; }\n}")
+    cc = {scope.path: values["CC"] for scope, values in scope_breakdown(code, ["cc"])}
+    assert cc["A"] == 3
+    assert cyclomatic_complexity(code) == 3
+
+def test_cc_is_linear_on_long_ternary_chains():
+    # the old heuristic sliced 200 characters after every '?'
+    code = "x = " + "a ? 1 : " * 20_000 + "0;"
+    assert cyclomatic_complexity(code) == 20_001
+
+# rawdata.xlsx rows whose CC changed with the token-based count (user-013);
+# before: every '?' with a ':' in the next 200 characters counted
+@pytest.mark.parametrize("row, before, after, why", [
+    (4, 20, 15, "five '?' inside a RegExp raw string"),
+    (5, 80, 73, "'?.' null-aware accesses"),
+    (6, 48, 42, "'?.' null-aware accesses"),
+    (7, 80, 71, "'?.' null-aware accesses"),
+    (8, 58, 53, "'?.' null-aware accesses and nullable types"),
+    (9, 140, 120, "'?.', nullable types and a '?' in a string"),
+])
+def test_cc_changes_on_rawdata(row, before, after, why):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("openpyxl")
+    code = pd.read_excel(DATA)["code-snippet"][row]
+    assert cyclomatic_complexity(code) == after != before
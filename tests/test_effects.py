@@ -0,0 +1,51 @@
+import pytest
+
+from bench.corpus import PROFILES, generate_corpus
+from metrics.effects import EFFECT_PATTERNS, count_effects, effect_hits
+from metrics.tokens import strip_comments
+
+def single_regex(code_nc):
+    """The definition: one findall per metric regex."""
+    return {key: len(rx.findall(code_nc)) for key, rx in EFFECT_PATTERNS.items()}
+
+def single_regex_starts(code_nc):
+    return {key: [m.start() for m in rx.finditer(code_nc)] for key, rx in EFFECT_PATTERNS.items()}
+
+EDGE_CASES = [
+    "",
+    "setState(() {}); setState (() => x = 1);",
+    # hits of different metrics starting at the same position
+    "context.read<CounterBloc>().add(Inc()); context.read<A>().value = 2;",
+    "this.items.add(x); widget.count = 1; this.map[k] = v; list[0] = 1;",
+    # overlapping hits of one metric: findall resumes after each match
+    "a[b[c] = 1] = 2; x[[1]] = 3;",
+    "http.get(u); Dio().post(u); dio.delete(u); HTTP.GET(u);",
+    "db.rawQuery(q); await database.transaction((t) async {}); Hive.openBox('b'); prefs.setInt('k', 1);",
+    "File(p).readAsStringSync(); f.writeAsBytesSync(b); d.existsSync();",
+    "await instantiateImageCodec(b); decodeImageFromList(b); ImageDescriptor.encoded(x);",
+    "awaitable; await\nfoo(); await(bar);",
+    "Timer(d, f); Timer.periodic(d, f); StreamController<int>(); Stream.periodic(d); BehaviorSubject<int>();",
+    # names that only look like anchors
+    "mySetState(); thisWidget.x == 1; dbx.query(); readAsStringSyncX();",
+]
+
+@pytest.mark.parametrize("code", EDGE_CASES)
+def test_fused_scan_matches_single_regexes_on_edge_cases(code):
+    assert count_effects(code) == single_regex(code)
+    assert effect_hits(code) == single_regex_starts(code)
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_fused_scan_matches_single_regexes_on_corpus(profile):
+    params = dict(PROFILES[profile], size=min(PROFILES[profile]["size"], 8_000))
+    for code in generate_corpus(5, seed=3, **params):
+        code_nc = strip_comments(code)
+        assert count_effects(code_nc) == single_regex(code_nc)
+        assert effect_hits(code_nc) == single_regex_starts(code_nc)
+
+def test_corpus_exercises_every_metric():
+    # guards the test above against a corpus that never hits some metric
+    totals = dict.fromkeys(EFFECT_PATTERNS, 0)
+    for code in generate_corpus(5, seed=3, **PROFILES["typical"]):
+        for key, n in count_effects(strip_comments(code)).items():
+            totals[key] += n
+    assert all(totals.values()), totals
@@ -0,0 +1,104 @@
+import math
+import multiprocessing
+import os
+import pickle
+import time
+
+import pytest
+
+from metrics import guard as guard_mod
+from metrics.all_metrics import METRICS
+from metrics.batch import compute_for_code
+from metrics.common import SnippetContext
+from metrics.guard import BUDGET_EXCEEDED, SnippetGuard
+
+CODE = "class A { void f(int a) { if (a > 0) {} } }"
+KEYS = ["loc", "cc", "nom"]
+
+# the patched metrics reach the child because it is forked from the test process
+needs_fork = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                                reason="patched metrics only reach a forked child")
+
+def sleepy(code):
+    time.sleep(30)
+
+def crash(code):
+    os._exit(3)
+
+def broken(code):
+    raise ValueError("no luck")
+
+@pytest.fixture
+def guard():
+    g = SnippetGuard(timeout=1.0)
+    yield g
+    g.close()
+
+@needs_fork
+def test_timeout_kills_the_child_and_a_fresh_one_serves_the_next_snippet(guard, monkeypatch):
+    monkeypatch.setitem(METRICS, "cc", ("CC", sleepy))
+    errors, timings = [], {}
+    t0 = time.monotonic()
+    values = guard.compute(CODE, KEYS, errors, timings)
+    assert time.monotonic() - t0 < 10
+    # LoC finished before CC ran out of time; NoM never started
+    assert values == {"LoC": 1, "CC": BUDGET_EXCEEDED, "NoM": BUDGET_EXCEEDED}
+    assert errors == [("CC", "Timeout: exceeded the 1s budget in CC"), ("NoM", "Skipped: budget spent in CC")]
+    assert timings["CC"] == 1.0
+    assert guard._proc is None
+
+    errors = []
+    assert guard.compute(CODE, ["loc", "nom"], errors) == compute_for_code(CODE, ["loc", "nom"])
+    assert errors == [] and guard._proc.is_alive()
+
+@needs_fork
+def test_a_dead_child_is_reported_and_replaced(guard, monkeypatch):
+    monkeypatch.setitem(METRICS, "cc", ("CC", crash))
+    errors = []
+    values = guard.compute(CODE, KEYS, errors)
+    assert values == {"LoC": 1, "CC": BUDGET_EXCEEDED, "NoM": BUDGET_EXCEEDED}
+    assert errors == [("CC", "WorkerDied: exit code 3 in CC"), ("NoM", "Skipped: budget spent in CC")]
+    monkeypatch.undo()
+    assert guard.compute(CODE, KEYS) == compute_for_code(CODE, KEYS)
+
+@needs_fork
+def test_timeout_in_a_shared_stage_blames_every_metric(guard, monkeypatch):
+    class SlowContext(SnippetContext):
+        @property
+        def tokens(self):
+            time.sleep(30)
+    monkeypatch.setattr(guard_mod, "SnippetContext", SlowContext)
+    errors = []
+    values = guard.compute(CODE, KEYS, errors)
+    assert values == {label: BUDGET_EXCEEDED for label in ("LoC", "CC", "NoM")}
+    assert errors == [(label, "Timeout: exceeded the 1s budget in (prepare)") for label in ("LoC", "CC", "NoM")]
+
+@needs_fork
+def test_a_raising_metric_is_nan_and_the_child_carries_on(guard, monkeypatch):
+    monkeypatch.setitem(METRICS, "cc", ("CC", broken))
+    errors = []
+    values = guard.compute(CODE, KEYS, errors)
+    pid = guard._proc.pid
+    assert math.isnan(values["CC"]) and (values["LoC"], values["NoM"]) == (1, 1)
+    assert errors == [("CC", "ValueError: no luck")]
+    guard.compute(CODE, ["loc"])
+    assert guard._proc.pid == pid
+
+def test_size_budget_is_checked_before_any_work():
+    guard = SnippetGuard(timeout=1.0, max_chars=len(CODE) - 1)
+    errors = []
+    values = guard.compute(CODE, KEYS, errors)
+    assert values == {label: BUDGET_EXCEEDED for label in ("LoC", "CC", "NoM")}
+    msg = f"SizeBudget: {len(CODE)} chars > {len(CODE) - 1}"
+    assert errors == [(label, msg) for label in ("LoC", "CC", "NoM")]
+    assert guard._proc is None  # no child was started for it
+
+def test_size_budget_alone_runs_in_process():
+    guard = SnippetGuard(max_chars=len(CODE))
+    assert guard.compute(CODE, KEYS) == compute_for_code(CODE, KEYS)
+    assert guard._proc is None
+
+def test_pickles_without_its_child(guard):
+    guard.compute(CODE, ["loc"])
+    copy = pickle.loads(pickle.dumps(guard))
+    assert (copy.timeout, copy.max_chars, copy._proc) == (1.0, None, None)
@@ -0,0 +1,103 @@
+import asyncio
+import math
+
+import pytest
+
+from metrics.batch import compute_for_code
+from metrics.pipeline import from_files, from_iterable, run_pipeline
+
+KEYS = ["loc", "nom", "cc"]
+CODES = ["int a;", "void f() { if (a) {} }", "class A { void m() {} void n() {} }", None]
+
+def run(sources, workers=0, timeout=60, **kwargs):
+    """Run the pipeline with a list-appending sink; a deadlock fails the test instead of hanging it."""
+    rows = []
+    def sink(source, sid, values, errors):
+        rows.append((source, sid, values, errors))
+    count = asyncio.run(asyncio.wait_for(run_pipeline(sources, KEYS, sink, workers, **kwargs), timeout))
+    assert count == len(rows)
+    return rows
+
+def by_id(rows):
+    return {(source, sid): (values, errors) for source, sid, values, errors in rows}
+
+async def agen(pairs):
+    for pair in pairs:
+        await asyncio.sleep(0)
+        yield pair
+
+def test_mixed_sources(tmp_path):
+    paths = []
+    for i, code in enumerate(CODES[:3]):
+        paths.append(tmp_path / f"f{i}.dart")
+        paths[-1].write_text(code, encoding="utf-8")
+    rows = run({
+        "files": from_files(paths, readers=2),
+        "table": from_iterable(enumerate(CODES), batch=2),
+        "stream": agen([("s", CODES[1])]),
+    }, batch_size=2, queue_size=2)
+    got = by_id(rows)
+    assert len(rows) == 8
+    for i, code in enumerate(CODES[:3]):
+        assert got[("files", str(paths[i]))] == (compute_for_code(code, KEYS), [])
+    for i, code in enumerate(CODES):
+        assert got[("table", i)] == (compute_for_code(code, KEYS), [])
+    assert got[("stream", "s")] == (compute_for_code(CODES[1], KEYS), [])
+
+def test_exception_yielded_by_a_source_is_a_failed_row(tmp_path):
+    missing = tmp_path / "missing.dart"
+    rows = run({"files": from_files([missing]), "stream": agen([("a", OSError("pipe closed")), ("b", "int a;")])})
+    got = by_id(rows)
+    values, errors = got[("stream", "a")]
+    assert all(math.isnan(v) for v in values.values())
+    assert errors == [("*", "OSError: pipe closed")]
+    assert got[("stream", "b")] == ({"LoC": 1, "NoM": 0, "CC": 1}, [])
+    values, errors = got[("files", str(missing))]
+    assert all(math.isnan(v) for v in values.values()) and errors[0][1].startswith("FileNotFoundError")
+
+def test_raising_source_stops_the_run():
+    async def broken():
+        yield "a", "int a;"
+        raise RuntimeError("source broke")
+    with pytest.raises(RuntimeError, match="source broke"):
+        run({"broken": broken(), "ok": from_iterable(enumerate(CODES * 50))})
+
+@pytest.mark.parametrize("queue_size", [1, 4, 1024])
+def test_raising_sink_does_not_deadlock(queue_size):
+    seen = []
+    def sink(source, sid, values, errors):
+        seen.append(sid)
+        if len(seen) == 3:
+            raise ValueError("disk full")
+    pairs = [(i, "int a;") for i in range(2000)]
+    with pytest.raises(ValueError, match="disk full"):
+        asyncio.run(asyncio.wait_for(
+            run_pipeline({"a": agen(pairs), "b": from_iterable(pairs)}, KEYS, sink, batch_size=1, queue_size=queue_size),
+            60))
+    assert len(seen) == 3
+
+def test_async_sink_is_awaited():
+    got = []
+    async def sink(source, sid, values, errors):
+        await asyncio.sleep(0)
+        got.append(sid)
+    count = asyncio.run(run_pipeline({"t": from_iterable(enumerate(CODES))}, KEYS, sink))
+    assert count == 4 and sorted(got) == [0, 1, 2, 3]
+
+def test_process_pool_workers():
+    pairs = [(i, CODES[i % len(CODES)]) for i in range(200)]
+    rows = run({"t": from_iterable(pairs, batch=16)}, workers=2, batch_size=8, queue_size=16)
+    assert sorted(sid for _, sid, _, _ in rows) == list(range(200))
+    for _, sid, values, errors in rows:
+        assert (values, errors) == (compute_for_code(pairs[sid][1], KEYS), [])
+
+@pytest.mark.parametrize("kwargs", [{"batch_size": 0}, {"queue_size": 0}])
+def test_sizes_below_one_raise(kwargs):
+    with pytest.raises(ValueError):
+        asyncio.run(run_pipeline({}, KEYS, lambda *row: None, **kwargs))
+
+def test_readers_below_one_raise():
+    async def first():
+        return [p async for p in from_files(["x"], readers=0)]
+    with pytest.raises(ValueError):
+        asyncio.run(first())
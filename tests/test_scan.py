@@ -0,0 +1,90 @@
+import pytest
+
+from cli.scan import is_ignored, iter_dart_files, parse_gitignore
+
+def rules(tmp_path, text, base=""):
+    path = tmp_path / ".gitignore"
+    path.write_text(text, encoding="utf-8")
+    return parse_gitignore(path, base)
+
+@pytest.mark.parametrize("pattern, rel, is_dir, ignored", [
+    # no slash: matches at any depth
+    ("build", "build", True, True),
+    ("build", "a/b/build", True, True),
+    ("*.g.dart", "lib/x.g.dart", False, True),
+    # a leading or middle slash anchors the pattern to the .gitignore's directory
+    ("/build", "build", True, True),
+    ("/build", "a/build", True, False),
+    ("lib/gen", "lib/gen", True, True),
+    ("lib/gen", "x/lib/gen", True, False),
+    # a trailing slash matches directories only
+    ("foo/", "foo", True, True),
+    ("foo/", "foo", False, False),
+    ("foo/", "a/foo", True, True),
+    # `**/` matches in every directory, a trailing `/**` everything inside
+    ("**/gen", "gen", True, True),
+    ("**/gen", "a/b/gen", True, True),
+    ("**/a/gen", "x/a/gen", True, True),
+    ("out/**", "out/a.dart", False, True),
+    ("out/**", "out/x/y.dart", False, True),
+    ("out/**", "out", True, False),
+    ("a/**/b.dart", "a/b.dart", False, True),
+    ("a/**/b.dart", "a/x/y/b.dart", False, True),
+    ("a/**/b.dart", "c/a/b.dart", False, False),
+    # elsewhere `**` is a plain `*`: it does not cross a slash
+    ("foo**bar.dart", "fooxbar.dart", False, True),
+    ("foo**bar.dart", "lib/foo_bar.dart", False, True),
+    ("foo**bar.dart", "foo/bar.dart", False, False),
+    ("?.dart", "a.dart", False, True),
+    ("?.dart", "ab.dart", False, False),
+    # bracket classes, negated with `!`
+    ("[ab].dart", "b.dart", False, True),
+    ("[!x].dart", "a.dart", False, True),
+    ("[!x].dart", "x.dart", False, False),
+    ("[a-c]*.dart", "cat.dart", False, True),
+    ("[a-c]*.dart", "dog.dart", False, False),
+    # escapes for a leading `#` and `!`
+    ("\\#x.dart", "#x.dart", False, True),
+    ("\\!x.dart", "!x.dart", False, True),
+])
+def test_pattern(tmp_path, pattern, rel, is_dir, ignored):
+    assert is_ignored(rel, is_dir, rules(tmp_path, pattern + "\n")) is ignored
+
+def test_comments_blank_lines_and_last_match_wins(tmp_path):
+    rs = rules(tmp_path, "# generated\n\n*.dart\n!keep.dart\nkeep.dart\n!a/keep.dart\n")
+    assert len(rs) == 4
+    assert is_ignored("keep.dart", False, rs)
+    assert not is_ignored("a/keep.dart", False, rs)
+    assert is_ignored("other.dart", False, rs)
+
+def test_rules_of_a_nested_gitignore_apply_below_it(tmp_path):
+    rs = rules(tmp_path, "/gen\n*.g.dart\n", base="pkg")
+    assert is_ignored("pkg/gen", True, rs)
+    assert is_ignored("pkg/lib/x.g.dart", False, rs)
+    assert not is_ignored("gen", True, rs)
+    assert not is_ignored("lib/x.g.dart", False, rs)
+
+def write(root, rel, text="void f() {}\n"):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+def test_negation_order_across_nested_gitignores(tmp_path):
+    write(tmp_path, ".gitignore", "*.g.dart\n!keep.g.dart\nbuild/\n")
+    write(tmp_path, "a/.gitignore", "!*.g.dart\nkeep.g.dart\n")
+    write(tmp_path, "a/b/.gitignore", "!keep.g.dart\n")
+    for rel in ["x.g.dart", "keep.g.dart", "main.dart", "build/out.dart",
+                "a/x.g.dart", "a/keep.g.dart", "a/b/keep.g.dart", "a/b/y.g.dart", "c/keep.g.dart"]:
+        write(tmp_path, rel)
+    found = [rel for rel, _ in iter_dart_files(tmp_path, excludes=())]
+    # deeper files override the root, and the deepest one wins
+    assert found == ["keep.g.dart", "main.dart", "a/x.g.dart", "a/b/keep.g.dart", "a/b/y.g.dart", "c/keep.g.dart"]
+    everything = [rel for rel, _ in iter_dart_files(tmp_path, excludes=(), use_gitignore=False)]
+    assert len(everything) == 9
+
+def test_negation_does_not_reach_into_an_ignored_directory(tmp_path):
+    # as in git: once a directory is ignored, its files cannot be re-included
+    write(tmp_path, ".gitignore", "gen/\n!gen/keep.dart\n")
+    write(tmp_path, "gen/keep.dart")
+    write(tmp_path, "lib/a.dart")
+    assert [rel for rel, _ in iter_dart_files(tmp_path, excludes=())] == ["lib/a.dart"]
@@ -0,0 +1,87 @@
+import pytest
+
+from metrics.batch import compute_for_code
+from metrics.scopes import SCOPED_METRICS, ScopeIndex, scope_breakdown
+
+CODE = """class Counter extends StatefulWidget {
+  int count = 0;
+  final String label;
+
+  void inc(int by, {bool notify = true}) {
+    if (notify && by > 0) {
+      setState(() { count += by; });
+    }
+  }
+
+  Widget build(BuildContext context) {
+    int clamp(int v, int lo, int hi) {
+      return v < lo ? lo : (v > hi ? hi : v);
+    }
+    for (var i = 0; i < 3; i++) {
+      clamp(i, 0, 2);
+    }
+    return Center(child: Text(label));
+  }
+}
+
+int top(a) => a;
+"""
+
+# values are inclusive: a scope counts the hits of the scopes inside it
+EXPECTED = {
+    # CC: the decisions inside the scope plus one baseline for the scope itself, so build
+    # has 4 (`for` and clamp's two `?`, + 1) and not 5 (clamp's baseline is not added)
+    "Counter.build.clamp": {"NoM": 1, "NoP": 3, "CC": 3, "NoF": 0, "NoW": 0, "sStC": 0},
+    "Counter.build":       {"NoM": 2, "NoP": 3, "CC": 4, "NoF": 0, "NoW": 2, "sStC": 0},
+    "Counter.inc":         {"NoM": 1, "NoP": 2, "CC": 3, "NoF": 0, "NoW": 0, "sStC": 1},
+    "Counter":             {"NoM": 3, "NoP": 3, "CC": 6, "NoF": 2, "NoW": 2, "sStC": 1},
+}
+KEYS = ["nom", "nop", "cc", "nof", "now", "sstc"]
+
+def test_tree_in_pre_order():
+    index = ScopeIndex(CODE)
+    assert [(s.kind, s.path) for s in index.scopes] == [
+        ("snippet", "<snippet>"), ("class", "Counter"), ("method", "Counter.inc"),
+        ("method", "Counter.build"), ("method", "Counter.build.clamp"),
+    ]
+    root, counter, inc, build, clamp = index.scopes
+    assert (counter.start, clamp.parent, build.children) == (0, build, [clamp])
+    assert CODE[inc.start:inc.end + 1].startswith("inc(") and CODE[inc.end] == "}"
+
+@pytest.mark.parametrize("needle, path", [
+    ("count += by", "Counter.inc"),
+    ("v < lo", "Counter.build.clamp"),
+    ("for (var", "Counter.build"),
+    ("final String", "Counter"),
+    ("Widget build", "Counter"),  # the return type comes before the method's first token
+    ("int top", "<snippet>"),
+])
+def test_scope_at(needle, path):
+    assert ScopeIndex(CODE).scope_at(CODE.index(needle)).path == path
+
+def test_scope_at_the_closing_braces():
+    index = ScopeIndex(CODE)
+    _, counter, inc, build, clamp = index.scopes
+    for scope in (counter, inc, build, clamp):
+        assert index.scope_at(scope.end) is scope
+        assert index.scope_at(scope.end + 1) is scope.parent
+
+def test_breakdown_per_method():
+    rows = {scope.path: values for scope, values in scope_breakdown(CODE, KEYS)}
+    assert {path: rows[path] for path in EXPECTED} == EXPECTED
+
+def test_root_equals_the_ordinary_metrics():
+    (root, values), *_ = scope_breakdown(CODE)
+    assert root.kind == "snippet"
+    assert values == compute_for_code(CODE, list(SCOPED_METRICS))
+
+def test_tally_sums_and_maxima():
+    index = ScopeIndex(CODE)
+    hits = [(CODE.index("v < lo"), 3), (CODE.index("count += by"), 2), (CODE.index("context"), 1)]
+    assert index.tally(hits) == [6, 6, 2, 4, 3]
+    assert index.tally(hits, max) == [3, 3, 2, 3, 3]
+    assert index.tally([]) == [0] * 5
+
+def test_whole_snippet_metrics_cannot_be_broken_down():
+    with pytest.raises(KeyError, match="'loc'"):
+        scope_breakdown(CODE, ["cc", "loc"])
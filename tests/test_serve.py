@@ -0,0 +1,111 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from cli import serve
+from cli.client import analyze, connect
+
+@pytest.fixture(scope="module")
+def server():
+    service = serve.MetricsService(workers=0)
+    srv = serve.make_server(service, port=0)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    service.close()
+
+@pytest.fixture
+def conn(server):
+    c = connect(port=server.server_address[1], timeout=5)
+    yield c
+    c.close()
+
+def raw_post(server, headers: bytes, body: bytes = b"") -> bytes:
+    """Send a hand-written /analyze request and return everything the server sends back."""
+    with socket.create_connection(("127.0.0.1", server.server_address[1]), timeout=5) as s:
+        s.sendall(b"POST /analyze HTTP/1.1\r\nHost: x\r\n" + headers + b"\r\n" + body)
+        s.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            data = s.recv(65536)
+            if not data:
+                return b"".join(chunks)
+            chunks.append(data)
+
+def test_health(conn):
+    conn.request("GET", "/health")
+    resp = conn.getresponse()
+    body = json.loads(resp.read())
+    assert resp.status == 200
+    assert body["status"] == "ok" and "LoC" in body["metrics"] and body["workers"] == 0
+
+def test_analyze_on_a_kept_alive_connection(conn):
+    first = analyze(conn, ["class A { int a = 1; }"], ["LoC", "nof"])
+    second = analyze(conn, [{"id": "x", "code": "void f() {}"}, {"id": "y"}], ["NoM"])
+    assert first["results"] == [{"id": 0, "metrics": {"LoC": 1, "NoF": 1}, "errors": []}]
+    assert second["results"] == [{"id": "x", "metrics": {"NoM": 1}, "errors": []},
+                                 {"id": "y", "metrics": {"NoM": 0}, "errors": []}]
+
+@pytest.mark.parametrize("body, message", [
+    ({"snippets": "code"}, "'snippets' must be a list"),
+    ({"snippets": ["x"], "metrics": ["nope"]}, "Unknown metric"),
+    ({"snippets": [1]}, "must be a string"),
+    ([1, 2], "JSON object"),
+])
+def test_bad_requests_are_400(conn, body, message):
+    conn.request("POST", "/analyze", json.dumps(body).encode(), {"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    assert resp.status == 400
+    assert message in json.loads(resp.read())["error"]
+
+def test_unknown_endpoint_is_404(conn):
+    conn.request("GET", "/nope")
+    resp = conn.getresponse()
+    resp.read()
+    assert resp.status == 404
+
+def test_body_over_the_cap_is_413(server, monkeypatch):
+    monkeypatch.setattr(serve, "MAX_BODY_BYTES", 10)
+    reply = raw_post(server, b"Content-Length: 11\r\n", b'{"snippets"')
+    assert reply.startswith(b"HTTP/1.1 413 ")
+
+@pytest.mark.parametrize("value", [b"abc", b"-1", b"1.5"])
+def test_bad_content_length_is_400(server, value):
+    # -1 used to hang in rfile.read(-1), abc to kill the handler without a reply
+    reply = raw_post(server, b"Content-Length: " + value + b"\r\n", b'{"snippets": []}')
+    assert reply.startswith(b"HTTP/1.1 400 ")
+    assert b"invalid Content-Length" in reply
+
+def test_server_still_answers_after_bad_requests(server, conn):
+    raw_post(server, b"Content-Length: abc\r\n")
+    assert analyze(conn, ["int a;"], ["LoC"])["results"][0]["metrics"] == {"LoC": 1}
+
+def test_unix_socket_replaces_only_a_stale_socket(tmp_path):
+    service = serve.MetricsService(workers=0)
+    path = tmp_path / "m.sock"
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(str(path))
+    stale.close()
+    srv = serve.make_server(service, socket_path=str(path))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    try:
+        c = connect(socket_path=str(path), timeout=5)
+        assert analyze(c, ["int a;"], ["LoC"])["results"][0]["metrics"] == {"LoC": 1}
+        c.close()
+    finally:
+        srv.shutdown()
+        srv.server_close()
+        service.close()
+
+def test_unix_socket_refuses_to_replace_a_regular_file(tmp_path):
+    path = tmp_path / "notasock.txt"
+    path.write_text("important")
+    with pytest.raises(FileExistsError):
+        serve.make_server(serve.MetricsService(workers=0), socket_path=str(path))
+    assert path.read_text() == "important"
@@ -0,0 +1,100 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from bench.corpus import PROFILES, generate_corpus
+from cli.shards import manifest_path, read_manifest, shard_of
+from conftest import PKG_DIR
+
+SHARDS = 3
+
+def run(*args, check=True):
+    proc = subprocess.run([sys.executable, "-m", *map(str, args)], cwd=PKG_DIR, capture_output=True, text=True)
+    if check and proc.returncode:
+        raise AssertionError(proc.stderr)
+    return proc
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+@pytest.fixture
+def input_jsonl(tmp_path):
+    codes = generate_corpus(24, seed=4, **dict(PROFILES["small"], size=800))
+    codes[5] = None  # a missing snippet
+    path = tmp_path / "in.jsonl"
+    with open(path, "w", encoding="utf-8") as fh:
+        for i, code in enumerate(codes):
+            fh.write(json.dumps({"sample_id": f"s{i}", "code_snippet": code}) + "\n")
+    return path
+
+def run_shards(path, summaries=False):
+    outs = []
+    for k in range(SHARDS):
+        extra = ["--summary", path.with_name(f"sum-{k}.json")] if summaries else []
+        run("cli.batch", "-i", path, "--metrics", "LoC,CC,NoW,MC", "--shard", f"{k}/{SHARDS}", *extra)
+        outs.append(path.with_name(f"in.metrics.shard-{k}-of-{SHARDS}.jsonl"))
+    return outs
+
+def test_shard_of_is_stable():
+    # fixed values: a change would scatter the rows of re-run shards differently
+    assert [shard_of(f"s{i}", 4) for i in range(8)] == [1, 0, 2, 2, 0, 0, 3, 1]
+    assert shard_of(17, 8) == shard_of("17", 8)
+    assert {shard_of(i, 4) for i in range(100)} == {0, 1, 2, 3}
+
+def test_merge_equals_unsharded_run(input_jsonl):
+    whole = input_jsonl.with_name("whole.jsonl")
+    run("cli.batch", "-i", input_jsonl, "-o", whole, "--metrics", "LoC,CC,NoW,MC")
+    outs = run_shards(input_jsonl)
+    assert sum(read_manifest(manifest_path(o))["rows"] for o in outs) == 24
+    assert all(len(read_jsonl(o)) < 24 for o in outs)
+    merged = input_jsonl.with_name("merged.jsonl")
+    run("cli.merge", *outs, "-o", merged)
+    assert read_jsonl(merged) == read_jsonl(whole)
+
+def test_merged_summary_equals_unsharded_summary(input_jsonl):
+    pytest.importorskip("numpy")
+    whole = input_jsonl.with_name("whole.json")
+    run("cli.batch", "-i", input_jsonl, "--metrics", "LoC,CC,NoW,MC", "--summary", whole, "--summary-only")
+    outs = run_shards(input_jsonl, summaries=True)
+    merged = input_jsonl.with_name("merged.json")
+    run("cli.merge", *outs, "-o", input_jsonl.with_name("merged.jsonl"), "--summary", merged)
+    a, b = json.loads(whole.read_text()), json.loads(merged.read_text())
+    assert a["rows"] == b["rows"] == 24
+    assert a["metrics"].keys() == b["metrics"].keys()
+    for label in a["metrics"]:
+        for stat in ("count", "min", "max"):
+            assert a["metrics"][label][stat] == b["metrics"][label][stat]
+        assert a["metrics"][label]["mean"] == pytest.approx(b["metrics"][label]["mean"])
+
+def test_changed_shard_output_is_refused(input_jsonl):
+    outs = run_shards(input_jsonl)
+    with open(outs[1], "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"input_row": 99, "sample_id": "x"}) + "\n")
+    proc = run("cli.merge", *outs, "-o", input_jsonl.with_name("m.jsonl"), check=False)
+    assert proc.returncode
+    assert "checksum differs from its manifest" in proc.stderr and "shard 1" in proc.stderr
+    assert not input_jsonl.with_name("m.jsonl").exists()
+
+def test_missing_shard_is_named(input_jsonl):
+    outs = run_shards(input_jsonl)
+    proc = run("cli.merge", outs[0], outs[2], "-o", input_jsonl.with_name("m.jsonl"), check=False)
+    assert proc.returncode
+    assert f"missing shard(s) 1 of {SHARDS}" in proc.stderr
+
+def test_shards_of_different_runs_are_refused(input_jsonl):
+    outs = run_shards(input_jsonl)
+    run("cli.batch", "-i", input_jsonl, "--metrics", "LoC,CC", "--shard", f"1/{SHARDS}")
+    proc = run("cli.merge", *outs, "-o", input_jsonl.with_name("m.jsonl"), check=False)
+    assert proc.returncode
+    assert "metrics differs" in proc.stderr
+
+def test_changed_summary_is_refused(input_jsonl):
+    pytest.importorskip("numpy")
+    outs = run_shards(input_jsonl, summaries=True)
+    summary = input_jsonl.with_name("sum-1.json")
+    summary.write_text(summary.read_text().replace('"rows":', '"rows":1', 1))
+    proc = run("cli.merge", *outs, "-o", input_jsonl.with_name("m.jsonl"), "--summary", "-", check=False)
+    assert proc.returncode
+    assert "summary missing or changed since shard 1 wrote it" in proc.stderr
@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from metrics.batch import compute_for_code
+from metrics.stats import MetricSummary, RunStats
+
+KEYS = ["loc", "cr"]
+
+def rows(codes):
+    return [compute_for_code(code, KEYS) for code in codes]
+
+def histogram(summary, label):
+    h = summary["metrics"][label]["histogram"]
+    e = h["edges"]
+    # the last bin is open-ended: (its lower edge, None)
+    return dict(zip(list(zip(e, e[1:]))[:-1] + [(e[-2], None)], h["counts"]))
+
+def test_comment_ratio_above_one_has_its_own_bins():
+    # LoC 1, four comment lines: CR 4.0 used to be clipped into the [0.9, 1] bin
+    stats = RunStats(KEYS)
+    for values in rows(["int a;\n/*\n x\n y\n*/\n", "int a; // x\n", "int a;\nint b;\n// c\n", "// a\n" * 20 + "int b;\n"]):
+        stats.add(values)
+    bins = {edges: n for edges, n in histogram(stats.summary(), "CR").items() if n}
+    assert bins == {(0, 0.1): 1, (0.5, 0.6): 1, (4, 8): 1, (8, None): 1}
+
+def test_counts_keep_their_open_ended_last_bin():
+    stats = RunStats(["loc"])
+    stats.add({"LoC": 2 ** 21})
+    assert histogram(stats.summary(), "LoC")[(2 ** 19 + 1, None)] == 1
+
+def test_buffer_is_bounded_over_all_groups():
+    # one pending row in each of many groups used to stay buffered until the end
+    stats = RunStats(KEYS, grouped=True, block_rows=8)
+    for i in range(100):
+        stats.add({"LoC": i, "CR": 0.0}, group=i)
+        assert sum(len(b) for b in stats._pending.values()) < 8
+    summary = stats.summary()
+    assert summary["rows"] == 100 and len(summary["groups"]) == 100
+    assert summary["groups"]["42"]["metrics"]["LoC"]["mean"] == 42
+
+def test_block_size_does_not_change_the_summary():
+    values = [{"LoC": i % 13, "CR": (i % 7) / 5} for i in range(500)]
+    groups = [i % 3 for i in range(500)]
+    small, large = RunStats(KEYS, grouped=True, block_rows=7), RunStats(KEYS, grouped=True)
+    for v, g in zip(values, groups):
+        small.add(v, g)
+        large.add(v, g)
+    a, b = small.summary(), large.summary()
+    assert a["metrics"]["CR"]["histogram"] == b["metrics"]["CR"]["histogram"]
+    for g in a["groups"]:
+        for label in ("LoC", "CR"):
+            assert math.isclose(a["groups"][g]["metrics"][label]["mean"], b["groups"][g]["metrics"][label]["mean"])
+
+def test_state_with_other_histogram_bins_is_refused():
+    state = MetricSummary(KEYS).state()
+    state["hist"][1] = state["hist"][1][:10]  # the CR bins before CR could pass 1
+    with pytest.raises(ValueError, match="CR histogram has 10 bins"):
+        MetricSummary.from_state(KEYS, state)
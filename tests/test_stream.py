@@ -0,0 +1,78 @@
+import pytest
+
+from bench.corpus import PROFILES, generate_corpus
+from metrics.all_metrics import METRICS
+from metrics.batch import compute_for_code
+from metrics.stream import STREAM_KEYS, analyze_file, iter_segments
+
+CHUNKS = [64, 512, 4096]
+
+# state that has to be carried from one segment to the next
+TAILS = {
+    # long enough that the reader has to cut inside them
+    "class_header": "class A extends B with\n" + "".join(f"  M{i},\n" for i in range(40)) + "  Z\n{\n  int a = 1;\n  int b, c;\n}\n",
+    "open_index": "m[\n" + "  l.add(1),\n" * 40 + "] = 1;\nq[\n" + "  l.add(2),\n" * 40 + "];\nl.add(3);\n",
+    "open_paren": "void f(int a, g(b),\n" + "  int c,\n" * 40 + ") {\n}\n",
+    "ternary": "x = a ?\n" + "  1 +\n" * 40 + "  0 : 2;\n",
+    "child_chain": "Widget b() => " + "A(child: " * 12 + "Text(t()),\n" + "  key: k,\n" * 40 + ")" * 11 + ",\n);\n",
+    "unclosed_comment": "int a = 1;\n/* never\nclosed\nint b = 2;\n",
+    "crlf": "class A {\r\n  int a = 1;\r\n  void f(int x) { if (x > 0) {} }\r\n}\r\n",
+    "long_line": "final s = [" + ", ".join(f"'{i}'" for i in range(400)) + "];\n",
+}
+
+def corpus_text(profile):
+    params = dict(PROFILES[profile], size=min(PROFILES[profile]["size"], 6_000))
+    return "\n".join(generate_corpus(4, seed=5, **params))
+
+def whole(text):
+    return compute_for_code(text, list(STREAM_KEYS))
+
+def write(tmp_path, text):
+    path = tmp_path / "big.dart"
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+def test_every_metric_has_a_fold():
+    assert set(STREAM_KEYS) == set(METRICS)
+
+@pytest.mark.parametrize("chunk_bytes", CHUNKS)
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_stream_matches_whole_file_on_corpus(tmp_path, profile, chunk_bytes):
+    text = corpus_text(profile)
+    path = write(tmp_path, text)
+    assert analyze_file(path, STREAM_KEYS, chunk_bytes) == whole(text)
+
+@pytest.mark.parametrize("chunk_bytes", CHUNKS)
+@pytest.mark.parametrize("tail", sorted(TAILS))
+def test_stream_matches_whole_file_across_cuts(tmp_path, tail, chunk_bytes):
+    # first: a `<` comparison in the corpus allows no cut until a later ">"
+    text = TAILS[tail] + "\n" + corpus_text("small")
+    path = write(tmp_path, text)
+    # read_text translates the \r\n of the crlf case, as the stream does
+    assert analyze_file(path, STREAM_KEYS, chunk_bytes) == whole(path.read_text(encoding="utf-8"))
+
+@pytest.mark.parametrize("key", STREAM_KEYS)
+def test_each_key_on_its_own(tmp_path, key):
+    text = corpus_text("typical")
+    path = write(tmp_path, text)
+    label = METRICS[key][0]
+    assert analyze_file(path, [key], 256) == {label: whole(text)[label]}
+
+def test_segments_reassemble_the_text(tmp_path):
+    text = corpus_text("nested")
+    path = write(tmp_path, text)
+    segments = list(iter_segments(path, 128))
+    assert len(segments) > 10
+    assert "".join(seg.code for seg in segments) == text
+
+def test_empty_file(tmp_path):
+    assert analyze_file(write(tmp_path, ""), STREAM_KEYS, 64) == whole("")
+
+@pytest.mark.parametrize("chunk_bytes", [0, -1])
+def test_chunk_bytes_below_one_is_refused(tmp_path, chunk_bytes):
+    # 0 used to loop forever, negative sizes sliced the map backwards
+    path = write(tmp_path, "int a;\n")
+    with pytest.raises(ValueError):
+        analyze_file(path, STREAM_KEYS, chunk_bytes)
+    with pytest.raises(ValueError):
+        next(iter_segments(path, chunk_bytes))
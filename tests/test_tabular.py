@@ -0,0 +1,60 @@
+import json
+import math
+
+import pytest
+
+from cli.tabular import iter_columns, metric_types, open_writer
+
+COLUMNS = ["sample_id", "LoC", "CR", "code_snippet"]
+TYPES = dict(metric_types(["loc", "cr"]), code_snippet="string")
+CHUNKS = [[["a", 1, math.nan, None]], [["b", 2, 0.5, "int a;"]]]
+
+def test_metric_types():
+    assert metric_types(["loc", "cr", "now"]) == {"LoC": "int64", "CR": "double", "NoW": "int64"}
+
+@pytest.mark.parametrize("suffix", [".csv", ".jsonl", ".parquet", ".xlsx"])
+def test_all_missing_first_chunk_then_values(tmp_path, suffix):
+    # Parquet used to fix the schema from the first chunk: an all-missing column was typed
+    # null and the next chunk failed with "Unsupported cast from int64 to null"
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    if suffix == ".xlsx":
+        pytest.importorskip("openpyxl")
+    path = tmp_path / f"out{suffix}"
+    with open_writer(path, COLUMNS, TYPES) as writer:
+        for chunk in CHUNKS:
+            writer.write_rows(chunk)
+    assert writer.rows_written == 2
+    rows = list(iter_columns(path, ["sample_id", "LoC", "code_snippet"]))
+    assert [r[:2] for r in rows] == [("a", 1), ("b", 2)]
+    assert rows[1][2] == "int a;"
+
+def test_parquet_column_types(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "out.parquet"
+    with open_writer(path, COLUMNS, TYPES) as writer:
+        for chunk in CHUNKS:
+            writer.write_rows(chunk)
+    schema = pq.read_schema(path)
+    assert [str(schema.field(c).type) for c in COLUMNS] == ["string", "int64", "double", "string"]
+
+def test_empty_parquet_keeps_declared_types(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "empty.parquet"
+    open_writer(path, COLUMNS, TYPES).close()
+    schema = pq.read_schema(path)
+    assert [str(schema.field(c).type) for c in COLUMNS] == ["null", "int64", "double", "string"]
+
+def test_jsonl_writes_nan_as_null(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with open_writer(path, COLUMNS) as writer:
+        writer.write_rows(CHUNKS[0])
+    assert json.loads(path.read_text(encoding="utf-8")) == {"sample_id": "a", "LoC": 1, "CR": None, "code_snippet": None}
+
+def test_undeclared_missing_parquet_column_becomes_string(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "out.parquet"
+    with open_writer(path, ["sample_id", "LoC"]) as writer:
+        writer.write_rows([[None, 1]])
+        writer.write_rows([[7, 2]])
+    assert list(iter_columns(path, ["sample_id", "LoC"])) == [(None, 1), ("7", 2)]
@@ -0,0 +1,126 @@
+import pytest
+
+from bench.corpus import PROFILES, generate_corpus
+from metrics.all_metrics import METRICS
+from metrics.tokens import COMMENT, IDENT, KEYWORD, NUMBER, PUNCT, STRING, interpolation_spans, strip_comments, tokenize
+
+def tokens(code):
+    ts = tokenize(code)
+    return [(ts.kinds[i], ts.text(i)) for i in range(len(ts))]
+
+# --- lexer edge cases --------------------------------------------------------------
+def test_raw_string_ignores_escapes_and_interpolation():
+    assert tokens(r"a = r'x\' + r'${b}';") == [
+        (IDENT, "a"), (PUNCT, "="), (STRING, r"r'x\'"), (PUNCT, "+"), (STRING, "r'${b}'"), (PUNCT, ";"),
+    ]
+
+def test_triple_quoted_string_spans_lines_and_quotes():
+    code = 'var s = """\nsay "hi" { ( \'\n""";'
+    assert tokens(code) == [
+        (KEYWORD, "var"), (IDENT, "s"), (PUNCT, "="), (STRING, '"""\nsay "hi" { ( \'\n"""'), (PUNCT, ";"),
+    ]
+
+def test_raw_triple_quoted_string():
+    code = "x = r'''a\\'''; y"
+    assert tokens(code) == [(IDENT, "x"), (PUNCT, "="), (STRING, "r'''a\\'''"), (PUNCT, ";"), (IDENT, "y")]
+
+def test_interpolation_with_braces_and_nested_strings_is_one_token():
+    code = "t = \"${m['}'] ?? {1: '{'}} and $x\";"
+    assert tokens(code) == [(IDENT, "t"), (PUNCT, "="), (STRING, code[4:-1]), (PUNCT, ";")]
+    ts = tokenize(code)
+    assert ts.bracket_chars == ""  # nothing inside the literal is structure
+
+def test_interpolation_spans():
+    code = "\"a ${b + '${c}'} d ${e}\""
+    spans = interpolation_spans(code, 0)
+    assert [code[s:e] for s, e in spans] == ["b + '${c}'", "e"]
+    assert interpolation_spans("r'${x}'", 0) == []
+
+def test_nested_block_comments():
+    code = "a /* 1 /* 2 */ still comment */ b"
+    assert tokens(code) == [(IDENT, "a"), (COMMENT, "/* 1 /* 2 */ still comment */"), (IDENT, "b")]
+
+def test_unterminated_block_comment_runs_to_end():
+    assert tokens("a /* /* */ b") == [(IDENT, "a"), (COMMENT, "/* /* */ b")]
+
+def test_comment_markers_inside_strings_are_text():
+    code = "u = 'http://x.dev/*'; v = 2;"
+    kinds = [k for k, _ in tokens(code)]
+    assert COMMENT not in kinds
+    assert tokens(code)[2] == (STRING, "'http://x.dev/*'")
+
+def test_single_line_string_is_cut_at_newline():
+    assert tokens("a = 'open\nb;") == [(IDENT, "a"), (PUNCT, "="), (STRING, "'open"), (IDENT, "b"), (PUNCT, ";")]
+
+def test_r_at_end_of_identifier_is_not_a_raw_prefix():
+    assert tokens("foor'x'") == [(IDENT, "foor"), (STRING, "'x'")]
+    assert strip_comments("foor'//x' // c") == "foor'//x'     "
+
+def test_multi_char_operators():
+    code = "a?.b ?? c ??= d?..e; f(...?g); h => i;"
+    ops = [t for k, t in tokens(code) if k == PUNCT]
+    assert ops == ["?.", "??", "??=", "?..", ";", "(", "...?", ")", ";", "=>", ";"]
+    assert (NUMBER, "0x1F") in tokens("n = 0x1F;")
+
+def test_bracket_pairs_skip_literals_and_comments():
+    code = "f(a, '(', /* ) */ g(b)) { x['}']; }"
+    pairs = tokenize(code).bracket_pairs()
+    assert pairs[code.index("f(") + 1] == code.rindex(")")
+    assert pairs[code.index("{")] == code.rindex("}")
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_strip_comments_matches_token_stream(profile):
+    params = dict(PROFILES[profile], size=min(PROFILES[profile]["size"], 8_000))
+    for code in generate_corpus(5, seed=7, **params):
+        stripped = strip_comments(code)
+        assert stripped == tokenize(code).without_comments()
+        assert len(stripped) == len(code)
+        assert stripped.count("\n") == code.count("\n")
+
+# --- metric values the lexer changed (user-002) -------------------------------------
+# before: the per-metric character scanners, which saw code inside strings and
+# closed a nested /* at its first */; after: the values on the token stream.
+CASES = {
+    "triple_quoted": '''class A {
+  final s = """
+  if (x) { while (y) }
+  void g(a, b) {
+  """;
+  int f(int a) { return a; }
+}''',
+    "nested_block_comment": """class A {
+  /* outer /* inner */ if (x) { void h(a) { } } */
+  int f(int a) { return a; }
+}""",
+    "comment_in_string": """class A {
+  final u = 'http://x.dev/*';
+  final v = 2;
+  int f(int a) { if (a > 0) { return a; } return 0; }
+}""",
+    "widgets_in_string": """Widget build(BuildContext c) {
+  final t = "Padding(child: Center(child: Text('x')))";
+  return Center(child: Text(t));
+}""",
+}
+
+@pytest.mark.parametrize("case, key, before, after", [
+    ("triple_quoted", "nom", 2, 1),               # `void g(a, b) {` inside the string
+    ("triple_quoted", "nop", 2, 1),
+    ("nested_block_comment", "nom", 2, 1),        # `void h(a) { }` after the inner */
+    ("nested_block_comment", "cc", 2, 1),
+    ("nested_block_comment", "mnd", 2, 1),
+    ("comment_in_string", "mnd", 0, 2),           # '/*' in a URL hid the rest of the class
+    ("comment_in_string", "nof", 0, 2),
+    ("widgets_in_string", "sccl", 2, 1),          # parens inside the string are not structure
+])
+def test_lexer_metric_changes(case, key, before, after):
+    assert METRICS[key][1](CASES[case]) == after != before
+
+@pytest.mark.parametrize("case, expected", [
+    ("triple_quoted", {"LoC": 7, "NoF": 1, "MND": 1}),
+    ("nested_block_comment", {"LoC": 4, "CR": 0.25, "NoP": 1}),
+    ("widgets_in_string", {"NoW": 5, "MNW": 3}),  # NoW/MNW still count names in string text
+])
+def test_lexer_unchanged_values(case, expected):
+    by_label = {label: func for label, func in METRICS.values()}
+    assert {label: by_label[label](CASES[case]) for label in expected} == expected
@@ -0,0 +1,87 @@
+import pytest
+
+from bench.corpus import PROFILES, generate_corpus
+from metrics.common import SnippetContext, find_matching_paren
+from metrics.widgets import (
+    CHILD, CHILD_CTOR, CTOR, LEVEL, WIDGET_CTOR, _widget_nesting, build_widget_tree,
+    child_chain_max_depth, max_widget_nesting, number_of_widgets, widget_offsets,
+)
+
+# --- the three metrics as separate scans, before the shared tree ---------------------
+def now_reference(ctx):
+    return [m.start() for m in WIDGET_CTOR.finditer(ctx.code_nc)]
+
+def mnw_reference(ctx):
+    return _widget_nesting(ctx.code_nc, [])[1]
+
+def sccl_reference(ctx):
+    code_nc = ctx.code_nc
+    spans = []
+    for m in CHILD_CTOR.finditer(code_nc):
+        close = find_matching_paren(ctx, m.end() - 1)
+        if close != -1:
+            spans.append((m.start(), close))
+    spans.sort(key=lambda x: (x[0], -(x[1] - x[0])))
+    stack, maxd = [], 0
+    for s, e in spans:
+        while stack and s >= stack[-1][1]:
+            stack.pop()
+        stack.append((s, e))
+        maxd = max(maxd, len(stack))
+    return maxd
+
+EXAMPLE = """Widget build(BuildContext context) {
+  return Scaffold(
+    body: Center(
+      child: Padding(
+        padding: EdgeInsets.all(8),
+        child: Column(children: [Text('a'), getURL(x)]),
+      ),
+    ),
+  );
+}"""
+
+def test_tree_nodes_parents_and_flags():
+    tree = build_widget_tree(EXAMPLE)
+    nodes = {tree.name(i): (tree.name(tree.parents[i]) if tree.parents[i] != -1 else None, tree.flags[i])
+             for i in range(len(tree))}
+    # `Widget build(` and `EdgeInsets.all(` are not constructor calls
+    assert nodes == {
+        "Scaffold": (None, LEVEL | CTOR),
+        "Center": ("Scaffold", LEVEL | CTOR),
+        "Padding": ("Center", LEVEL | CTOR | CHILD),
+        "Column": ("Padding", LEVEL | CTOR | CHILD),
+        "Text": ("Column", LEVEL | CTOR),
+        "RL": ("Column", CTOR),               # the "RL(" of `getURL(`: not a level, but NoW counts it
+    }
+    assert list(tree.depths) == [1, 2, 3, 4, 5, 4]
+    assert list(tree.child_chains()) == [0, 0, 1, 2, 2, 2]
+
+def test_example_metrics():
+    assert number_of_widgets(EXAMPLE) == 6
+    assert max_widget_nesting(EXAMPLE) == 5
+    assert child_chain_max_depth(EXAMPLE) == 2
+    assert widget_offsets(EXAMPLE)[:2] == [EXAMPLE.index("Scaffold"), EXAMPLE.index("Center")]
+
+@pytest.mark.parametrize("code, now, mnw, sccl", [
+    ("", 0, 0, 0),
+    ("foo(bar(baz()));", 0, 0, 0),
+    ("a.Text('x'); _Foo(); x2Bar();", 1, 1, 0),  # only `.Text(` has a qualifying name start
+    ("Center(child: Center(child: Center(child: Text(''))))", 4, 4, 3),
+    # parens in a string are not structure: the chain is still one level
+    ("Center(child: Text(')'), x: A(child: B()))", 4, 2, 1),
+    # a `child: X(` that never closes is not a chain
+    ("Center(child: Padding(child: Text('x')", 3, 3, 1),
+    ("Container(\n  child: SizedBox (\n    child: Icon(Icons.add),\n  ),\n)", 3, 3, 2),
+])
+def test_small_cases(code, now, mnw, sccl):
+    assert (number_of_widgets(code), max_widget_nesting(code), child_chain_max_depth(code)) == (now, mnw, sccl)
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_tree_matches_the_separate_scans(profile):
+    params = dict(PROFILES[profile], size=min(PROFILES[profile]["size"], 8_000))
+    for code in generate_corpus(5, seed=9, **params):
+        ctx = SnippetContext(code)
+        assert widget_offsets(ctx) == now_reference(ctx)
+        assert max_widget_nesting(ctx) == mnw_reference(ctx)
+        assert child_chain_max_depth(ctx) == sccl_reference(ctx)